@@ -0,0 +1,176 @@
+"""
+Кодек документов для резервных копий
+Для каждой коллекции заранее известны пути к полям datetime: они выводятся из
+Pydantic-моделей models.py, поэтому восстанавливаются и вложенные даты
+(items[].created_at у заказов). Документ кодируется одним вызовом orjson, а
+значения вне схемы (datetime в характеристиках, ObjectId, Decimal128, bytes)
+пишутся с тегами Extended JSON ({"$date": ...}) и тоже читаются без потерь
+"""
+
+import base64
+import types
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple, Union, get_args, get_origin
+import orjson
+from bson import Binary, Decimal128, ObjectId
+from pydantic import BaseModel
+
+try:
+    from backend.models import CartItem, FeedbackForm, Order, Product, Project
+except ImportError:
+    from models import CartItem, FeedbackForm, Order, Product, Project
+
+# Путь к полю внутри документа, '*' - каждый элемент списка
+FieldPath = Tuple[str, ...]
+
+ENCODE_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+
+
+def datetime_paths(model, prefix: FieldPath = ()) -> List[FieldPath]:
+    """Пути ко всем полям datetime модели, включая вложенные модели и списки"""
+    paths = []
+    for name, field in model.model_fields.items():
+        paths.extend(_annotation_paths(field.annotation, prefix + (name,)))
+    return paths
+
+
+def _annotation_paths(annotation, path: FieldPath) -> List[FieldPath]:
+    if annotation is datetime:
+        return [path]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return datetime_paths(annotation, path)
+    origin = get_origin(annotation)
+    if origin in (list, tuple, set):
+        return _annotation_paths(get_args(annotation)[0], path + ('*',))
+    if origin in (Union, types.UnionType):
+        return [p for arg in get_args(annotation) if arg is not type(None) for p in _annotation_paths(arg, path)]
+    return []
+
+
+def _convert(node, path: FieldPath, convert):
+    """Заменить значение по пути на convert(значение), если путь есть в документе"""
+    key, rest = path[0], path[1:]
+    if key == '*':
+        if isinstance(node, list):
+            for i, item in enumerate(node):
+                if rest:
+                    _convert(item, rest, convert)
+                else:
+                    node[i] = convert(item)
+    elif isinstance(node, dict) and key in node:
+        if rest:
+            _convert(node[key], rest, convert)
+        else:
+            node[key] = convert(node[key])
+
+
+def _to_iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _from_iso(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+    return value
+
+
+def _tag(value):
+    """Значения вне схемы, которые orjson не пишет сам"""
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, Decimal128):
+        return {'$numberDecimal': str(value)}
+    if isinstance(value, bytes):
+        return {'$binary': {'base64': base64.b64encode(value).decode('ascii'),
+                            'subType': f"{getattr(value, 'subtype', 0):02x}"}}
+    raise TypeError(f"Тип {type(value).__name__} не поддерживается в резервной копии")
+
+
+def _untag(value: dict):
+    if '$date' in value:
+        return datetime.fromisoformat(value['$date'])
+    if '$oid' in value:
+        return ObjectId(value['$oid'])
+    if '$numberDecimal' in value:
+        return Decimal128(value['$numberDecimal'])
+    binary = value['$binary']
+    data, subtype = base64.b64decode(binary['base64']), int(binary['subType'], 16)
+    # Драйвер сам возвращает подтип 0 как bytes
+    return data if subtype == 0 else Binary(data, subtype)
+
+
+TAGS = {'$date', '$oid', '$numberDecimal', '$binary'}
+
+
+def _revive(node):
+    if isinstance(node, dict):
+        if len(node) == 1 and next(iter(node)) in TAGS:
+            return _untag(node)
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                node[key] = _revive(value)
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            if isinstance(value, (dict, list)):
+                node[i] = _revive(value)
+    return node
+
+
+class DocumentCodec:
+    """Кодирование документов коллекции в строки NDJSON и обратно"""
+
+    def __init__(self, paths: Iterable[FieldPath], keep_id: bool = False):
+        self.paths = tuple(paths)
+        # У большинства коллекций _id - ObjectId, а ключ документа - поле id
+        self.keep_id = keep_id
+
+    def encode(self, doc: dict) -> bytes:
+        if not self.keep_id:
+            doc.pop('_id', None)
+        for path in self.paths:
+            _convert(doc, path, _to_iso)
+        return orjson.dumps(doc, default=_tag, option=ENCODE_OPTIONS)
+
+    def decode(self, line: bytes) -> dict:
+        doc = orjson.loads(line)
+        # Теги встречаются редко, полный обход нужен только строкам с ними
+        if b'{"$' in line:
+            doc = _revive(doc)
+        return self.decode_dict(doc)
+
+    def decode_dict(self, doc: dict) -> dict:
+        """Даты по схеме в документе, уже разобранном из JSON (старые копии)"""
+        for path in self.paths:
+            _convert(doc, path, _from_iso)
+        return doc
+
+
+def model_codec(model, extra: Iterable[str] = ()) -> DocumentCodec:
+    return DocumentCodec([*datetime_paths(model), *((name,) for name in extra)])
+
+
+# Все коллекции, в которые пишут API, бот и фоновые задачи
+CODECS: Dict[str, DocumentCodec] = {
+    # updated_at ставится $currentDate при изменениях и в моделях API не отдается
+    'products': model_codec(Product, extra=('updated_at',)),
+    'projects': model_codec(Project, extra=('updated_at',)),
+    'cart_items': model_codec(CartItem, extra=('updated_at',)),
+    'orders': model_codec(Order),
+    'feedback': model_codec(FeedbackForm),
+    'notifications_outbox': DocumentCodec([('created_at',), ('next_attempt_at',), ('locked_until',),
+                                           ('sent_at',), ('dead_at',)]),
+    'idempotency_keys': DocumentCodec([('created_at',), ('completed_at',)], keep_id=True),
+    'catalog_versions': DocumentCodec([('updated_at',)], keep_id=True),
+}
+
+# Коллекции без схемы: все даты пишутся с тегами
+GENERIC_CODEC = DocumentCodec(())
+
+
+def codec_for(collection_name: str) -> DocumentCodec:
+    return CODECS.get(collection_name, GENERIC_CODEC)
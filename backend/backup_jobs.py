@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Фоновые задачи резервного копирования
+API и бот ставят задачу (создать копию или восстановить) и сразу получают ее
+id, а сама работа идет в фоне на общем клиенте MongoDB процесса. Задачи и их
+прогресс (документы и байты по коллекциям) хранятся в коллекции backup_jobs,
+поэтому ход задачи, запущенной сервером, виден и в боте, и наоборот.
+Одновременно выполняется не больше одной задачи на базу
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+import logging
+
+try:
+    from backend.database_backup import DatabaseBackup
+except ImportError:
+    from database_backup import DatabaseBackup
+
+logger = logging.getLogger(__name__)
+
+BACKUP_JOBS_COLLECTION = 'backup_jobs'
+
+# Виды задач
+KIND_BACKUP = 'backup'
+KIND_RESTORE = 'restore'
+
+# Состояния задачи
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+
+# Как часто прогресс записывается в базу
+PROGRESS_INTERVAL = 1.0
+
+# Задача, которая дольше этого не обновлялась, осталась от остановленного процесса
+STALE_SECONDS = 60
+
+
+class BackupJobBusy(Exception):
+    """Другая задача резервного копирования еще выполняется"""
+
+    def __init__(self, job: Optional[dict]):
+        super().__init__("Задача резервного копирования уже выполняется")
+        self.job = job
+
+
+def public_job(job: dict) -> dict:
+    return {key: value for key, value in job.items() if key not in ('_id', 'active')}
+
+
+class BackupJobRunner:
+    """Запуск задач резервного копирования в фоне и учет их хода"""
+
+    def __init__(self, db, on_restored: Optional[Callable[[], Awaitable]] = None):
+        self.db = db
+        # Вызывается после успешного восстановления, например для сброса кэша каталога
+        self.on_restored = on_restored
+        self._tasks = set()
+
+    @property
+    def jobs(self):
+        return self.db[BACKUP_JOBS_COLLECTION]
+
+    async def submit(self, kind: str, **params) -> dict:
+        """Поставить задачу и сразу вернуть ее; бросает BackupJobBusy, если уже идет другая"""
+        await self.expire_stale()
+        now = datetime.utcnow()
+        job = {
+            'id': str(uuid.uuid4()),
+            'kind': kind,
+            'params': params,
+            'status': STATUS_RUNNING,
+            # Поле есть только у выполняющейся задачи, уникальный индекс не дает запустить вторую
+            'active': True,
+            'progress': {},
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'heartbeat_at': now,
+            'finished_at': None,
+        }
+        try:
+            await self.jobs.insert_one(job)
+        except DuplicateKeyError:
+            raise BackupJobBusy(await self.active())
+
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return public_job(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.jobs.find_one({'id': job_id}, {'_id': 0, 'active': 0})
+
+    async def active(self) -> Optional[dict]:
+        return await self.jobs.find_one({'active': True}, {'_id': 0, 'active': 0})
+
+    async def recent(self, limit: int = 10) -> List[dict]:
+        return await self.jobs.find({}, {'_id': 0, 'active': 0}).sort('created_at', DESCENDING).to_list(limit)
+
+    async def expire_stale(self):
+        """Завершить задачи, которые бросил остановленный процесс"""
+        now = datetime.utcnow()
+        await self.jobs.update_many(
+            {'active': True, 'heartbeat_at': {'$lt': now - timedelta(seconds=STALE_SECONDS)}},
+            {'$set': {'status': STATUS_FAILED, 'error': 'Задача прервана остановкой процесса', 'finished_at': now},
+             '$unset': {'active': ''}}
+        )
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, job: dict):
+        progress: Dict[str, dict] = {}
+        backup = DatabaseBackup(self.db, progress=lambda name, values: progress.setdefault(name, {}).update(values))
+        heartbeat = asyncio.create_task(self._write_progress(job['id'], progress))
+        update = {}
+        try:
+            if job['kind'] == KIND_BACKUP:
+                if not await backup.create_backup(**job['params']):
+                    raise RuntimeError("Ошибка при создании резервной копии, подробности в логах")
+                update['result'] = {'snapshot': DatabaseBackup.list_backups()[0]['id']}
+            else:
+                if not await backup.restore_backup(job['params'].get('snapshot_id')):
+                    raise RuntimeError("Ошибка при восстановлении данных, подробности в логах")
+                if self.on_restored:
+                    await self.on_restored()
+                update['result'] = {'database_status': await backup.get_database_status()}
+            update['status'] = STATUS_SUCCEEDED
+        except asyncio.CancelledError:
+            update = {'status': STATUS_FAILED, 'error': 'Задача прервана остановкой процесса'}
+            raise
+        except Exception as e:
+            logger.error(f"Задача резервного копирования {job['id']} не выполнена: {e}")
+            update = {'status': STATUS_FAILED, 'error': str(e)}
+        finally:
+            heartbeat.cancel()
+            await backup.close()
+            update.update(progress=progress, finished_at=datetime.utcnow())
+            await self.jobs.update_one({'id': job['id']}, {'$set': update, '$unset': {'active': ''}})
+
+    async def _write_progress(self, job_id: str, progress: Dict[str, dict]):
+        """Раз в PROGRESS_INTERVAL записать прогресс; заодно это отметка, что задача жива"""
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            try:
+                await self.jobs.update_one(
+                    {'id': job_id, 'active': True},
+                    {'$set': {'progress': progress, 'heartbeat_at': datetime.utcnow()}}
+                )
+            except Exception as e:
+                logger.warning(f"Не удалось записать прогресс задачи {job_id}: {e}")
@@ -0,0 +1,180 @@
+"""
+Кеш каталога в памяти процесса
+Хранит готовые JSON-ответы для товаров и проектов и сбрасывает их при изменениях.
+API и Telegram-бот работают в разных процессах, поэтому каждое изменение
+отмечается счетчиком версии в коллекции catalog_versions; сервер следит за ним
+через change stream (если MongoDB - replica set) или периодическим опросом
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+import logging
+
+logger = logging.getLogger(__name__)
+
+CATALOG_COLLECTIONS = ('products', 'projects')
+VERSIONS_COLLECTION = 'catalog_versions'
+
+# Интервал опроса версий, когда change stream недоступен
+POLL_INTERVAL = 2.0
+
+# Предельное число закешированных ответов на коллекцию
+MAX_ENTRIES = 1024
+
+
+async def bump_catalog_version(db, collection_name: str) -> dict:
+    """Отметить изменение коллекции, чтобы все процессы сбросили кеш"""
+    return await db[VERSIONS_COLLECTION].find_one_and_update(
+        {'_id': collection_name},
+        {'$inc': {'version': 1}, '$currentDate': {'updated_at': True}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    # Хеш содержимого: совпадает у всех процессов и переживает перезапуск
+    etag: str
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "CachedBody":
+        return cls(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Motor возвращает naive datetime в UTC
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+class CatalogCache:
+    """Read-through кеш сериализованных ответов каталога"""
+
+    def __init__(self, db, poll_interval: float = POLL_INTERVAL, max_entries: int = MAX_ENTRIES):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.max_entries = max_entries
+        self.versions: Dict[str, int] = {name: 0 for name in CATALOG_COLLECTIONS}
+        # Время последнего изменения коллекции для Last-Modified
+        self.updated_at: Dict[str, Optional[datetime]] = {name: None for name in CATALOG_COLLECTIONS}
+        self._entries: Dict[str, "OrderedDict[Hashable, CachedBody]"] = {
+            name: OrderedDict() for name in CATALOG_COLLECTIONS
+        }
+        # Поколение растет при каждом сбросе, чтобы не сохранить данные, загруженные до изменения
+        self._generations: Dict[str, int] = {name: 0 for name in CATALOG_COLLECTIONS}
+        # Блокировка загрузки ключа и число запросов, которые ее держат или ждут
+        self._locks: Dict[tuple, Tuple[asyncio.Lock, int]] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def get_or_load(self, collection_name: str, key: Hashable,
+                          loader: Callable[[], Awaitable[bytes]]) -> CachedBody:
+        """Вернуть закешированный ответ или загрузить его через loader"""
+        entries = self._entries[collection_name]
+        cached = entries.get(key)
+        if cached is not None:
+            entries.move_to_end(key)
+            return cached
+
+        # Одновременные промахи по одному ключу загружают данные один раз
+        lock_key = (collection_name, key)
+        lock, users = self._locks.get(lock_key) or (asyncio.Lock(), 0)
+        self._locks[lock_key] = (lock, users + 1)
+        try:
+            async with lock:
+                cached = entries.get(key)
+                if cached is not None:
+                    return cached
+                generation = self._generations[collection_name]
+                cached = CachedBody.from_body(await loader())
+                if generation == self._generations[collection_name]:
+                    entries[key] = cached
+                    if len(entries) > self.max_entries:
+                        entries.popitem(last=False)
+                return cached
+        finally:
+            # Блокировку убирает последний, иначе следующий промах загрузил бы ключ повторно
+            lock, users = self._locks[lock_key]
+            if users == 1:
+                del self._locks[lock_key]
+            else:
+                self._locks[lock_key] = (lock, users - 1)
+
+    def generation(self, collection_name: str) -> int:
+        """Номер сброса кеша: меняется при каждом изменении коллекции"""
+        return self._generations[collection_name]
+
+    def invalidate(self, collection_name: str):
+        self._generations[collection_name] += 1
+        self._entries[collection_name].clear()
+
+    async def changed(self, collection_name: str):
+        """Вызывается после записи через API: сбросить свой кеш и оповестить остальных"""
+        self.invalidate(collection_name)
+        state = await bump_catalog_version(self.db, collection_name)
+        self.versions[collection_name] = state.get('version', 0)
+        self.updated_at[collection_name] = _as_utc(state.get('updated_at'))
+
+    async def refresh_versions(self):
+        """Сверить версии с базой и сбросить устаревшие коллекции"""
+        async for state in self.db[VERSIONS_COLLECTION].find({'_id': {'$in': list(CATALOG_COLLECTIONS)}}):
+            name = state['_id']
+            version = state.get('version', 0)
+            self.updated_at[name] = _as_utc(state.get('updated_at'))
+            if version != self.versions.get(name):
+                self.versions[name] = version
+                self.invalidate(name)
+
+    async def start(self):
+        try:
+            await self.refresh_versions()
+        except PyMongoError as e:
+            logger.warning(f"Не удалось загрузить версии каталога: {e}")
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def _watch(self):
+        try:
+            await self._follow_change_stream()
+        except OperationFailure as e:
+            # Change streams работают только на replica set
+            logger.info(f"Change stream недоступен ({e.code}), кеш каталога проверяет версии каждые {self.poll_interval} с")
+        except PyMongoError as e:
+            logger.warning(f"Change stream каталога прерван: {e}")
+        await self._poll()
+
+    async def _follow_change_stream(self):
+        watched = list(CATALOG_COLLECTIONS) + [VERSIONS_COLLECTION]
+        pipeline = [{'$match': {'ns.coll': {'$in': watched}}}]
+        async with self.db.watch(pipeline) as stream:
+            logger.info("Кеш каталога следит за изменениями через change stream")
+            async for change in stream:
+                collection_name = change.get('ns', {}).get('coll')
+                if collection_name == VERSIONS_COLLECTION:
+                    await self.refresh_versions()
+                elif collection_name in self._entries:
+                    # Изменения в обход API и бота (например, вручную в mongo shell)
+                    self.invalidate(collection_name)
+                    self.updated_at[collection_name] = datetime.now(timezone.utc)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh_versions()
+            except PyMongoError as e:
+                logger.warning(f"Не удалось проверить версии каталога: {e}")
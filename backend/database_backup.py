@@ -1,19 +1,56 @@
 #!/usr/bin/env python3
 """
 Скрипт для работы с резервными копиями базы данных MongoDB
-Позволяет экспортировать и импортировать данные в/из JSON файлов
+Позволяет экспортировать и импортировать данные в/из JSON файлов.
+Коллекции выгружаются потоково в сжатый NDJSON (один документ на строку),
+поэтому память не зависит от размера коллекции.
+
+Каждая копия - папка data/snapshots/<id> с manifest.json. Полная копия
+содержит все документы, инкрементальная - только измененные после отметки
+времени предыдущей копии (по created_at/updated_at) и список id всех живых
+документов, чтобы при восстановлении учесть удаления. Манифест ссылается на
+предыдущую копию, и восстановление проходит цепочку от полной копии.
+В манифесте хранятся SHA-256 и размер каждого файла, восстановление
+сверяет их по ходу чтения. Старые копии удаляются по политике хранения.
+
+Формат bson (export --format bson) пишет документы байтами BSON в том виде,
+в каком их вернул драйвер, без разбора в dict и кодирования, со сжатием
+zstd (если установлен zstandard) или gzip; восстановление передает эти
+байты в insert_many как есть
 """
 
 import asyncio
+import gzip
+import hashlib
 import json
 import os
+import shutil
 import sys
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+from bson import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import logging
 
+# zstd заметно быстрее gzip при том же сжатии, но это необязательная зависимость
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    from backend.backup_codec import DocumentCodec, codec_for
+    from backend.db_indexes import INDEXES
+except ImportError:
+    from backup_codec import DocumentCodec, codec_for
+    from db_indexes import INDEXES
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -31,128 +68,632 @@ BACKUP_DIR = ROOT_DIR / 'data'
 BACKUP_DIR.mkdir(exist_ok=True)
 
 # Коллекции для резервного копирования
-COLLECTIONS = ['products', 'projects', 'orders', 'feedback']
+COLLECTIONS = ['products', 'projects', 'orders', 'feedback', 'cart_items']
+
+# Копии по папкам, старые копии прямо в data/ тоже читаются
+SNAPSHOTS_DIR = BACKUP_DIR / 'snapshots'
+MANIFEST_FILE = 'manifest.json'
+
+# Отметка о восстановлении. Восстановленные документы несут старые created_at/updated_at,
+# и инкрементальная копия их не увидит, поэтому следующая копия после восстановления полная
+RESTORED_MARKER = 'restored'
+
+# Формат файлов: <коллекция>.ndjson.gz, старые копии <коллекция>.json тоже читаются
+BACKUP_SUFFIX = '.ndjson.gz'
+LEGACY_SUFFIX = '.json'
+# Список id живых документов в инкрементальной копии
+IDS_SUFFIX = '.ids.gz'
+
+# Формат копии по умолчанию: json (NDJSON через кодек) или bson (сырые документы)
+BACKUP_FORMATS = ('json', 'bson')
+BACKUP_FORMAT = os.environ.get('BACKUP_FORMAT', 'json')
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Курсор в формате bson отдает документы без разбора в dict
+RAW_BSON = CodecOptions(document_class=RawBSONDocument)
+
+# После стольких инкрементальных копий подряд снова делается полная
+MAX_CHAIN_LENGTH = 48
+
+# Изменения выбираются с запасом: запись, начатая до отметки предыдущей копии,
+# но сохраненная после нее, попадет в следующую копию
+WATERMARK_OVERLAP_SECONDS = 60
+
+# Политика хранения: последняя копия каждого из N последних часов и M последних дней
+# (плюс копии, от которых они зависят по цепочке)
+BACKUP_KEEP_HOURLY = int(os.environ.get('BACKUP_KEEP_HOURLY', 24))
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 7))
+
+# Сколько документов читается из курсора и пишется на диск за раз
+EXPORT_BATCH_SIZE = 1000
+
+# Восстановление: размер пачки insert_many и сколько пачек пишется одновременно
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_IN_FLIGHT = 4
+
+# Суффикс промежуточной коллекции, в которую загружается копия перед подменой
+STAGING_SUFFIX = '__restore'
+
+
+class ChecksumMismatch(Exception):
+    """Файл копии поврежден или изменен после создания"""
+
+
+class ChecksumFile:
+    """Обертка над файлом, считающая SHA-256 и размер всех записанных или прочитанных байт"""
+
+    def __init__(self, file, on_read: Optional[Callable[[int], None]] = None):
+        self._file = file
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.on_read = on_read
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        if self.on_read:
+            self.on_read(len(data))
+        return data
+
+    def flush(self):
+        self._file.flush()
+
+    def info(self) -> dict:
+        return {'sha256': self.sha256.hexdigest(), 'bytes': self.size}
+
+    def verify(self, path: Path, expected: Optional[dict]):
+        """Дочитать файл и сверить с манифестом"""
+        if expected is None:
+            return
+        while self.read(1 << 16):
+            pass
+        if self.sha256.hexdigest() != expected['sha256']:
+            raise ChecksumMismatch(f"Контрольная сумма файла {path} не совпадает с манифестом")
+
+
+class ByteCounter:
+    """Сколько байт файлов копии прочитано; передается в чтение как on_read"""
 
-class DatabaseBackup:
     def __init__(self):
-        self.client = AsyncIOMotorClient(MONGO_URL)
-        self.db = self.client[DB_NAME]
+        self.bytes = 0
+
+    def __call__(self, size: int):
+        self.bytes += size
+
+
+def file_format(backup_format: str) -> str:
+    """Расширение файлов копии: ndjson.gz, bson.zst или bson.gz"""
+    if backup_format == 'bson':
+        return 'bson.zst' if ZSTD_AVAILABLE else 'bson.gz'
+    return 'ndjson.gz'
+
+
+def collection_file(manifest: dict, collection_name: str) -> str:
+    return f"{collection_name}.{manifest.get('format', 'ndjson.gz')}"
+
+
+def compressed_writer(file, path: Path):
+    if path.name.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(file, closefd=False)
+    return gzip.open(file, 'wb', compresslevel=GZIP_LEVEL)
+
+
+def compressed_reader(file, path: Path):
+    if path.name.endswith('.zst'):
+        return zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+    return gzip.open(file, 'rb')
+
+
+@contextmanager
+def open_backup_file(path: Path, checksum: Optional[dict] = None, on_read=None):
+    """Распакованный поток файла копии; при переданной checksum файл сверяется после чтения"""
+    with open(path, 'rb') as raw:
+        hashed = ChecksumFile(raw, on_read)
+        with compressed_reader(hashed, path) as f:
+            yield f
+        hashed.verify(path, checksum)
+
+
+def read_exact(f, size: int) -> bytes:
+    # Поток zstd может вернуть меньше запрошенного
+    data = f.read(size)
+    while len(data) < size:
+        chunk = f.read(size - len(data))
+        if not chunk:
+            raise EOFError("Файл копии обрезан")
+        data += chunk
+    return data
+
+
+def read_lines(path: Path, checksum: Optional[dict] = None, on_read=None) -> Iterator[bytes]:
+    """Строки сжатого файла копии; при переданной checksum файл сверяется по ходу чтения"""
+    with open_backup_file(path, checksum, on_read) as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def read_raw_documents(path: Path, checksum: Optional[dict] = None, on_read=None) -> Iterator[RawBSONDocument]:
+    """Документы BSON подряд: каждый начинается со своей длины (int32 little-endian)"""
+    with open_backup_file(path, checksum, on_read) as f:
+        while True:
+            header = f.read(4)
+            if not header:
+                return
+            header += read_exact(f, 4 - len(header))
+            body = read_exact(f, int.from_bytes(header, 'little') - 4)
+            yield RawBSONDocument(header + body, RAW_BSON)
+
+
+def read_backup_file(path: Path, codec: DocumentCodec, checksum: Optional[dict] = None,
+                     on_read=None) -> Iterator[dict]:
+    """Документы из файла резервной копии по одному; on_read получает размер каждого прочитанного куска"""
+    if path.name.endswith(BACKUP_SUFFIX):
+        for line in read_lines(path, checksum, on_read):
+            yield codec.decode(line)
+    elif '.bson.' in path.name:
+        yield from read_raw_documents(path, checksum, on_read)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            docs = json.load(f)
+        if on_read:
+            on_read(path.stat().st_size)
+        for doc in docs:
+            yield codec.decode_dict(doc)
+
+
+def read_ids(path: Path, checksum: Optional[dict] = None, on_read=None) -> Set[str]:
+    return {line.rstrip(b'\n').decode('utf-8') for line in read_lines(path, checksum, on_read)}
+
+
+def snapshot_dir(snapshot_id: str) -> Path:
+    return SNAPSHOTS_DIR / snapshot_id
+
+
+def read_manifest(snapshot_id: str) -> Optional[dict]:
+    path = snapshot_dir(snapshot_id) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def snapshot_ids() -> List[str]:
+    """Id готовых копий от старых к новым (незавершенные папки без манифеста пропускаются)"""
+    if not SNAPSHOTS_DIR.exists():
+        return []
+    return sorted(path.name for path in SNAPSHOTS_DIR.iterdir() if (path / MANIFEST_FILE).exists())
+
+
+def restore_marker() -> Path:
+    return SNAPSHOTS_DIR / RESTORED_MARKER
+
+
+def snapshot_chain(snapshot_id: str) -> List[dict]:
+    """Манифесты от полной копии до snapshot_id включительно"""
+    chain = []
+    while snapshot_id:
+        manifest = read_manifest(snapshot_id)
+        if manifest is None:
+            raise FileNotFoundError(f"Копия {snapshot_id} не найдена, цепочка копий оборвана")
+        chain.append(manifest)
+        snapshot_id = manifest.get('parent')
+    return chain[::-1]
+
+
+def snapshot_documents(collection_name: str, snapshot_id: Optional[str] = None, on_read=None) -> Iterator[dict]:
+    """Документы коллекции на момент копии: полная копия плюс изменения из цепочки"""
+    chain = snapshot_chain(snapshot_id or snapshot_ids()[-1])
+    codec = codec_for(collection_name)
+    documents = lambda path, checksum, on_read: read_backup_file(path, codec, checksum, on_read)
+
+    def read(manifest: dict, name: str, reader):
+        files = manifest['collections'].get(collection_name, {}).get('files', {})
+        path = snapshot_dir(manifest['id']) / name
+        # Пропавший файл нельзя считать пустой коллекцией: восстановление очистило бы рабочую
+        if not path.exists():
+            raise FileNotFoundError(f"Файл копии {path} отсутствует")
+        return reader(path, files.get(name), on_read)
+
+    # Коллекция, которой нет в манифесте полной копии, в ней не сохранялась
+    if collection_name in chain[0]['collections']:
+        base = read(chain[0], collection_file(chain[0], collection_name), documents)
+    else:
+        base = iter(())
+    if len(chain) == 1:
+        yield from base
+        return
+
+    # Поздние изменения перекрывают ранние; в памяти только измененные документы и id
+    changed = {}
+    for manifest in chain[1:]:
+        for doc in read(manifest, collection_file(manifest, collection_name), documents):
+            changed[doc['id']] = doc
+    alive = read(chain[-1], f"{collection_name}{IDS_SUFFIX}", read_ids)
+
+    for doc in base:
+        if doc['id'] in alive and doc['id'] not in changed:
+            yield doc
+    for doc_id, doc in changed.items():
+        if doc_id in alive:
+            yield doc
+
+
+def snapshot_bytes(collection_name: str, chain: List[dict]) -> int:
+    """Размер файлов коллекции во всех копиях цепочки"""
+    return sum(
+        file['bytes']
+        for manifest in chain
+        for file in manifest['collections'].get(collection_name, {}).get('files', {}).values()
+    )
+
+
+def list_backups() -> List[dict]:
+    """Копии от новых к старым; читаются только манифесты"""
+    backups = []
+    for snapshot_id in reversed(snapshot_ids()):
+        manifest = read_manifest(snapshot_id)
+        collections = manifest['collections']
+        backups.append({
+            'id': snapshot_id,
+            'type': manifest['type'],
+            'format': manifest.get('format', 'ndjson.gz'),
+            'parent': manifest.get('parent'),
+            'created_at': manifest['created_at'],
+            'documents': {name: info['documents'] for name, info in collections.items()},
+            'bytes': sum(file['bytes'] for info in collections.values() for file in info.get('files', {}).values()),
+        })
+    return backups
+
+
+def retained_snapshots(manifests: List[dict]) -> Set[str]:
+    """Id копий, которые остаются по политике хранения"""
+    keep = set()
+    ordered = sorted(manifests, key=lambda manifest: manifest['id'])
+    # Ключ корзины - начало ISO-времени: до часа (13 символов) или до дня (10)
+    for width, count in ((13, BACKUP_KEEP_HOURLY), (10, BACKUP_KEEP_DAILY)):
+        latest_in_bucket = {}
+        for manifest in ordered:
+            latest_in_bucket[manifest['created_at'][:width]] = manifest['id']
+        if count > 0:
+            keep.update(snapshot_id for _, snapshot_id in sorted(latest_in_bucket.items())[-count:])
+    if ordered:
+        keep.add(ordered[-1]['id'])
+
+    # Инкрементальной копии нужны все предыдущие копии ее цепочки
+    parents = {manifest['id']: manifest.get('parent') for manifest in manifests}
+    for snapshot_id in list(keep):
+        while snapshot_id:
+            keep.add(snapshot_id)
+            snapshot_id = parents.get(snapshot_id)
+    return keep
+
+
+def prune_snapshots() -> List[str]:
+    """Удалить копии, которые не нужны по политике хранения; возвращает их id"""
+    manifests = [read_manifest(snapshot_id) for snapshot_id in snapshot_ids()]
+    keep = retained_snapshots(manifests)
+    removed = [manifest['id'] for manifest in manifests if manifest['id'] not in keep]
+    for snapshot_id in removed:
+        shutil.rmtree(snapshot_dir(snapshot_id), ignore_errors=True)
+    if removed:
+        logger.info(f"Удалено старых резервных копий: {len(removed)}")
+    return removed
+
+
+class DatabaseBackup:
+    def __init__(self, db=None, progress: Optional[Callable[[str, dict], None]] = None):
+        # Сервер и бот передают свою базу, чтобы не открывать второй пул соединений
+        self.client = AsyncIOMotorClient(MONGO_URL) if db is None else None
+        self.db = self.client[DB_NAME] if db is None else db
+        # progress(коллекция, {'documents': ..., 'bytes': ...}) вызывается по ходу выгрузки и загрузки
+        self.progress = progress
 
     async def close(self):
-        """Закрыть соединение с БД"""
-        self.client.close()
+        """Закрыть соединение с БД, если его открыл этот объект"""
+        if self.client is not None:
+            self.client.close()
 
-    async def export_collection(self, collection_name: str) -> list:
-        """Экспорт данных из коллекции"""
+    def _report(self, collection_name: str, **values):
+        if self.progress is not None:
+            self.progress(collection_name, values)
+
+    @staticmethod
+    def list_backups() -> List[dict]:
+        return list_backups()
+
+    @staticmethod
+    def backup_file(collection_name: str) -> Optional[Path]:
+        """Файл последней полной копии коллекции или None, если копии нет"""
+        ids = snapshot_ids()
+        if ids:
+            base = read_manifest(read_manifest(ids[-1])['base'])
+            path = snapshot_dir(base['id']) / collection_file(base, collection_name)
+            return path if path.exists() else None
+        for suffix in (BACKUP_SUFFIX, LEGACY_SUFFIX):
+            path = BACKUP_DIR / f"{collection_name}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    async def _dump(self, cursor, path: Path, encode, report=None) -> Tuple[int, dict]:
+        """Записать курсор в сжатый файл, возвращает число документов и SHA-256 файла.
+
+        Курсор читается пачками по EXPORT_BATCH_SIZE, и каждая пачка сразу сжимается
+        и пишется на диск, так что память не зависит от размера коллекции
+        """
+        count = 0
+        with open(path, 'wb') as raw:
+            hashed = ChecksumFile(raw)
+            with compressed_writer(hashed, path) as f:
+                batch = []
+                async for doc in cursor:
+                    batch.append(encode(doc))
+                    if len(batch) >= EXPORT_BATCH_SIZE:
+                        # Сжатие и запись не блокируют event loop
+                        await asyncio.to_thread(f.write, b''.join(batch))
+                        count += len(batch)
+                        batch = []
+                        if report:
+                            report(count, hashed.size)
+                if batch:
+                    await asyncio.to_thread(f.write, b''.join(batch))
+                    count += len(batch)
+        return count, hashed.info()
+
+    async def export_collection(self, collection_name: str, directory: Path,
+                                since: Optional[datetime] = None, backup_format: str = 'json') -> Optional[dict]:
+        """Экспорт коллекции в папку копии, возвращает число документов или None при ошибке.
+
+        Без since выгружаются все документы. С since - только созданные или измененные
+        позже, плюс файл со списком id всех документов коллекции
+        """
+        collection = self.db[collection_name]
+        if backup_format == 'bson':
+            # Байты документов из ответа сервера пишутся как есть
+            source = self.db.get_collection(collection_name, codec_options=RAW_BSON)
+            encode = lambda doc: doc.raw
+        else:
+            source = collection
+            encode = codec_for(collection_name).encode
         try:
-            collection = self.db[collection_name]
-            documents = await collection.find().to_list(None)
-            
-            # Конвертируем ObjectId и datetime в строки для JSON сериализации
-            for doc in documents:
-                if '_id' in doc:
-                    del doc['_id']  # Удаляем ObjectId, используем наш uuid в поле id
-                
-                # Конвертируем datetime объекты в строки
-                for key, value in doc.items():
-                    if hasattr(value, 'isoformat'):
-                        doc[key] = value.isoformat()
-            
-            logger.info(f"Экспортировано {len(documents)} документов из коллекции '{collection_name}'")
-            return documents
-            
+            query = {}
+            if since is not None:
+                query = {'$or': [{'updated_at': {'$gt': since}}, {'created_at': {'$gt': since}}]}
+            files = {}
+            name = f"{collection_name}.{file_format(backup_format)}"
+            changed, files[name] = await self._dump(
+                source.find(query, batch_size=EXPORT_BATCH_SIZE), directory / name, encode,
+                lambda count, size: self._report(collection_name, documents=count, bytes=size)
+            )
+            documents = changed
+            if since is not None:
+                name = f"{collection_name}{IDS_SUFFIX}"
+                documents, files[name] = await self._dump(
+                    collection.find({}, {'_id': 0, 'id': 1}, batch_size=EXPORT_BATCH_SIZE),
+                    directory / name, lambda doc: f"{doc['id']}\n".encode('utf-8')
+                )
+
+            self._report(collection_name, documents=changed, bytes=sum(f['bytes'] for f in files.values()), done=True)
+            logger.info(f"Экспортировано {changed} документов из коллекции '{collection_name}'")
+            return {'documents': documents, 'changed': changed, 'files': files}
+
         except Exception as e:
             logger.error(f"Ошибка при экспорте коллекции '{collection_name}': {e}")
-            return []
+            return None
+
+    async def import_collection(self, collection_name: str, documents: Iterable[dict],
+                                counter: Optional[ByteCounter] = None) -> bool:
+        """Импорт данных в коллекцию.
 
-    async def import_collection(self, collection_name: str, documents: list) -> bool:
-        """Импорт данных в коллекцию"""
+        Документы загружаются пачками неупорядоченных insert_many (не больше
+        IMPORT_MAX_IN_FLIGHT пачек одновременно) в промежуточную коллекцию, затем
+        на ней создаются индексы, и она одним renameCollection подменяет рабочую.
+        Пока идет загрузка, рабочая коллекция остается нетронутой, а при ошибке
+        не меняется вовсе
+        """
+        staging = self.db[f"{collection_name}{STAGING_SUFFIX}"]
+        tasks = set()
+        errors = []
         try:
-            if not documents:
-                logger.info(f"Нет данных для импорта в коллекцию '{collection_name}'")
-                return True
+            # Файл читается в отдельном потоке, чтобы не блокировать event loop
+            documents = iter(documents)
+            next_batch = lambda: list(islice(documents, IMPORT_BATCH_SIZE))
 
-            collection = self.db[collection_name]
-            
-            # Конвертируем строки datetime обратно в datetime объекты
-            for doc in documents:
-                if 'created_at' in doc and isinstance(doc['created_at'], str):
-                    try:
-                        doc['created_at'] = datetime.fromisoformat(doc['created_at'].replace('Z', '+00:00'))
-                    except:
-                        doc['created_at'] = datetime.utcnow()
-            
-            # Очищаем коллекцию перед импортом
-            await collection.delete_many({})
-            
-            # Вставляем документы
-            if documents:
-                await collection.insert_many(documents)
-            
-            logger.info(f"Импортировано {len(documents)} документов в коллекцию '{collection_name}'")
+            async def read_batch() -> list:
+                batch = await asyncio.to_thread(next_batch)
+                # counter считает байты файлов копии, прочитанные для этой пачки
+                if counter is not None:
+                    self._report(collection_name, bytes=counter.bytes)
+                return batch
+
+            batch = await read_batch()
+            await staging.drop()
+            # Пустая копия тоже подменяет рабочую коллекцию, иначе в ней останутся
+            # документы, созданные после копии
+            await self.db.create_collection(staging.name)
+            in_flight = asyncio.Semaphore(IMPORT_MAX_IN_FLIGHT)
+            count = 0
+            loaded = 0
+
+            async def insert(documents: list):
+                nonlocal loaded
+                try:
+                    await staging.insert_many(documents, ordered=False)
+                    loaded += len(documents)
+                    self._report(collection_name, documents=loaded)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    in_flight.release()
+
+            while batch:
+                await in_flight.acquire()
+                task = asyncio.create_task(insert(batch))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                count += len(batch)
+                # Ошибка записи прерывает загрузку, не дожидаясь конца файла
+                if errors:
+                    raise errors[0]
+                batch = await read_batch()
+            await asyncio.gather(*tasks)
+            if errors:
+                raise errors[0]
+
+            if INDEXES.get(collection_name):
+                await staging.create_indexes(INDEXES[collection_name])
+            await staging.rename(collection_name, dropTarget=True)
+
+            logger.info(f"Импортировано {count} документов в коллекцию '{collection_name}'")
             return True
             
         except Exception as e:
             logger.error(f"Ошибка при импорте коллекции '{collection_name}': {e}")
+            await asyncio.gather(*tasks)
+            await staging.drop()
             return False
 
-    async def create_backup(self) -> bool:
-        """Создать полный бэкап всех коллекций"""
+    async def create_backup(self, full: bool = False, backup_format: Optional[str] = None) -> bool:
+        """Создать резервную копию всех коллекций.
+
+        Если есть предыдущая копия, выгружаются только изменения после нее. Полная
+        копия делается по запросу (full), для первой копии, после MAX_CHAIN_LENGTH
+        инкрементальных подряд и когда в списке коллекций появилась новая.
+        backup_format - json или bson, по умолчанию BACKUP_FORMAT
+        """
+        temp = None
+        backup_format = backup_format or BACKUP_FORMAT
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_info = {
-                'timestamp': datetime.now().isoformat(),
-                'collections': {}
-            }
+            if backup_format not in BACKUP_FORMATS:
+                raise ValueError(f"Неизвестный формат копии: {backup_format}")
+            ids = snapshot_ids()
+            parent = read_manifest(ids[-1]) if ids else None
+            marker = restore_marker()
+            restored_at = marker.read_text() if marker.exists() else None
+            incremental = (
+                not full and parent is not None and restored_at is None
+                and len(snapshot_chain(parent['id'])) <= MAX_CHAIN_LENGTH
+                and all(name in parent['collections'] for name in COLLECTIONS)
+            )
+            started = datetime.utcnow()
+            snapshot_id = started.strftime("%Y%m%d_%H%M%S_%f")
+            since = None
+            if incremental:
+                since = datetime.fromisoformat(parent['watermark']) - timedelta(seconds=WATERMARK_OVERLAP_SECONDS)
 
-            logger.info("Начинаем создание резервной копии...")
+            logger.info(f"Начинаем создание {'инкрементальной' if incremental else 'полной'} резервной копии...")
 
-            for collection_name in COLLECTIONS:
-                documents = await self.export_collection(collection_name)
-                
-                # Сохраняем данные в отдельный файл для каждой коллекции
-                backup_file = BACKUP_DIR / f"{collection_name}.json"
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    json.dump(documents, f, ensure_ascii=False, indent=2)
-                
-                backup_info['collections'][collection_name] = len(documents)
+            # Копия собирается во временной папке и появляется целиком
+            temp = SNAPSHOTS_DIR / f"{snapshot_id}.tmp"
+            temp.mkdir(parents=True)
+
+            # Коллекции выгружаются параллельно, каждая в свой файл
+            results = await asyncio.gather(*[self.export_collection(name, temp, since, backup_format) for name in COLLECTIONS])
+            if None in results:
+                shutil.rmtree(temp, ignore_errors=True)
+                return False
+
+            manifest = {
+                'id': snapshot_id,
+                'type': 'incremental' if incremental else 'full',
+                'parent': parent['id'] if incremental else None,
+                'base': parent['base'] if incremental else snapshot_id,
+                'created_at': started.isoformat(),
+                # Следующая инкрементальная копия возьмет изменения после этой отметки
+                'watermark': started.isoformat(),
+                'format': file_format(backup_format),
+                'collections': dict(zip(COLLECTIONS, results)),
+            }
+            with open(temp / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(temp, snapshot_dir(snapshot_id))
+            # Отметку снимает только эта полная копия; восстановление, прошедшее во время нее, оставит новую
+            if restored_at is not None and marker.exists() and marker.read_text() == restored_at:
+                marker.unlink()
 
             # Сохраняем информацию о бэкапе
+            backup_info = {
+                'timestamp': datetime.now().isoformat(),
+                'snapshot': snapshot_id,
+                'type': manifest['type'],
+                'collections': {name: result['documents'] for name, result in manifest['collections'].items()},
+            }
             info_file = BACKUP_DIR / "backup_info.json"
             with open(info_file, 'w', encoding='utf-8') as f:
                 json.dump(backup_info, f, ensure_ascii=False, indent=2)
 
-            logger.info(f"Резервная копия создана успешно. Данные сохранены в папке: {BACKUP_DIR}")
+            logger.info(f"Резервная копия {snapshot_id} создана успешно. Данные сохранены в папке: {SNAPSHOTS_DIR}")
+            await asyncio.to_thread(prune_snapshots)
             return True
 
         except Exception as e:
+            if temp is not None:
+                shutil.rmtree(temp, ignore_errors=True)
             logger.error(f"Ошибка при создании резервной копии: {e}")
             return False
 
-    async def restore_backup(self) -> bool:
-        """Восстановить данные из резервной копии"""
+    async def restore_backup(self, snapshot_id: Optional[str] = None) -> bool:
+        """Восстановить данные из резервной копии (по умолчанию из последней)"""
         try:
             logger.info("Начинаем восстановление из резервной копии...")
 
-            # Проверяем наличие файла с информацией о бэкапе
-            info_file = BACKUP_DIR / "backup_info.json"
-            if info_file.exists():
-                with open(info_file, 'r', encoding='utf-8') as f:
-                    backup_info = json.load(f)
-                logger.info(f"Найдена резервная копия от {backup_info['timestamp']}")
+            ids = snapshot_ids()
+            if snapshot_id is None and ids:
+                snapshot_id = ids[-1]
+            if snapshot_id is not None:
+                chain = snapshot_chain(snapshot_id)
+                logger.info(f"Восстанавливаем копию {snapshot_id} от {chain[-1]['created_at']}: "
+                            f"полная {chain[0]['id']} и {len(chain) - 1} инкрементальных")
+            elif not any(self.backup_file(name) for name in COLLECTIONS):
+                logger.error("Резервные копии не найдены")
+                return False
 
-            success_count = 0
-            for collection_name in COLLECTIONS:
-                backup_file = BACKUP_DIR / f"{collection_name}.json"
-                
-                if backup_file.exists():
-                    with open(backup_file, 'r', encoding='utf-8') as f:
-                        documents = json.load(f)
-                    
-                    if await self.import_collection(collection_name, documents):
-                        success_count += 1
-                else:
-                    logger.warning(f"Файл резервной копии не найден: {backup_file}")
+            # Ставится до загрузки: даже частично восстановленная база требует полной копии
+            SNAPSHOTS_DIR.mkdir(parents=True, exist_ok=True)
+            restore_marker().write_text(datetime.utcnow().isoformat())
+
+            async def restore_collection(collection_name: str) -> bool:
+                if snapshot_id is not None:
+                    if collection_name not in chain[-1]['collections']:
+                        # Коллекция появилась позже копии, ее данные не трогаем
+                        logger.warning(f"Коллекции '{collection_name}' нет в копии {snapshot_id}")
+                        return True
+                    # bytes растет по мере чтения файлов цепочки, total_bytes - их общий размер
+                    self._report(collection_name, documents=0, bytes=0,
+                                 total=chain[-1]['collections'].get(collection_name, {}).get('documents'),
+                                 total_bytes=snapshot_bytes(collection_name, chain))
+                    counter = ByteCounter()
+                    success = await self.import_collection(
+                        collection_name, snapshot_documents(collection_name, snapshot_id, counter), counter
+                    )
+                    self._report(collection_name, done=success)
+                    return success
+                # Копия старого формата прямо в папке data
+                backup_file = self.backup_file(collection_name)
+                if not backup_file:
+                    # Старые копии делались до появления части коллекций (cart_items), их данные не трогаем
+                    logger.warning(f"Файл резервной копии не найден для коллекции '{collection_name}'")
+                    return True
+                counter = ByteCounter()
+                self._report(collection_name, documents=0, bytes=0, total_bytes=backup_file.stat().st_size)
+                success = await self.import_collection(
+                    collection_name, read_backup_file(backup_file, codec_for(collection_name), on_read=counter), counter
+                )
+                self._report(collection_name, done=success)
+                return success
+
+            # Коллекции восстанавливаются параллельно
+            results = await asyncio.gather(*[restore_collection(name) for name in COLLECTIONS])
+            success_count = sum(results)
 
             if success_count == len(COLLECTIONS):
                 logger.info("Все данные успешно восстановлены из резервной копии!")
@@ -189,9 +730,10 @@ class DatabaseBackup:
 async def main():
     """Главная функция для работы из командной строки"""
     if len(sys.argv) < 2:
-        print("Usage: python database_backup.py [export|import|status]")
-        print("  export - создать резервную копию")
-        print("  import - восстановить из резервной копии")
+        print("Usage: python database_backup.py [export [--full] [--format json|bson]|import [snapshot_id]|list|status]")
+        print("  export - создать резервную копию (инкрементальную, если есть предыдущая)")
+        print("  import - восстановить из последней или указанной резервной копии")
+        print("  list   - список резервных копий")
         print("  status - показать состояние базы данных")
         return
 
@@ -200,19 +742,30 @@ async def main():
 
     try:
         if command == 'export':
-            success = await backup.create_backup()
+            options = sys.argv[2:]
+            backup_format = options[options.index('--format') + 1] if '--format' in options[:-1] else None
+            success = await backup.create_backup(full='--full' in options, backup_format=backup_format)
             if success:
                 print("✅ Резервная копия создана успешно!")
             else:
                 print("❌ Ошибка при создании резервной копии")
                 
         elif command == 'import':
-            success = await backup.restore_backup()
+            success = await backup.restore_backup(sys.argv[2] if len(sys.argv) > 2 else None)
             if success:
                 print("✅ Данные восстановлены успешно!")
             else:
                 print("❌ Ошибка при восстановлении данных")
                 
+        elif command == 'list':
+            backups = list_backups()
+            print("\n💾 Резервные копии:")
+            print("-" * 30)
+            for b in backups:
+                print(f"{b['id']}  {b['type']:<11}  {b['format']:<9}  {b['bytes'] / 1024:.0f} КБ  {sum(b['documents'].values())} документов")
+            if not backups:
+                print("Резервных копий нет")
+
         elif command == 'status':
             status = await backup.get_database_status()
             print("\n📊 Состояние базы данных:")
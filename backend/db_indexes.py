@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Управление индексами MongoDB
+Описывает индексы всех коллекций, к которым обращается API,
+создает их идемпотентно при старте сервера и показывает их состояние
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
+import logging
+
+try:
+    from backend.idempotency import IDEMPOTENCY_TTL_SECONDS
+except ImportError:
+    from idempotency import IDEMPOTENCY_TTL_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+# Инкрементальная копия выбирает документы по $or из created_at и updated_at,
+# индекс нужен каждой ветке, иначе копия читает коллекцию целиком.
+# updated_at есть только у измененных документов, поэтому индекс разреженный
+UPDATED_AT_INDEX = IndexModel([('updated_at', ASCENDING)], name='updated_at', sparse=True)
+
+# Индексы по коллекциям
+INDEXES = {
+    'products': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        # Порядок каталога и keyset-пагинация
+        IndexModel([('created_at', ASCENDING), ('id', ASCENDING)], name='created_at_id'),
+        # Фильтры каталога по типизированным характеристикам
+        IndexModel([('brand', ASCENDING)], name='brand'),
+        IndexModel([('cooling_kw', ASCENDING)], name='cooling_kw'),
+        IndexModel([('area_m2', ASCENDING)], name='area_m2'),
+        IndexModel([('price', ASCENDING)], name='price'),
+        UPDATED_AT_INDEX,
+        # Полнотекстовый поиск с русской морфологией, название важнее описания
+        IndexModel([('name', TEXT), ('short_description', TEXT), ('description', TEXT)], name='text_search',
+                   weights={'name': 10, 'short_description': 5, 'description': 1},
+                   default_language='russian'),
+    ],
+    'cart_items': [
+        # Одна строка корзины на товар, на этом держится атомарный $inc upsert
+        IndexModel([('user_id', ASCENDING), ('product_id', ASCENDING)], name='user_product_unique', unique=True),
+        IndexModel([('id', ASCENDING), ('user_id', ASCENDING)], name='id_user'),
+        IndexModel([('created_at', ASCENDING)], name='created_at'),
+        UPDATED_AT_INDEX,
+    ],
+    'projects': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        IndexModel([('created_at', ASCENDING)], name='created_at'),
+        UPDATED_AT_INDEX,
+    ],
+    'orders': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        IndexModel([('created_at', DESCENDING)], name='created_at'),
+        IndexModel([('tg_user_id', ASCENDING), ('created_at', DESCENDING)], name='user_created_at'),
+        UPDATED_AT_INDEX,
+    ],
+    'feedback': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        IndexModel([('created_at', DESCENDING)], name='created_at'),
+        UPDATED_AT_INDEX,
+    ],
+    'notifications_outbox': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        # Выборка готовых к отправке уведомлений
+        IndexModel([('status', ASCENDING), ('next_attempt_at', ASCENDING)], name='status_next_attempt'),
+        # Отправленные уведомления хранятся 30 дней
+        IndexModel([('sent_at', ASCENDING)], name='sent_at_ttl', expireAfterSeconds=30 * 24 * 3600),
+    ],
+    'idempotency_keys': [
+        # Ключ - это _id, уникальность обеспечивает MongoDB; здесь только срок хранения
+        IndexModel([('created_at', ASCENDING)], name='created_at_ttl', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    'backup_jobs': [
+        IndexModel([('id', ASCENDING)], name='id_unique', unique=True),
+        # Поле active есть только у выполняющейся задачи, так что она всегда одна
+        IndexModel([('active', ASCENDING)], name='active_unique', unique=True,
+                   partialFilterExpression={'active': True}),
+        IndexModel([('created_at', DESCENDING)], name='created_at'),
+        # Завершенные задачи хранятся 30 дней
+        IndexModel([('finished_at', ASCENDING)], name='finished_at_ttl', expireAfterSeconds=30 * 24 * 3600),
+    ],
+}
+
+
+async def ensure_indexes(db, collections=None) -> dict:
+    """Создать недостающие индексы. Повторный запуск ничего не меняет.
+
+    Каждый индекс создается отдельно, чтобы ошибка одного (например, дубликаты
+    под уникальным индексом) не мешала остальным
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        if collections is not None and collection_name not in collections:
+            continue
+        collection = db[collection_name]
+        report[collection_name] = {}
+        for model in models:
+            name = model.document['name']
+            try:
+                await collection.create_indexes([model])
+                report[collection_name][name] = 'ok'
+            except OperationFailure as e:
+                logger.error(f"Не удалось создать индекс {collection_name}.{name}: {e}")
+                report[collection_name][name] = f"error: {e}"
+    return report
+
+
+async def index_builds_in_progress(db) -> list:
+    """Индексы, которые сейчас строятся (требует права на currentOp)"""
+    try:
+        result = await db.client.admin.command({
+            'currentOp': True,
+            '$or': [
+                {'command.createIndexes': {'$exists': True}},
+                {'msg': {'$regex': '^Index Build'}},
+            ],
+        })
+    except OperationFailure as e:
+        logger.warning(f"Нет доступа к currentOp: {e}")
+        return []
+
+    builds = []
+    for op in result.get('inprog', []):
+        if not op.get('ns', '').startswith(f"{db.name}."):
+            continue
+        progress = op.get('progress') or {}
+        builds.append({
+            'collection': op['ns'].split('.', 1)[1],
+            'indexes': [index.get('name') for index in op.get('command', {}).get('indexes', [])],
+            'done': progress.get('done'),
+            'total': progress.get('total'),
+            'msg': op.get('msg'),
+        })
+    return builds
+
+
+async def index_status(db) -> dict:
+    """Список индексов по коллекциям со статистикой использования"""
+    status = {}
+    for collection_name in INDEXES:
+        collection = db[collection_name]
+        declared = {model.document['name'] for model in INDEXES[collection_name]}
+        existing = await collection.index_information()
+
+        usage = {}
+        try:
+            async for stats in collection.aggregate([{'$indexStats': {}}]):
+                usage[stats['name']] = {
+                    'ops': stats.get('accesses', {}).get('ops', 0),
+                    'since': stats.get('accesses', {}).get('since'),
+                }
+        except OperationFailure as e:
+            logger.warning(f"Нет статистики индексов для '{collection_name}': {e}")
+
+        status[collection_name] = {
+            name: {
+                'key': info.get('key'),
+                'unique': info.get('unique', False),
+                'declared': name in declared or name == '_id_',
+                'ops': usage.get(name, {}).get('ops'),
+                'since': usage.get(name, {}).get('since'),
+            }
+            for name, info in existing.items()
+        }
+        for name in declared - set(existing):
+            status[collection_name][name] = {'key': None, 'unique': False, 'declared': True,
+                                             'ops': None, 'since': None, 'missing': True}
+
+    status['_builds'] = await index_builds_in_progress(db)
+    return status
+
+
+async def main():
+    """Главная функция для работы из командной строки"""
+    if len(sys.argv) < 2:
+        print("Usage: python db_indexes.py [ensure|status]")
+        print("  ensure - создать недостающие индексы")
+        print("  status - показать индексы, их использование и текущие сборки")
+        return
+
+    command = sys.argv[1].lower()
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        if command == 'ensure':
+            report = await ensure_indexes(db)
+            for collection_name, indexes in report.items():
+                for name, result in indexes.items():
+                    mark = '✅' if result == 'ok' else '❌'
+                    print(f"{mark} {collection_name}.{name}: {result}")
+
+        elif command == 'status':
+            status = await index_status(db)
+            builds = status.pop('_builds')
+            print("\n📊 Индексы базы данных:")
+            for collection_name, indexes in status.items():
+                print("-" * 30)
+                print(collection_name)
+                for name, info in indexes.items():
+                    if info.get('missing'):
+                        print(f"  ❌ {name}: не создан")
+                        continue
+                    ops = info['ops'] if info['ops'] is not None else '?'
+                    extra = '' if info['declared'] else ' (не описан в db_indexes.py)'
+                    print(f"  {name}: {info['key']} unique={info['unique']} обращений={ops}{extra}")
+            print("-" * 30)
+            if builds:
+                print("Сейчас строятся:")
+                for build in builds:
+                    print(f"  {build['collection']}: {build['indexes']} {build['done']}/{build['total']} {build['msg'] or ''}")
+            else:
+                print("Индексы сейчас не строятся")
+
+        else:
+            print(f"Неизвестная команда: {command}")
+
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
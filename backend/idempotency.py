@@ -0,0 +1,96 @@
+"""
+Ключи идемпотентности
+Клиент передает Idempotency-Key, и повтор того же запроса (например, после
+обрыва связи) возвращает сохраненный ответ вместо повторного выполнения.
+Ключи хранятся в коллекции idempotency_keys и удаляются по TTL-индексу
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_COLLECTION = 'idempotency_keys'
+
+# Сколько хранится ключ (TTL-индекс в db_indexes.py)
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+
+MAX_KEY_LENGTH = 255
+
+# Незавершенный запрос старше этого считается упавшим, и ключ можно занять заново
+IN_PROGRESS_TIMEOUT_SECONDS = 60
+
+# Состояния ключа
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_COMPLETED = 'completed'
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже использован с другим запросом или запрос еще выполняется"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def request_fingerprint(payload) -> str:
+    """Хеш тела запроса, чтобы тот же ключ нельзя было использовать для другого заказа"""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def record_id(scope: str, key: str) -> str:
+    return f"{scope}:{key}"
+
+
+async def begin_request(db, scope: str, key: str, fingerprint: str) -> Optional[dict]:
+    """Занять ключ. Возвращает сохраненный ответ, если запрос уже выполнен, иначе None.
+
+    Бросает IdempotencyConflict, если ключ занят другим запросом или тот же запрос
+    еще выполняется
+    """
+    collection = db[IDEMPOTENCY_COLLECTION]
+    try:
+        await collection.insert_one({
+            '_id': record_id(scope, key),
+            'fingerprint': fingerprint,
+            'status': STATUS_IN_PROGRESS,
+            'created_at': datetime.utcnow(),
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    record = await collection.find_one({'_id': record_id(scope, key)})
+    if record is None:
+        # Ключ успели освободить после ошибки - пробуем занять снова
+        return await begin_request(db, scope, key, fingerprint)
+    if record['fingerprint'] != fingerprint:
+        raise IdempotencyConflict('mismatch')
+    if record['status'] != STATUS_COMPLETED:
+        cutoff = datetime.utcnow() - timedelta(seconds=IN_PROGRESS_TIMEOUT_SECONDS)
+        taken = await collection.update_one(
+            {'_id': record['_id'], 'status': STATUS_IN_PROGRESS, 'created_at': {'$lte': cutoff}},
+            {'$set': {'created_at': datetime.utcnow()}}
+        )
+        if taken.modified_count:
+            return None
+        raise IdempotencyConflict('in_progress')
+    return record['response']
+
+
+async def complete_request(db, scope: str, key: str, response: dict, session=None):
+    """Сохранить ответ (в той же транзакции, что и результат запроса, если передан session)"""
+    await db[IDEMPOTENCY_COLLECTION].update_one(
+        {'_id': record_id(scope, key)},
+        {'$set': {'status': STATUS_COMPLETED, 'response': response, 'completed_at': datetime.utcnow()}},
+        session=session
+    )
+
+
+async def release_request(db, scope: str, key: str):
+    """Освободить ключ после ошибки, чтобы клиент мог повторить запрос"""
+    await db[IDEMPOTENCY_COLLECTION].delete_one(
+        {'_id': record_id(scope, key), 'status': STATUS_IN_PROGRESS}
+    )
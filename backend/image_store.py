@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Хранилище изображений с адресацией по содержимому
+Каждое изображение сохраняется на диск один раз под своим SHA-256,
+а в документах MongoDB остается только короткая ссылка /api/images/{hash}
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+try:
+    from backend.catalog_cache import bump_catalog_version
+except ImportError:
+    from catalog_cache import bump_catalog_version
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+# Папка для хранения изображений
+IMAGE_STORE_DIR = Path(os.environ.get('IMAGE_STORE_DIR', ROOT_DIR / 'media' / 'images'))
+
+# Префикс ссылок на изображения в документах
+IMAGE_URL_PREFIX = '/api/images/'
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Сигнатуры форматов для определения Content-Type
+MAGIC_NUMBERS = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+MIGRATION_BATCH_SIZE = 100
+
+
+def is_valid_digest(digest: str) -> bool:
+    return bool(DIGEST_RE.match(digest))
+
+
+def guess_media_type(header: bytes) -> str:
+    """Определить тип изображения по первым байтам"""
+    for magic, media_type in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return media_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+def decode_data_url(value: str) -> Optional[bytes]:
+    """Достать байты из строки data:image/...;base64,..."""
+    header, separator, payload = value.partition(',')
+    if not separator or not header.startswith('data:') or not header.lower().endswith(';base64'):
+        return None
+    try:
+        return base64.b64decode(payload)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def digest_from_url(value) -> Optional[str]:
+    """Вернуть хеш изображения, если строка - ссылка на хранилище"""
+    if isinstance(value, str) and value.startswith(IMAGE_URL_PREFIX):
+        digest = value[len(IMAGE_URL_PREFIX):].split('?', 1)[0]
+        if is_valid_digest(digest):
+            return digest
+    return None
+
+
+class ImageStore:
+    def __init__(self, root: Path = IMAGE_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        """Путь к файлу изображения (первые два символа хеша - подпапка)"""
+        return self.root / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        """Сохранить изображение и вернуть его SHA-256"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и переименовываем, чтобы читатели не видели недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return digest
+
+    def get_path(self, digest: str) -> Optional[Path]:
+        """Путь к существующему изображению или None"""
+        if not is_valid_digest(digest):
+            return None
+        path = self.path_for(digest)
+        return path if path.exists() else None
+
+    def media_type(self, path: Path) -> str:
+        with open(path, 'rb') as f:
+            return guess_media_type(f.read(12))
+
+    def url_for(self, digest: str) -> str:
+        return f"{IMAGE_URL_PREFIX}{digest}"
+
+    def save(self, data: bytes) -> str:
+        """Сохранить изображение и вернуть ссылку для документа"""
+        return self.url_for(self.put(data))
+
+    def externalize(self, value):
+        """Заменить data URL на ссылку в хранилище, остальные значения вернуть как есть"""
+        if not isinstance(value, str) or not value.startswith('data:'):
+            return value
+        data = decode_data_url(value)
+        if data is None:
+            return value
+        return self.save(data)
+
+
+async def migrate_images(db, store: ImageStore) -> dict:
+    """Перенести data URL из товаров и проектов в хранилище изображений"""
+    stats = {'products': 0, 'projects': 0}
+
+    async def flush(collection_name: str, batch: list):
+        if batch:
+            result = await db[collection_name].bulk_write(batch, ordered=False)
+            stats[collection_name] += result.modified_count
+            batch.clear()
+
+    batch = []
+    cursor = db.products.find({'image_url': {'$regex': '^data:'}}, {'_id': 1, 'image_url': 1})
+    async for product in cursor:
+        url = await asyncio.to_thread(store.externalize, product['image_url'])
+        if url != product['image_url']:
+            batch.append(UpdateOne({'_id': product['_id']}, {'$set': {'image_url': url}, '$currentDate': {'updated_at': True}}))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            await flush('products', batch)
+    await flush('products', batch)
+
+    # Проекты из API хранят список в images, из бота - в image_urls
+    query = {'$or': [{'images': {'$regex': '^data:'}}, {'image_urls': {'$regex': '^data:'}}]}
+    cursor = db.projects.find(query, {'_id': 1, 'images': 1, 'image_urls': 1})
+    async for project in cursor:
+        update = {}
+        for field in ('images', 'image_urls'):
+            if isinstance(project.get(field), list):
+                urls = [await asyncio.to_thread(store.externalize, url) for url in project[field]]
+                if urls != project[field]:
+                    update[field] = urls
+        if update:
+            batch.append(UpdateOne({'_id': project['_id']}, {'$set': update, '$currentDate': {'updated_at': True}}))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            await flush('projects', batch)
+    await flush('projects', batch)
+
+    logger.info(f"Изображения перенесены в хранилище: товаров {stats['products']}, проектов {stats['projects']}")
+    return stats
+
+
+async def main():
+    """Главная функция для работы из командной строки"""
+    if len(sys.argv) < 2 or sys.argv[1].lower() != 'migrate':
+        print("Usage: python image_store.py migrate")
+        print("  migrate - перенести изображения из документов в хранилище")
+        return
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        stats = await migrate_images(client[DB_NAME], ImageStore())
+        for collection_name, updated in stats.items():
+            if updated:
+                await bump_catalog_version(client[DB_NAME], collection_name)
+        print(f"✅ Обновлено товаров: {stats['products']}, проектов: {stats['projects']}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
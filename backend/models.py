@@ -0,0 +1,132 @@
+"""
+Модели API и документов MongoDB
+Вынесены из server.py, чтобы их могли использовать скрипты (резервное
+копирование) без импорта всего приложения
+"""
+
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+try:
+    from backend.idempotency import MAX_KEY_LENGTH
+except ImportError:
+    from idempotency import MAX_KEY_LENGTH
+
+
+class Product(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    description: str
+    short_description: str
+    price: float
+    image_url: str
+    specifications: dict = Field(default_factory=dict)
+    # Typed values extracted from specifications at write time
+    brand: Optional[str] = None
+    cooling_kw: Optional[float] = None
+    area_m2: Optional[float] = None
+    noise_db: Optional[float] = None
+    power_kw: Optional[float] = None
+    energy_class: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ProductCreate(BaseModel):
+    name: str
+    description: str
+    short_description: str
+    price: float
+    image_url: str
+    specifications: dict = Field(default_factory=dict)
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class PriceRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class SearchFacets(BaseModel):
+    brands: List[FacetValue] = Field(default_factory=list)
+    power: List[FacetValue] = Field(default_factory=list)
+    area: List[FacetValue] = Field(default_factory=list)
+    efficiency: List[FacetValue] = Field(default_factory=list)
+    price: PriceRange = Field(default_factory=PriceRange)
+
+class ProductSearchResult(BaseModel):
+    items: List[Product]
+    total: int
+    facets: SearchFacets
+
+class CartItem(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str  # Telegram user ID for cart isolation
+    product_id: str
+    product_name: str
+    price: float
+    quantity: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class CartItemCreate(BaseModel):
+    user_id: str  # Telegram user ID for cart isolation
+    product_id: str
+    quantity: int = 1
+
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(..., ge=0)
+
+class CartSummary(BaseModel):
+    items: List[CartItem]
+    total_amount: float
+    total_quantity: int
+
+class FeedbackForm(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    phone: str
+    message: str
+    tg_user_id: Optional[str] = None
+    tg_username: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class FeedbackFormCreate(BaseModel):
+    name: str
+    phone: str
+    message: str
+    tg_user_id: Optional[str] = None
+    tg_username: Optional[str] = None
+
+class Project(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    title: str
+    description: str
+    address: str
+    images: List[str]
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Order(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    items: List[CartItem]
+    total_amount: float
+    tg_user_id: Optional[str] = None
+    tg_username: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    status: str = "pending"
+
+class OrderCreate(BaseModel):
+    items: List[CartItem]
+    tg_user_id: Optional[str] = None
+    tg_username: Optional[str] = None
+    # Same as the Idempotency-Key header, for clients that cannot set headers
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=MAX_KEY_LENGTH)
+
+class OrderFromCart(BaseModel):
+    tg_user_id: Optional[str] = None
+    tg_username: Optional[str] = None
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=MAX_KEY_LENGTH)
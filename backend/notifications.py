@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Очередь уведомлений владельцу (transactional outbox)
+Заказы и заявки записывают текст уведомления в коллекцию notifications_outbox
+вместе с самим документом, а фоновый обработчик отправляет их в Telegram
+с повторами, экспоненциальной задержкой и учетом retry_after.
+Уведомления, которые так и не удалось отправить, остаются со статусом dead.
+Когда очередь в один чат растет, уведомления объединяются в сводку
+"""
+
+import asyncio
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+import httpx
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+OUTBOX_COLLECTION = 'notifications_outbox'
+
+# Статусы уведомлений
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+# Повторы: задержка удваивается от BASE_DELAY до MAX_DELAY, после MAX_ATTEMPTS - dead
+MAX_ATTEMPTS = 8
+BASE_DELAY = 2.0
+MAX_DELAY = 600.0
+
+# Сколько уведомление может оставаться в отправке, прежде чем его заберет другой обработчик
+LEASE_SECONDS = 60
+
+# Интервал проверки очереди, если новых уведомлений не было
+POLL_INTERVAL = 5.0
+
+# Если в очереди в один чат скопилось DIGEST_MIN_ITEMS уведомлений и больше,
+# они уходят одним сообщением-сводкой
+DIGEST_MIN_ITEMS = 3
+DIGEST_MAX_ITEMS = 20
+# Лимит Telegram на длину сообщения - 4096 символов
+DIGEST_MAX_LENGTH = 3800
+DIGEST_SEPARATOR = '\n➖➖➖➖➖\n'
+
+# Формы слов для заголовка сводки: 1, 2-4, 5+
+KIND_WORDS = {
+    'order': ('новый заказ', 'новых заказа', 'новых заказов'),
+    'feedback': ('новая заявка', 'новые заявки', 'новых заявок'),
+}
+
+
+def new_notification(chat_id, text: str, kind: str, ref_id: Optional[str] = None) -> dict:
+    now = datetime.utcnow()
+    return {
+        'id': str(uuid.uuid4()),
+        'kind': kind,
+        'ref_id': ref_id,
+        'chat_id': chat_id,
+        'text': text,
+        'status': STATUS_PENDING,
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now,
+        'last_error': None,
+    }
+
+
+async def enqueue_notification(db, chat_id, text: str, kind: str,
+                               ref_id: Optional[str] = None, session=None) -> dict:
+    """Записать уведомление в очередь (в той же транзакции, что и документ, если передан session)"""
+    notification = new_notification(chat_id, text, kind, ref_id)
+    await db[OUTBOX_COLLECTION].insert_one(notification, session=session)
+    return notification
+
+
+def plural(count: int, forms: tuple) -> str:
+    if count % 10 == 1 and count % 100 != 11:
+        return forms[0]
+    if 2 <= count % 10 <= 4 and not 12 <= count % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+def digest_text(notifications: List[dict]) -> str:
+    """Собрать несколько уведомлений в одно сообщение с заголовком-итогом"""
+    counts = {}
+    for notification in notifications:
+        counts[notification.get('kind')] = counts.get(notification.get('kind'), 0) + 1
+    parts = []
+    for kind, count in counts.items():
+        forms = KIND_WORDS.get(kind, ('новое уведомление', 'новых уведомления', 'новых уведомлений'))
+        parts.append(f"{count} {plural(count, forms)}")
+
+    oldest = min(n['created_at'] for n in notifications)
+    seconds = max(1, round((datetime.utcnow() - oldest).total_seconds()))
+    header = f"📬 <b>{', '.join(parts)} за последние {seconds} с</b>"
+    return header + DIGEST_SEPARATOR + DIGEST_SEPARATOR.join(n['text'].strip() for n in notifications)
+
+
+def backoff_delay(attempts: int) -> float:
+    """Задержка перед следующей попыткой со случайным разбросом, чтобы повторы не шли пачкой"""
+    delay = min(MAX_DELAY, BASE_DELAY * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class NotificationDispatcher:
+    """Фоновая отправка уведомлений из notifications_outbox"""
+
+    def __init__(self, db, telegram, poll_interval: float = POLL_INTERVAL, max_attempts: int = MAX_ATTEMPTS):
+        self.db = db
+        self.telegram = telegram
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def outbox(self):
+        return self.db[OUTBOX_COLLECTION]
+
+    def notify(self):
+        """Разбудить обработчик сразу после записи нового уведомления"""
+        self._wakeup.set()
+
+    async def start(self):
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def claim(self) -> Optional[dict]:
+        """Атомарно забрать одно готовое к отправке уведомление"""
+        now = datetime.utcnow()
+        return await self.outbox.find_one_and_update(
+            {'$or': [
+                {'status': STATUS_PENDING, 'next_attempt_at': {'$lte': now}},
+                # Обработчик, забравший уведомление, упал посреди отправки
+                {'status': STATUS_SENDING, 'locked_until': {'$lte': now}},
+            ]},
+            {'$set': {'status': STATUS_SENDING, 'locked_until': now + timedelta(seconds=LEASE_SECONDS)}},
+            sort=[('next_attempt_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def claim_backlog(self, first: dict) -> List[dict]:
+        """Забрать накопившиеся уведомления в тот же чат, если их хватает на сводку"""
+        if first.get('no_digest'):
+            return [first]
+        now = datetime.utcnow()
+        query = {'status': STATUS_PENDING, 'next_attempt_at': {'$lte': now}, 'chat_id': first['chat_id'],
+                 'no_digest': {'$ne': True}}
+        candidates = await self.outbox.find(query, {'id': 1, 'text': 1}).sort(
+            'next_attempt_at', ASCENDING
+        ).limit(DIGEST_MAX_ITEMS - 1).to_list(DIGEST_MAX_ITEMS - 1)
+        if len(candidates) + 1 < DIGEST_MIN_ITEMS:
+            return [first]
+
+        # Сводка должна уместиться в одно сообщение
+        length = len(first['text'])
+        ids = []
+        for candidate in candidates:
+            length += len(candidate['text']) + len(DIGEST_SEPARATOR)
+            if length > DIGEST_MAX_LENGTH:
+                break
+            ids.append(candidate['id'])
+        if not ids:
+            return [first]
+
+        # Другой обработчик мог забрать часть кандидатов, поэтому перечитываем по метке
+        claim_id = str(uuid.uuid4())
+        await self.outbox.update_many(
+            {'id': {'$in': ids}, 'status': STATUS_PENDING},
+            {'$set': {'status': STATUS_SENDING, 'claim_id': claim_id,
+                      'locked_until': now + timedelta(seconds=LEASE_SECONDS)}}
+        )
+        claimed = await self.outbox.find({'claim_id': claim_id}).sort(
+            'next_attempt_at', ASCENDING
+        ).to_list(len(ids))
+        return [first] + claimed
+
+    async def deliver(self, notifications: List[dict]):
+        """Отправить уведомление (или сводку из нескольких) и записать результат"""
+        text = notifications[0]['text'] if len(notifications) == 1 else digest_text(notifications)
+        try:
+            result = await self.telegram.send_message(notifications[0]['chat_id'], text)
+        except (httpx.HTTPError, ValueError) as e:
+            # Сеть, таймаут или не JSON в ответе - повторим позже
+            await self._failed(notifications, f"{type(e).__name__}: {e}")
+            return
+
+        if result.get('ok'):
+            await self.outbox.update_many(
+                {'id': {'$in': [n['id'] for n in notifications]}},
+                {'$set': {'status': STATUS_SENT, 'sent_at': datetime.utcnow(), 'last_error': None,
+                          'digest_size': len(notifications)},
+                 '$inc': {'attempts': 1},
+                 '$unset': {'locked_until': '', 'claim_id': ''}}
+            )
+            return
+
+        error_code = result.get('error_code')
+        error = f"{error_code}: {result.get('description')}"
+        if error_code == 429:
+            # Telegram сам говорит, сколько ждать; такая попытка не считается неудачной
+            retry_after = float((result.get('parameters') or {}).get('retry_after', BASE_DELAY))
+            for notification in notifications:
+                await self._retry(notification, notification.get('attempts', 0), retry_after, error)
+        elif isinstance(error_code, int) and 400 <= error_code < 500:
+            if len(notifications) == 1:
+                # Неверный chat_id, бот заблокирован и т.п. - повтор не поможет
+                await self._dead(notifications[0], notifications[0].get('attempts', 0) + 1, error)
+            else:
+                # Сводку не приняли - отправляем уведомления по одному, чтобы найти проблемное
+                await self.outbox.update_many(
+                    {'id': {'$in': [n['id'] for n in notifications]}},
+                    {'$set': {'status': STATUS_PENDING, 'no_digest': True, 'last_error': error,
+                              'next_attempt_at': datetime.utcnow()},
+                     '$unset': {'locked_until': '', 'claim_id': ''}}
+                )
+        else:
+            await self._failed(notifications, error)
+
+    async def _failed(self, notifications: List[dict], error: str):
+        for notification in notifications:
+            attempts = notification.get('attempts', 0) + 1
+            await self._retry(notification, attempts, backoff_delay(attempts), error)
+
+    async def _retry(self, notification: dict, attempts: int, delay: float, error: str):
+        if attempts >= self.max_attempts:
+            await self._dead(notification, attempts, error)
+            return
+        logger.warning(f"Уведомление {notification['id']} не отправлено ({error}), повтор через {delay:.1f} с")
+        await self.outbox.update_one(
+            {'id': notification['id']},
+            {'$set': {'status': STATUS_PENDING, 'attempts': attempts, 'last_error': error,
+                      'next_attempt_at': datetime.utcnow() + timedelta(seconds=delay)},
+             '$unset': {'locked_until': '', 'claim_id': ''}}
+        )
+
+    async def _dead(self, notification: dict, attempts: int, error: str):
+        logger.error(f"Уведомление {notification['id']} ({notification.get('kind')}) не доставлено: {error}")
+        await self.outbox.update_one(
+            {'id': notification['id']},
+            {'$set': {'status': STATUS_DEAD, 'attempts': attempts, 'last_error': error,
+                      'dead_at': datetime.utcnow()},
+             '$unset': {'locked_until': '', 'claim_id': ''}}
+        )
+
+    async def _run(self):
+        while True:
+            try:
+                notification = await self.claim()
+                if notification:
+                    await self.deliver(await self.claim_backlog(notification))
+                    continue
+            except PyMongoError as e:
+                logger.warning(f"Очередь уведомлений недоступна: {e}")
+            except Exception:
+                # Обработчик не должен останавливаться: забранные уведомления
+                # вернутся в очередь по истечении LEASE_SECONDS
+                logger.exception("Ошибка обработчика уведомлений")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def outbox_status(db) -> dict:
+    """Число уведомлений по статусам"""
+    counts = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_DEAD: 0}
+    async for row in db[OUTBOX_COLLECTION].aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+        counts[row['_id']] = row['count']
+    return counts
+
+
+async def requeue_dead(db) -> int:
+    """Вернуть недоставленные уведомления в очередь"""
+    result = await db[OUTBOX_COLLECTION].update_many(
+        {'status': STATUS_DEAD},
+        {'$set': {'status': STATUS_PENDING, 'attempts': 0, 'next_attempt_at': datetime.utcnow()},
+         '$unset': {'dead_at': ''}}
+    )
+    return result.modified_count
+
+
+async def main():
+    """Главная функция для работы из командной строки"""
+    if len(sys.argv) < 2:
+        print("Usage: python notifications.py [status|requeue]")
+        print("  status  - число уведомлений по статусам и последние ошибки")
+        print("  requeue - отправить недоставленные (dead) уведомления повторно")
+        return
+
+    command = sys.argv[1].lower()
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        if command == 'status':
+            counts = await outbox_status(db)
+            print("\n📨 Очередь уведомлений:")
+            for status, count in counts.items():
+                print(f"  {status}: {count}")
+            cursor = db[OUTBOX_COLLECTION].find({'status': STATUS_DEAD}).sort('created_at', -1).limit(10)
+            async for notification in cursor:
+                print(f"  ❌ {notification['kind']} {notification.get('ref_id') or ''}: {notification.get('last_error')}")
+
+        elif command == 'requeue':
+            count = await requeue_dead(db)
+            print(f"✅ Возвращено в очередь: {count}")
+
+        else:
+            print(f"Неизвестная команда: {command}")
+
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Нечеткий поиск по названиям товаров
+Триграммный индекс в памяти процесса по словам из названий и брендов.
+Находит модели по началу артикула ("msz-ap3") и с опечатками ("MSZ-AP53VG"),
+чего не умеет текстовый индекс MongoDB. Основной поиск по словам остается
+за текстовым индексом, этот индекс добавляет к нему кандидатов и вес
+"""
+
+import asyncio
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Слово из букв, цифр и разделителей внутри артикула (MSZ-AP35VG, 2.5/3.2)
+WORD_RE = re.compile(r'\w+(?:[-/.]\w+)*')
+
+# Порог похожести слова запроса и слова из названия (коэффициент Дайса по триграммам)
+MIN_SIMILARITY = 0.45
+
+# Совпадение по началу слова считается почти точным
+PREFIX_SIMILARITY = 0.85
+
+# Слова запроса короче этого не ищутся нечетко
+MIN_QUERY_TOKEN = 2
+
+# Сколько лучших товаров возвращает поиск
+DEFAULT_LIMIT = 200
+
+
+def normalize_token(word: str) -> str:
+    """Нижний регистр без разделителей: MSZ-AP35VG -> mszap35vg, ё -> е"""
+    return re.sub(r'[-/._]', '', word.lower()).replace('ё', 'е')
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in WORD_RE.findall(text or ''):
+        token = normalize_token(word)
+        if token:
+            tokens.append(token)
+        # Части артикула тоже ищутся отдельно: "ap35vg" из "MSZ-AP35VG"
+        parts = [normalize_token(part) for part in re.split(r'[-/.]', word)]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) >= MIN_QUERY_TOKEN)
+    return tokens
+
+
+def trigrams(token: str) -> Set[str]:
+    # Пробелы по краям дают триграммы начала и конца слова
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    """Триграммный индекс слов из названий товаров"""
+
+    def __init__(self):
+        self.generation: Optional[int] = None
+        self._token_products: Dict[str, Set[str]] = {}
+        self._token_gram_count: Dict[str, int] = {}
+        self._gram_tokens: Dict[str, List[str]] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._token_products)
+
+    def build(self, products: List[dict]):
+        """Построить индекс по документам с полями id, name, brand"""
+        token_products = defaultdict(set)
+        for product in products:
+            text = f"{product.get('name') or ''} {product.get('brand') or ''}"
+            for token in tokenize(text):
+                token_products[token].add(product['id'])
+
+        gram_tokens = defaultdict(list)
+        gram_count = {}
+        for token in token_products:
+            grams = trigrams(token)
+            gram_count[token] = len(grams)
+            for gram in grams:
+                gram_tokens[gram].append(token)
+
+        # Замена целиком, чтобы параллельные поиски видели либо старый, либо новый индекс
+        self._token_products = dict(token_products)
+        self._token_gram_count = gram_count
+        self._gram_tokens = dict(gram_tokens)
+
+    async def ensure_current(self, db, generation: int):
+        """Перестроить индекс, если каталог изменился с прошлой сборки"""
+        if self.generation == generation:
+            return
+        async with self._lock:
+            if self.generation == generation:
+                return
+            started = time.perf_counter()
+            products = await db.products.find({}, {'_id': 0, 'id': 1, 'name': 1, 'brand': 1}).to_list(None)
+            await asyncio.to_thread(self.build, products)
+            self.generation = generation
+            logger.info(f"Поисковый индекс: {len(products)} товаров, {len(self)} слов, "
+                        f"{(time.perf_counter() - started) * 1000:.0f} мс")
+
+    def _match_token(self, query_token: str) -> Dict[str, float]:
+        """Похожесть слова запроса на каждое подходящее слово индекса"""
+        query_grams = trigrams(query_token)
+        # Counter считает вхождения на C, это основная часть времени поиска
+        shared = Counter(chain.from_iterable(self._gram_tokens.get(gram, ()) for gram in query_grams))
+
+        # Меньше общих триграмм не дадут нужной похожести ни при какой длине слова
+        min_shared = MIN_SIMILARITY * len(query_grams) / (2 - MIN_SIMILARITY)
+        matches = {}
+        for token, count in shared.items():
+            if count < min_shared:
+                continue
+            similarity = 2 * count / (len(query_grams) + self._token_gram_count[token])
+            if token.startswith(query_token):
+                similarity = max(similarity, PREFIX_SIMILARITY + (1 - PREFIX_SIMILARITY) * len(query_token) / len(token))
+            if similarity >= MIN_SIMILARITY:
+                matches[token] = similarity
+        return matches
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, float]]:
+        """Товары, похожие на запрос, по убыванию оценки от 0 до 1"""
+        query_tokens = [token for token in dict.fromkeys(tokenize(query)) if len(token) >= MIN_QUERY_TOKEN]
+        if not query_tokens:
+            return []
+
+        scores = defaultdict(float)
+        for query_token in query_tokens:
+            # Товару засчитывается лучшее из его слов: более похожие записываются последними
+            best = {}
+            for token, similarity in sorted(self._match_token(query_token).items(), key=lambda item: item[1]):
+                best.update(dict.fromkeys(self._token_products[token], similarity))
+            for product_id, similarity in best.items():
+                scores[product_id] += similarity
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(product_id, score / len(query_tokens)) for product_id, score in ranked]
+
+
+def _synthetic_catalog(size: int) -> List[dict]:
+    """Каталог для замера: названия вида 'Сплит-система Mitsubishi MSZ-AP35VG'"""
+    rng = random.Random(42)
+    brands = ['Mitsubishi', 'Daikin', 'Haier', 'Ballu', 'Electrolux', 'Toshiba', 'LG', 'Samsung', 'Gree', 'Midea']
+    kinds = ['Сплит-система', 'Кондиционер', 'Инверторная сплит-система', 'Мульти-сплит система']
+    letters = 'ABCDEFGHKLMNPRSTVXZ'
+    products = []
+    for i in range(size):
+        series = ''.join(rng.choice(letters) for _ in range(3))
+        model = f"{series}-{rng.choice(letters)}{rng.choice(letters)}{rng.randint(20, 90)}{rng.choice(letters)}{rng.choice(letters)}"
+        products.append({'id': str(i), 'name': f"{rng.choice(kinds)} {rng.choice(brands)} {model}",
+                         'brand': None})
+    return products
+
+
+def main():
+    """Замер скорости поиска: python search_index.py bench [число товаров]"""
+    if len(sys.argv) < 2 or sys.argv[1].lower() != 'bench':
+        print("Usage: python search_index.py bench [size]")
+        print("  bench - построить индекс по синтетическому каталогу и замерить p50/p95 поиска")
+        return
+
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    products = _synthetic_catalog(size)
+    index = ProductSearchIndex()
+    started = time.perf_counter()
+    index.build(products)
+    print(f"Индекс: {size} товаров, {len(index)} слов, сборка {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    rng = random.Random(7)
+    queries = []
+    for product in rng.sample(products, 200):
+        model = product['name'].split()[-1]
+        queries.append(model[:rng.randint(3, len(model))])            # начало артикула
+        queries.append(model[:-2] + model[-1] + model[-2])            # перестановка букв
+        queries.append(f"{product['name'].split()[-2]} {model[:5]}")  # бренд и серия
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"Запросов: {len(timings)}, p50 {statistics.median(timings):.2f} мс, "
+          f"p95 {timings[int(len(timings) * 0.95)]:.2f} мс, max {timings[-1]:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
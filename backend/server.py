@@ -1,33 +1,83 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse, RedirectResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import uuid
+from pydantic import BaseModel
+from typing import List, Optional, Union
+import base64
+import hashlib
 from datetime import datetime
-import httpx
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
 import asyncio
 import json
+import orjson
+import re
 from pathlib import Path
 
 # Импорт класса для работы с резервными копиями
 try:
     from backend.database_backup import DatabaseBackup
+    from backend.backup_jobs import KIND_BACKUP, KIND_RESTORE, BackupJobBusy, BackupJobRunner
 except ImportError:
     try:
         from .database_backup import DatabaseBackup
+        from .backup_jobs import KIND_BACKUP, KIND_RESTORE, BackupJobBusy, BackupJobRunner
     except ImportError:
         try:
             import sys
             import os
             sys.path.append(os.path.dirname(os.path.abspath(__file__)))
             from database_backup import DatabaseBackup
+            from backup_jobs import KIND_BACKUP, KIND_RESTORE, BackupJobBusy, BackupJobRunner
         except ImportError:
             DatabaseBackup = None
+            BackupJobRunner = None
+
+try:
+    from backend.specifications import normalize_specifications
+    from backend.image_store import ImageStore, decode_data_url, digest_from_url, guess_media_type
+    from backend.thumbnails import ThumbnailCache, media_type_for, snap_width
+    from backend.db_indexes import ensure_indexes
+    from backend.catalog_cache import CatalogCache
+    from backend.models import (
+        Product, ProductCreate, ProductPage, FacetValue, PriceRange, SearchFacets,
+        ProductSearchResult, CartItem, CartItemCreate, CartItemUpdate, CartSummary, FeedbackForm,
+        FeedbackFormCreate, Project, Order, OrderCreate, OrderFromCart
+    )
+    from backend.search_index import ProductSearchIndex
+    from backend.telegram_client import TelegramClient
+    from backend.telegram_rate_limit import TelegramRateLimiter
+    from backend.notifications import NotificationDispatcher, enqueue_notification
+    from backend.idempotency import (
+        MAX_KEY_LENGTH, IdempotencyConflict, begin_request, complete_request, release_request,
+        request_fingerprint
+    )
+except ImportError:
+    from specifications import normalize_specifications
+    from image_store import ImageStore, decode_data_url, digest_from_url, guess_media_type
+    from thumbnails import ThumbnailCache, media_type_for, snap_width
+    from db_indexes import ensure_indexes
+    from catalog_cache import CatalogCache
+    from models import (
+        Product, ProductCreate, ProductPage, FacetValue, PriceRange, SearchFacets,
+        ProductSearchResult, CartItem, CartItemCreate, CartItemUpdate, CartSummary, FeedbackForm,
+        FeedbackFormCreate, Project, Order, OrderCreate, OrderFromCart
+    )
+    from search_index import ProductSearchIndex
+    from telegram_client import TelegramClient
+    from telegram_rate_limit import TelegramRateLimiter
+    from notifications import NotificationDispatcher, enqueue_notification
+    from idempotency import (
+        MAX_KEY_LENGTH, IdempotencyConflict, begin_request, complete_request, release_request,
+        request_fingerprint
+    )
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -37,128 +87,459 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Serialized catalog responses, dropped whenever products or projects change
+catalog_cache = CatalogCache(db)
+
+# In-process trigram index over model names, rebuilt when the products cache is invalidated
+search_index = ProductSearchIndex()
+
 # Telegram configuration
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 OWNER_CHAT_ID = os.environ.get('OWNER_CHAT_ID')
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+# One pooled, rate-limited client for all notifications, opened at startup and closed on shutdown
+telegram = TelegramClient(BOT_TOKEN, limiter=TelegramRateLimiter())
+# Order and feedback notifications are queued in Mongo and sent in the background
+notification_dispatcher = NotificationDispatcher(db, telegram)
+
+async def backup_restored():
+    await catalog_cache.changed("products")
+    await catalog_cache.changed("projects")
+
+# Backups and restores run as background jobs on the shared client; progress lives in backup_jobs
+backup_jobs = BackupJobRunner(db, on_restored=backup_restored) if BackupJobRunner else None
+
+# Content-addressed image storage
+image_store = ImageStore()
+thumbnail_cache = ThumbnailCache()
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Images addressed by product/project id can change, so clients revalidate them by ETag
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+IMAGE_FORMAT_PATTERN = "^(webp|jpeg|jpg|png)$"
+
+# The catalog grid only renders these; the image comes from /api/products/{id}/image
+PRODUCT_CARD_FIELDS = ("id", "name", "short_description", "price", "brand", "cooling_kw", "area_m2", "energy_class")
+PRODUCT_VIEW_PATTERN = "^(card|full)$"
+
+# Pagination settings
+PRODUCTS_PAGE_DEFAULT = 20
+PRODUCTS_PAGE_MAX = 100
+
+# Weight of the fuzzy model-name similarity (0..1) against the Mongo textScore
+FUZZY_WEIGHT = 10
 
 # Create the main app without a prefix
-app = FastAPI()
+# orjson for every response; hot endpoints also skip response_model validation on trusted reads
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Models
-class Product(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    description: str
-    short_description: str
-    price: float
-    image_url: str
-    specifications: dict = Field(default_factory=dict)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class ProductCreate(BaseModel):
-    name: str
-    description: str
-    short_description: str
-    price: float
-    image_url: str
-    specifications: dict = Field(default_factory=dict)
-
-class CartItem(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    user_id: str  # Telegram user ID for cart isolation
-    product_id: str
-    product_name: str
-    price: float
-    quantity: int
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class CartItemCreate(BaseModel):
-    user_id: str  # Telegram user ID for cart isolation
-    product_id: str
-    quantity: int = 1
-
-class FeedbackForm(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    phone: str
-    message: str
-    tg_user_id: Optional[str] = None
-    tg_username: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class FeedbackFormCreate(BaseModel):
-    name: str
-    phone: str
-    message: str
-    tg_user_id: Optional[str] = None
-    tg_username: Optional[str] = None
-
-class Project(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    title: str
-    description: str
-    address: str
-    images: List[str]
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class Order(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    items: List[CartItem]
-    total_amount: float
-    tg_user_id: Optional[str] = None
-    tg_username: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    status: str = "pending"
-
-class OrderCreate(BaseModel):
-    items: List[CartItem]
-    tg_user_id: Optional[str] = None
-    tg_username: Optional[str] = None
-
-# Telegram helper functions
-async def send_telegram_message(message: str):
-    """Send message to owner via Telegram bot"""
+# Database helpers
+_transactions_supported: Optional[bool] = None
+
+async def transactions_supported() -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+async def run_in_transaction(callback):
+    """Run callback(session) in one transaction, or sequentially on a standalone server"""
+    if not await transactions_supported():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
+
+# Pagination helpers
+def encode_cursor(created_at: datetime, item_id: str) -> str:
+    """Encode a keyset position (created_at, id) into an opaque cursor"""
+    raw = json.dumps([created_at.isoformat(), item_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    """Decode an opaque cursor back into a (created_at, id) keyset position"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{TELEGRAM_API_URL}/sendMessage",
-                json={
-                    "chat_id": OWNER_CHAT_ID,
-                    "text": message,
-                    "parse_mode": "HTML"
-                }
-            )
-            return response.json()
-    except Exception as e:
-        logging.error(f"Failed to send Telegram message: {e}")
-        return None
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), str(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+# Product helpers
+def new_product(data: dict) -> Product:
+    """Build a product with typed fields extracted from its specifications"""
+    normalized = normalize_specifications(data.get("name"), data.get("specifications"))
+    return Product(**{**data, **normalized})
+
+# Catalog search helpers
+def build_search_pipeline(q: Optional[str], filters: dict, limit: int, offset: int,
+                          projection: Optional[dict] = None, fuzzy: Optional[list] = None,
+                          text_index: bool = True) -> list:
+    """Build a single aggregation returning the requested page and facet counts.
+
+    Every facet is counted with all filters applied except its own, so the
+    options of an already selected filter stay visible in the panel. A text
+    query matches the Mongo text index or the (id, score) pairs from the
+    fuzzy model-name index, and items are ranked by the combined score.
+    """
+    pipeline = []
+    sort = {"created_at": 1, "id": 1}
+    projection = projection or {"_id": 0}
+    if q and q.strip():
+        fuzzy_ids = [product_id for product_id, _ in fuzzy or ()]
+        fuzzy_scores = [score for _, score in fuzzy or ()]
+        if text_index:
+            primary = {"$text": {"$search": q.strip()}}
+            text_score = {"$ifNull": [{"$meta": "textScore"}, 0]}
+        else:
+            # Without the text index fall back to a substring scan ranked by the fuzzy score only
+            pattern = re.escape(q.strip())
+            primary = {"$or": [
+                {"name": {"$regex": pattern, "$options": "i"}},
+                {"description": {"$regex": pattern, "$options": "i"}},
+                {"short_description": {"$regex": pattern, "$options": "i"}},
+            ]}
+            text_score = 0
+        pipeline.append({"$match": {"$or": [primary, {"id": {"$in": fuzzy_ids}}]} if fuzzy_ids else primary})
+
+        # Rank by text relevance plus the weighted similarity of the model name
+        fuzzy_score = {"$let": {
+            "vars": {"i": {"$indexOfArray": [fuzzy_ids, "$id"]}},
+            "in": {"$cond": [{"$gte": ["$$i", 0]}, {"$arrayElemAt": [fuzzy_scores, "$$i"]}, 0]},
+        }}
+        pipeline.append({"$addFields": {"_score": {"$add": [text_score, {"$multiply": [FUZZY_WEIGHT, fuzzy_score]}]}}})
+        sort = {"_score": -1, **sort}
+        if not any(projection.values()):
+            projection = {**projection, "_score": 0}
+
+    def match_except(excluded: Optional[str] = None) -> dict:
+        clauses = [clause for key, clause in filters.items() if key != excluded]
+        return {"$match": {"$and": clauses} if clauses else {}}
+
+    def count_by(field: str, facet: str) -> list:
+        return [
+            match_except(facet),
+            {"$match": {field: {"$ne": None}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        ]
+
+    pipeline.append({"$facet": {
+        "items": [
+            match_except(),
+            {"$sort": sort},
+            {"$skip": offset},
+            {"$limit": limit},
+            {"$project": projection},
+        ],
+        "total": [match_except(), {"$count": "count"}],
+        "brands": count_by("brand", "brand"),
+        "power": count_by("cooling_kw", "power"),
+        "area": count_by("area_m2", "area"),
+        "efficiency": count_by("energy_class", "efficiency"),
+        "price": [
+            match_except("price"),
+            {"$group": {"_id": None, "min": {"$min": "$price"}, "max": {"$max": "$price"}}},
+        ],
+    }})
+    return pipeline
+
+def _facet_label(value) -> str:
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+def _facet_values(buckets: list) -> List[FacetValue]:
+    # Numbers sort numerically, strings alphabetically
+    buckets = sorted(buckets, key=lambda b: b["_id"])
+    return [FacetValue(value=_facet_label(b["_id"]), count=b["count"]) for b in buckets]
+
+# Response helpers
+@lru_cache(maxsize=None)
+def _fixed_default_fields(model) -> frozenset:
+    """Fields that can be filled in without validation: optional and without a default factory"""
+    return frozenset(
+        name for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    )
+
+def trusted_dump(model, doc: dict, fields: Optional[tuple] = None) -> dict:
+    """Shape a document read from our own database like model, without validating it.
+
+    A document missing a required field or one with a default factory (id, created_at)
+    goes through the model as before, instead of rendering a placeholder or a value
+    that changes on every request
+    """
+    model_fields = model.model_fields
+    names = fields or model_fields
+    fixed = _fixed_default_fields(model)
+    if any(name not in doc and name not in fixed for name in names):
+        data = model(**doc).dict()
+        return data if fields is None else {name: data[name] for name in fields}
+    return {name: doc[name] if name in doc else model_fields[name].default for name in names}
+
+# Product list views
+def product_fields(view: Optional[str], fields: Optional[str]) -> Optional[tuple]:
+    """Resolve view= / fields= into the product fields to return, None meaning all of them"""
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in Product.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные поля товара: {', '.join(unknown)}")
+        # id is always returned, duplicates are dropped and the order is kept
+        return tuple(dict.fromkeys(["id", *requested]))
+    if view == "card":
+        return PRODUCT_CARD_FIELDS
+    return None
+
+def product_projection(selected: Optional[tuple], extra: tuple = ()) -> dict:
+    if selected is None:
+        return {"_id": 0}
+    return {"_id": 0, **{name: 1 for name in (*selected, *extra)}}
+
+def _orjson_default(value):
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError
+
+def render_json(content) -> bytes:
+    """Serialize a response body with orjson, as the default response class does"""
+    return orjson.dumps(content, default=_orjson_default)
+
+# HTTP caching helpers
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether If-None-Match from the client matches the current ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    """Check If-Modified-Since, which only counts when If-None-Match is absent"""
+    header = request.headers.get("if-modified-since")
+    if not header or not last_modified or "if-none-match" in request.headers:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have one-second precision
+    return last_modified.replace(microsecond=0) <= since
+
+async def catalog_response(request: Request, collection_name: str, key, loader) -> Response:
+    """Serve a cached catalog body, or 304 when the client's copy is still current"""
+    cached = await catalog_cache.get_or_load(collection_name, key, loader)
+    headers = {"ETag": cached.etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    last_modified = catalog_cache.updated_at.get(collection_name)
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if etag_matches(request, cached.etag) or not_modified_since(request, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+# Image helpers
+async def image_response(request: Request, image_url, w: Optional[int], fmt: Optional[str],
+                         cache_control: str) -> Response:
+    """Serve a stored image, resized and re-encoded when w or fmt is given"""
+    if isinstance(image_url, str) and image_url.startswith(("http://", "https://")):
+        # External images are not proxied
+        return RedirectResponse(image_url)
+
+    path = None
+    digest = digest_from_url(image_url)
+    if digest:
+        path = image_store.get_path(digest)
+        if not path:
+            raise HTTPException(status_code=404, detail="Изображение не найдено")
+        load_source = path.read_bytes
+    else:
+        # Legacy documents still carry inline data URLs
+        data = decode_data_url(image_url) if isinstance(image_url, str) else None
+        if data is None:
+            raise HTTPException(status_code=404, detail="Изображение не найдено")
+        digest = hashlib.sha256(data).hexdigest()
+        load_source = lambda: data
+
+    width = snap_width(w)
+    etag = f'"{digest}-{width or "orig"}-{fmt or "src"}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if width is None and fmt is None:
+        if path:
+            return FileResponse(path, media_type=image_store.media_type(path), headers=headers)
+        return Response(content=data, media_type=guess_media_type(data[:12]), headers=headers)
+
+    fmt = fmt or "webp"
+    try:
+        # Decoding and resizing are CPU bound, keep them off the event loop
+        variant = await asyncio.to_thread(thumbnail_cache.get_or_render, digest, load_source, width, fmt)
+    except OSError:
+        raise HTTPException(status_code=422, detail="Не удалось обработать изображение")
+    return FileResponse(variant, media_type=media_type_for(fmt), headers=headers)
 
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Добро пожаловать в интернет-магазин кондиционеров!"}
 
-# Products endpoints
-@api_router.get("/products", response_model=List[Product])
-async def get_products():
-    products = await db.products.find().to_list(1000)
-    return [Product(**product) for product in products]
+# Catalog loaders, their serialized results are kept in catalog_cache
+async def load_product_list(selected: Optional[tuple]) -> bytes:
+    products = await db.products.find({}, product_projection(selected)).to_list(1000)
+    return render_json([trusted_dump(Product, product, selected) for product in products])
 
-@api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id})
+async def load_product_page(limit: int, position: Optional[tuple], selected: Optional[tuple]) -> bytes:
+    # Keyset pagination over (created_at, id): each page is an index range scan
+    query = {}
+    if position:
+        created_at, last_id = position
+        query = {"$or": [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "id": {"$gt": last_id}}
+        ]}
+
+    # Fetch one extra document to know whether another page exists
+    # The cursor needs created_at even when the view leaves it out
+    products = await db.products.find(query, product_projection(selected, ("created_at",))).sort(
+        [("created_at", 1), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    return render_json({
+        "items": [trusted_dump(Product, product, selected) for product in products],
+        "next_cursor": next_cursor
+    })
+
+async def load_product(product_id: str) -> bytes:
+    product = await db.products.find_one({"id": product_id}, {"_id": 0})
     if not product:
         raise HTTPException(status_code=404, detail="Товар не найден")
-    return Product(**product)
+    return render_json(trusted_dump(Product, product))
+
+async def load_product_search(q: Optional[str], filters: dict, limit: int, offset: int,
+                              selected: Optional[tuple]) -> bytes:
+    fuzzy = None
+    if q and q.strip():
+        await search_index.ensure_current(db, catalog_cache.generation("products"))
+        fuzzy = search_index.search(q)
+
+    projection = product_projection(selected)
+    try:
+        pipeline = build_search_pipeline(q, filters, limit, offset, projection, fuzzy)
+        result = (await db.products.aggregate(pipeline).to_list(1))[0]
+    except OperationFailure as e:
+        # Text index not created yet (ensure_indexes failed or is still running)
+        if e.code != 27:
+            raise
+        pipeline = build_search_pipeline(q, filters, limit, offset, projection, fuzzy, text_index=False)
+        result = (await db.products.aggregate(pipeline).to_list(1))[0]
+
+    total = result["total"][0]["count"] if result["total"] else 0
+    price = result["price"][0] if result["price"] else {}
+    # Facets are small and built here; the product list is passed through without validation
+    return render_json({
+        "items": [trusted_dump(Product, product, selected) for product in result["items"]],
+        "total": total,
+        "facets": SearchFacets(
+            brands=_facet_values(result["brands"]),
+            power=_facet_values(result["power"]),
+            area=_facet_values(result["area"]),
+            efficiency=_facet_values(result["efficiency"]),
+            price=PriceRange(min=price.get("min"), max=price.get("max"))
+        )
+    })
+
+async def load_project_list() -> bytes:
+    projects = await db.projects.find({}, {"_id": 0}).to_list(1000)
+    return render_json([trusted_dump(Project, project) for project in projects])
+
+# Products endpoints
+@api_router.get("/products", response_model=Union[List[Product], ProductPage])
+async def get_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=PRODUCTS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    view: Optional[str] = Query(None, pattern=PRODUCT_VIEW_PATTERN),
+    fields: Optional[str] = None
+):
+    selected = product_fields(view, fields)
+
+    # Without pagination parameters keep returning the plain list
+    if limit is None and cursor is None:
+        return await catalog_response(
+            request, "products", ("list", selected), lambda: load_product_list(selected)
+        )
+
+    limit = limit or PRODUCTS_PAGE_DEFAULT
+    position = decode_cursor(cursor) if cursor else None
+    return await catalog_response(
+        request, "products", ("page", limit, position, selected),
+        lambda: load_product_page(limit, position, selected)
+    )
+
+@api_router.get("/products/search", response_model=ProductSearchResult)
+async def search_products(
+    request: Request,
+    q: Optional[str] = None,
+    brand: Optional[str] = None,
+    power: Optional[float] = Query(None, ge=0),
+    area: Optional[float] = Query(None, ge=0),
+    efficiency: Optional[str] = None,
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    limit: int = Query(PRODUCTS_PAGE_DEFAULT, ge=1, le=PRODUCTS_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    view: Optional[str] = Query(None, pattern=PRODUCT_VIEW_PATTERN),
+    fields: Optional[str] = None
+):
+    """Filter the catalog and count facets in one aggregation"""
+    selected = product_fields(view, fields)
+    filters = {}
+    if brand:
+        filters["brand"] = {"brand": brand}
+    if power is not None:
+        filters["power"] = {"cooling_kw": power}
+    if area is not None:
+        filters["area"] = {"area_m2": area}
+    if efficiency:
+        filters["efficiency"] = {"energy_class": efficiency}
+    if price_min is not None or price_max is not None:
+        price_range = {}
+        if price_min is not None:
+            price_range["$gte"] = price_min
+        if price_max is not None:
+            price_range["$lte"] = price_max
+        filters["price"] = {"price": price_range}
+
+    cache_key = ("search", q, brand, power, area, efficiency, price_min, price_max, limit, offset, selected)
+    return await catalog_response(
+        request, "products", cache_key, lambda: load_product_search(q, filters, limit, offset, selected)
+    )
+
+@api_router.get("/products/{product_id}", response_model=Product)
+async def get_product(product_id: str, request: Request):
+    return await catalog_response(request, "products", ("item", product_id), lambda: load_product(product_id))
 
 @api_router.post("/products", response_model=Product)
 async def create_product(product_data: ProductCreate):
-    product = Product(**product_data.dict())
+    data = product_data.dict()
+    data["image_url"] = await asyncio.to_thread(image_store.externalize, data["image_url"])
+    product = new_product(data)
     await db.products.insert_one(product.dict())
+    await catalog_cache.changed("products")
     return product
 
 @api_router.delete("/products/{product_id}")
@@ -166,6 +547,7 @@ async def delete_product(product_id: str):
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Товар не найден")
+    await catalog_cache.changed("products")
     return {"message": "Товар успешно удален"}
 
 # Cart endpoints
@@ -175,26 +557,20 @@ async def add_to_cart(cart_item_data: CartItemCreate):
     if not cart_item_data.user_id:
         raise HTTPException(status_code=400, detail="user_id обязателен для добавления в корзину")
     
-    # Check if item already exists in user's cart
-    existing_item = await db.cart_items.find_one({
-        "user_id": cart_item_data.user_id,
-        "product_id": cart_item_data.product_id
-    })
-    
-    if existing_item:
-        # Update quantity instead of creating duplicate
-        new_quantity = existing_item["quantity"] + cart_item_data.quantity
-        await db.cart_items.update_one(
-            {"user_id": cart_item_data.user_id, "product_id": cart_item_data.product_id},
-            {"$set": {"quantity": new_quantity}}
-        )
-        existing_item["quantity"] = new_quantity
-        return CartItem(**existing_item)
+    item_key = {"user_id": cart_item_data.user_id, "product_id": cart_item_data.product_id}
+    # updated_at lets incremental backups pick up quantity changes
+    increment = {"$inc": {"quantity": cart_item_data.quantity}, "$currentDate": {"updated_at": True}}
     
-    # Get product details
-    product = await db.products.find_one({"id": cart_item_data.product_id})
+    # One projected product read, then one atomic upsert whether or not the item is in the cart
+    product = await db.products.find_one({"id": cart_item_data.product_id}, {"_id": 0, "name": 1, "price": 1})
     if not product:
-        raise HTTPException(status_code=404, detail="Товар не найден")
+        # A product deleted after it was added can still be incremented, just not added anew
+        item = await db.cart_items.find_one_and_update(
+            item_key, increment, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+        if not item:
+            raise HTTPException(status_code=404, detail="Товар не найден")
+        return CartItem(**item)
     
     cart_item = CartItem(
         user_id=cart_item_data.user_id,
@@ -203,16 +579,53 @@ async def add_to_cart(cart_item_data: CartItemCreate):
         price=product["price"],
         quantity=cart_item_data.quantity
     )
-    await db.cart_items.insert_one(cart_item.dict())
-    return cart_item
+    new_fields = cart_item.dict(exclude={"user_id", "product_id", "quantity"})
+    try:
+        # $inc works for new and existing lines, so concurrent taps can't lose increments
+        item = await db.cart_items.find_one_and_update(
+            item_key,
+            {**increment, "$setOnInsert": new_fields},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Two upserts raced to insert the line; the unique (user_id, product_id) index lets one win
+        item = await db.cart_items.find_one_and_update(
+            item_key, increment, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+    return CartItem(**item)
 
 @api_router.get("/cart", response_model=List[CartItem])
 async def get_cart(user_id: str):
     if not user_id:
         raise HTTPException(status_code=400, detail="user_id обязателен для получения корзины")
     
-    cart_items = await db.cart_items.find({"user_id": user_id}).to_list(1000)
-    return [CartItem(**item) for item in cart_items]
+    cart_items = await db.cart_items.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
+    return ORJSONResponse([trusted_dump(CartItem, item) for item in cart_items])
+
+@api_router.patch("/cart/{item_id}", response_model=CartSummary)
+async def update_cart_item(item_id: str, user_id: str, item_update: CartItemUpdate):
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id обязателен для изменения корзины")
+    
+    item_filter = {"id": item_id, "user_id": user_id}
+    if item_update.quantity == 0:
+        result = await db.cart_items.delete_one(item_filter)
+        found = result.deleted_count > 0
+    else:
+        result = await db.cart_items.update_one(item_filter, {"$set": {"quantity": item_update.quantity}, "$currentDate": {"updated_at": True}})
+        found = result.matched_count > 0
+    if not found:
+        raise HTTPException(status_code=404, detail="Товар в корзине не найден или не принадлежит пользователю")
+    
+    cart_items = await db.cart_items.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
+    items = [CartItem(**item) for item in cart_items]
+    return CartSummary(
+        items=items,
+        total_amount=sum(item.price * item.quantity for item in items),
+        total_quantity=sum(item.quantity for item in items)
+    )
 
 @api_router.delete("/cart/{item_id}")
 async def remove_from_cart(item_id: str, user_id: str):
@@ -236,7 +649,6 @@ async def clear_cart(user_id: str):
 @api_router.post("/feedback")
 async def submit_feedback(feedback_data: FeedbackFormCreate):
     feedback = FeedbackForm(**feedback_data.dict())
-    await db.feedback.insert_one(feedback.dict())
     
     # Build user info for message
     user_info = ""
@@ -245,7 +657,6 @@ async def submit_feedback(feedback_data: FeedbackFormCreate):
     if feedback.tg_username:
         user_info += f"\n👤 <b>Username:</b> @{feedback.tg_username}"
     
-    # Send to Telegram
     message = f"""
 🔔 <b>Новая заявка с сайта</b>
 
@@ -256,22 +667,19 @@ async def submit_feedback(feedback_data: FeedbackFormCreate):
 🕐 <b>Время:</b> {feedback.created_at.strftime('%d.%m.%Y %H:%M')}
 """
     
-    await send_telegram_message(message)
+    # The request and its notification are stored together, Telegram is contacted in the background
+    async def save(session):
+        await db.feedback.insert_one(feedback.dict(), session=session)
+        await enqueue_notification(db, OWNER_CHAT_ID, message, "feedback", feedback.id, session=session)
+
+    await run_in_transaction(save)
+    notification_dispatcher.notify()
     return {"message": "Ваша заявка отправлена. Мы свяжемся с вами в ближайшее время."}
 
-# Orders endpoints  
-@api_router.post("/orders")
-async def create_order(order_data: OrderCreate):
-    total_amount = sum(item.price * item.quantity for item in order_data.items)
-    order = Order(
-        items=order_data.items, 
-        total_amount=total_amount,
-        tg_user_id=order_data.tg_user_id,
-        tg_username=order_data.tg_username
-    )
-    await db.orders.insert_one(order.dict())
-    
-    # Send order to Telegram
+# Order helpers
+ORDER_CONFIRMATION = "Спасибо за заказ! Мы свяжемся с вами для подтверждения."
+
+def order_notification_text(order: Order) -> str:
     items_text = "\n".join([
         f"• {item.product_name} - {item.quantity} шт. × {item.price:,.0f} ₽ = {item.price * item.quantity:,.0f} ₽"
         for item in order.items
@@ -284,36 +692,217 @@ async def create_order(order_data: OrderCreate):
     if order.tg_username:
         user_info += f"\n👤 <b>Username:</b> @{order.tg_username}"
     
-    message = f"""
+    return f"""
 🛒 <b>Новый заказ #{order.id[:8]}</b>
 
 📦 <b>Товары:</b>
 {items_text}
 
-💰 <b>Общая сумма:</b> {total_amount:,.0f} ₽{user_info}
+💰 <b>Общая сумма:</b> {order.total_amount:,.0f} ₽{user_info}
 
 🕐 <b>Время заказа:</b> {order.created_at.strftime('%d.%m.%Y %H:%M')}
 """
+
+async def save_order(order: Order, session, key: Optional[str], result: dict):
+    """Store the order, its notification and the idempotency record in one session"""
+    await db.orders.insert_one(order.dict(), session=session)
+    await enqueue_notification(db, OWNER_CHAT_ID, order_notification_text(order), "order", order.id,
+                               session=session)
+    if key:
+        await complete_request(db, "orders", key, result, session=session)
+
+async def claim_order_key(key: Optional[str], fingerprint_payload: dict) -> Optional[dict]:
+    """Claim an idempotency key, returning the stored response when the order was already placed"""
+    if not key:
+        return None
+    try:
+        return await begin_request(db, "orders", key, request_fingerprint(fingerprint_payload))
+    except IdempotencyConflict as e:
+        if e.reason == "mismatch":
+            raise HTTPException(status_code=422, detail="Ключ идемпотентности уже использован для другого заказа")
+        raise HTTPException(status_code=409, detail="Заказ с этим ключом уже обрабатывается")
+
+async def place_order(key: Optional[str], write):
+    """Run the order write in a transaction, releasing the idempotency key if it fails"""
+    try:
+        result = await run_in_transaction(write)
+    except Exception:
+        if key:
+            await release_request(db, "orders", key)
+        raise
+    notification_dispatcher.notify()
+    return result
+
+def cart_order_pipeline(user_id: str) -> list:
+    """Join cart lines with current product prices and total them in one aggregation"""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"created_at": 1}},
+        {"$lookup": {
+            "from": "products",
+            "localField": "product_id",
+            "foreignField": "id",
+            "as": "product"
+        }},
+        {"$addFields": {"product": {"$arrayElemAt": ["$product", 0]}}},
+        {"$group": {
+            "_id": None,
+            "items": {"$push": {
+                "id": "$id",
+                "user_id": "$user_id",
+                "product_id": "$product_id",
+                # Products deleted since they were added have no current name or price
+                "product_name": {"$ifNull": ["$product.name", "$product_name"]},
+                # $push drops missing fields, so a deleted product keeps an explicit null price
+                "price": {"$ifNull": ["$product.price", None]},
+                "quantity": "$quantity",
+                "created_at": "$created_at"
+            }},
+            "total_amount": {"$sum": {"$multiply": [{"$ifNull": ["$product.price", 0]}, "$quantity"]}},
+            "total_quantity": {"$sum": {"$cond": [{"$ifNull": ["$product", False]}, "$quantity", 0]}}
+        }}
+    ]
+
+# Orders endpoints  
+@api_router.post("/orders")
+async def create_order(
+    order_data: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=MAX_KEY_LENGTH)
+):
+    # A retried request with the same key gets the stored response instead of a second order
+    key = idempotency_key or order_data.idempotency_key
+    # Cart line ids and timestamps get defaults when omitted, so only the order contents count
+    saved = await claim_order_key(key, {
+        "items": [[item.product_id, item.quantity, item.price] for item in order_data.items],
+        "tg_user_id": order_data.tg_user_id
+    })
+    if saved is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return saved
+
+    total_amount = sum(item.price * item.quantity for item in order_data.items)
+    order = Order(
+        items=order_data.items, 
+        total_amount=total_amount,
+        tg_user_id=order_data.tg_user_id,
+        tg_username=order_data.tg_username
+    )
+    result = {"message": ORDER_CONFIRMATION}
     
-    await send_telegram_message(message)
+    # The order, its notification and the idempotency record are stored together,
+    # Telegram is contacted in the background
+    await place_order(key, lambda session: save_order(order, session, key, result))
     
     # Clear cart after order - need user_id to clear specific user's cart
     if order.tg_user_id:
         await db.cart_items.delete_many({"user_id": order.tg_user_id})
     
-    return {"message": "Спасибо за заказ! Мы свяжемся с вами для подтверждения."}
+    return result
+
+@api_router.post("/orders/from-cart")
+async def create_order_from_cart(
+    response: Response,
+    user_id: str,
+    order_data: Optional[OrderFromCart] = None,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=MAX_KEY_LENGTH)
+):
+    """Turn the user's cart into an order priced from the current catalog"""
+    order_data = order_data or OrderFromCart()
+    key = idempotency_key or order_data.idempotency_key
+    saved = await claim_order_key(key, {"user_id": user_id, "tg_user_id": order_data.tg_user_id})
+    if saved is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return saved
+
+    async def write(session):
+        # Reading, ordering and clearing the cart happen in one transaction when available
+        rows = await db.cart_items.aggregate(cart_order_pipeline(user_id), session=session).to_list(1)
+        if not rows:
+            raise HTTPException(status_code=400, detail="Корзина пуста")
+        cart = rows[0]
+        available = [item for item in cart["items"] if item["price"] is not None]
+        unavailable = [item["product_name"] for item in cart["items"] if item["price"] is None]
+        if not available:
+            raise HTTPException(status_code=409, detail="Товары в корзине больше недоступны")
+
+        order = Order(
+            items=[CartItem(**item) for item in available],
+            total_amount=cart["total_amount"],
+            tg_user_id=order_data.tg_user_id,
+            tg_username=order_data.tg_username
+        )
+        result = {
+            "message": ORDER_CONFIRMATION,
+            "order_id": order.id,
+            "total_amount": order.total_amount,
+            "total_quantity": cart["total_quantity"],
+            "unavailable": unavailable
+        }
+        await save_order(order, session, key, result)
+        # Ordered lines and the unavailable ones reported above are removed,
+        # items added meanwhile stay in the cart
+        await db.cart_items.delete_many(
+            {"user_id": user_id, "id": {"$in": [item["id"] for item in cart["items"]]}},
+            session=session
+        )
+        return result
+
+    return await place_order(key, write)
 
 # Projects endpoints
 @api_router.get("/projects", response_model=List[Project])
-async def get_projects():
-    projects = await db.projects.find().to_list(1000)
-    return [Project(**project) for project in projects]
+async def get_projects(request: Request):
+    return await catalog_response(request, "projects", "list", load_project_list)
 
 @api_router.post("/projects", response_model=Project)
 async def create_project(project_data: Project):
+    project_data.images = [
+        await asyncio.to_thread(image_store.externalize, image) for image in project_data.images
+    ]
     await db.projects.insert_one(project_data.dict())
+    await catalog_cache.changed("projects")
     return project_data
 
+# Images endpoints
+@api_router.api_route("/images/{digest}", methods=["GET", "HEAD"])
+async def get_image(
+    request: Request,
+    digest: str,
+    w: Optional[int] = Query(None, ge=16, le=2048),
+    fmt: Optional[str] = Query(None, pattern=IMAGE_FORMAT_PATTERN)
+):
+    # The URL is derived from the content, so it never changes and can be cached forever
+    return await image_response(request, image_store.url_for(digest), w, fmt, IMMUTABLE_CACHE_CONTROL)
+
+@api_router.api_route("/products/{product_id}/image", methods=["GET", "HEAD"])
+async def get_product_image(
+    request: Request,
+    product_id: str,
+    w: Optional[int] = Query(None, ge=16, le=2048),
+    fmt: Optional[str] = Query(None, pattern=IMAGE_FORMAT_PATTERN)
+):
+    product = await db.products.find_one({"id": product_id}, {"image_url": 1})
+    if not product:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    return await image_response(request, product.get("image_url"), w, fmt, REVALIDATE_CACHE_CONTROL)
+
+@api_router.api_route("/projects/{project_id}/image", methods=["GET", "HEAD"])
+async def get_project_image(
+    request: Request,
+    project_id: str,
+    index: int = Query(0, ge=0),
+    w: Optional[int] = Query(None, ge=16, le=2048),
+    fmt: Optional[str] = Query(None, pattern=IMAGE_FORMAT_PATTERN)
+):
+    project = await db.projects.find_one({"id": project_id}, {"images": 1, "image_urls": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+    images = project.get("images") or project.get("image_urls") or []
+    if index >= len(images):
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+    return await image_response(request, images[index], w, fmt, REVALIDATE_CACHE_CONTROL)
+
 # Initialize sample data
 @api_router.post("/init-data") 
 async def init_sample_data():
@@ -324,14 +913,15 @@ async def init_sample_data():
     
     # Попытка восстановления из резервной копии
     if DatabaseBackup:
-        backup = DatabaseBackup()
+        backup = DatabaseBackup(db)
         try:
             # Проверяем, есть ли резервная копия
-            backup_dir = Path(__file__).parent / 'data'
-            if (backup_dir / 'products.json').exists():
+            if DatabaseBackup.backup_file('products'):
                 logging.info("Найдена резервная копия, восстанавливаем данные...")
                 success = await backup.restore_backup()
                 if success:
+                    await catalog_cache.changed("products")
+                    await catalog_cache.changed("projects")
                     products_count = await db.products.count_documents({})
                     projects_count = await db.projects.count_documents({})
                     return {
@@ -437,7 +1027,7 @@ async def init_sample_data():
     ]
     
     for product_data in products:
-        product = Product(**product_data)
+        product = new_product(product_data)
         await db.products.insert_one(product.dict())
     
     # Sample projects
@@ -478,6 +1068,9 @@ async def init_sample_data():
         project = Project(**project_data)
         await db.projects.insert_one(project.dict())
     
+    await catalog_cache.changed("products")
+    await catalog_cache.changed("projects")
+    
     return {"message": "Тестовые данные успешно загружены"}
 
 # Manual data initialization for admin
@@ -576,7 +1169,7 @@ async def manual_init_sample_data():
     ]
     
     for product_data in products:
-        product = Product(**product_data)
+        product = new_product(product_data)
         await db.products.insert_one(product.dict())
     
     # Sample projects
@@ -617,46 +1210,53 @@ async def manual_init_sample_data():
         project = Project(**project_data)
         await db.projects.insert_one(project.dict())
     
+    await catalog_cache.changed("products")
+    await catalog_cache.changed("projects")
+    
     return {"message": "Данные успешно инициализированы администратором", "products_count": len(products), "projects_count": len(projects)}
 
 # Backup management endpoints
-@api_router.post("/backup/create")
-async def create_database_backup():
-    """Создать резервную копию базы данных"""
+async def submit_backup_job(kind: str, **params) -> dict:
+    """Start a backup job; the caller polls /backup/jobs/{id} for progress"""
     if not DatabaseBackup:
         raise HTTPException(status_code=500, detail="Модуль резервного копирования не доступен")
-    
-    backup = DatabaseBackup()
     try:
-        success = await backup.create_backup()
-        if success:
-            return {"message": "Резервная копия создана успешно", "timestamp": datetime.utcnow().isoformat()}
-        else:
-            raise HTTPException(status_code=500, detail="Ошибка при создании резервной копии")
-    finally:
-        await backup.close()
+        return await backup_jobs.submit(kind, **params)
+    except BackupJobBusy as e:
+        running = f" ({e.job['id']})" if e.job else ""
+        raise HTTPException(status_code=409, detail=f"Уже выполняется задача резервного копирования{running}")
 
-@api_router.post("/backup/restore")
-async def restore_database_backup():
-    """Восстановить данные из резервной копии"""
+@api_router.post("/backup/create", status_code=202)
+async def create_database_backup(
+    full: bool = False,
+    fmt: Optional[str] = Query(None, pattern="^(json|bson)$")
+):
+    """Создать резервную копию базы данных в фоне"""
+    return await submit_backup_job(KIND_BACKUP, full=full, backup_format=fmt)
+
+@api_router.post("/backup/restore", status_code=202)
+async def restore_database_backup(snapshot_id: Optional[str] = None):
+    """Восстановить данные из резервной копии в фоне (по умолчанию из последней)"""
+    if DatabaseBackup and snapshot_id and snapshot_id not in {b["id"] for b in DatabaseBackup.list_backups()}:
+        raise HTTPException(status_code=404, detail="Резервная копия не найдена")
+    return await submit_backup_job(KIND_RESTORE, snapshot_id=snapshot_id)
+
+@api_router.get("/backup/jobs")
+async def list_backup_jobs(limit: int = Query(10, ge=1, le=100)):
+    """Последние задачи резервного копирования"""
     if not DatabaseBackup:
         raise HTTPException(status_code=500, detail="Модуль резервного копирования не доступен")
-    
-    backup = DatabaseBackup()
-    try:
-        success = await backup.restore_backup()
-        if success:
-            products_count = await db.products.count_documents({})
-            projects_count = await db.projects.count_documents({})
-            return {
-                "message": "Данные восстановлены успешно", 
-                "products_count": products_count,
-                "projects_count": projects_count
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Ошибка при восстановлении данных")
-    finally:
-        await backup.close()
+    return await backup_jobs.recent(limit)
+
+@api_router.get("/backup/jobs/{job_id}")
+async def get_backup_job(job_id: str):
+    """Состояние и прогресс задачи резервного копирования"""
+    if not DatabaseBackup:
+        raise HTTPException(status_code=500, detail="Модуль резервного копирования не доступен")
+    job = await backup_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
 
 @api_router.get("/backup/status")
 async def get_backup_status():
@@ -664,19 +1264,17 @@ async def get_backup_status():
     if not DatabaseBackup:
         raise HTTPException(status_code=500, detail="Модуль резервного копирования не доступен")
     
-    backup = DatabaseBackup()
+    backup = DatabaseBackup(db)
     try:
         status = await backup.get_database_status()
         
         # Проверяем наличие файлов резервных копий
-        backup_dir = Path(__file__).parent / 'data'
         backup_files = {}
-        for collection in ['products', 'projects', 'orders', 'feedback']:
-            backup_file = backup_dir / f"{collection}.json"
-            backup_files[collection] = backup_file.exists()
+        for collection in ['products', 'projects', 'orders', 'feedback', 'cart_items']:
+            backup_files[collection] = DatabaseBackup.backup_file(collection) is not None
         
         # Информация о последней резервной копии
-        info_file = backup_dir / "backup_info.json"
+        info_file = Path(__file__).parent / 'data' / "backup_info.json"
         last_backup = None
         if info_file.exists():
             with open(info_file, 'r', encoding='utf-8') as f:
@@ -687,7 +1285,9 @@ async def get_backup_status():
             "database_status": status,
             "backup_files": backup_files,
             "last_backup": last_backup,
-            "backup_available": any(backup_files.values())
+            "backup_available": any(backup_files.values()),
+            "snapshots": DatabaseBackup.list_backups(),
+            "active_job": await backup_jobs.active()
         }
     finally:
         await backup.close()
@@ -710,6 +1310,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_database_indexes():
+    report = await ensure_indexes(db)
+    failed = [f"{collection}.{name}" for collection, indexes in report.items()
+              for name, result in indexes.items() if result != "ok"]
+    if failed:
+        logger.error(f"Индексы не созданы: {', '.join(failed)}")
+
+@app.on_event("startup")
+async def start_catalog_cache():
+    await catalog_cache.start()
+
+@app.on_event("startup")
+async def start_telegram_client():
+    await telegram.start()
+    await notification_dispatcher.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await catalog_cache.stop()
+    await notification_dispatcher.stop()
+    if backup_jobs:
+        await backup_jobs.stop()
+    await telegram.close()
     client.close()
\ No newline at end of file
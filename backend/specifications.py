@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Нормализация характеристик товаров
+Извлекает из свободного словаря specifications типизированные поля
+(мощность, площадь, шум, энергопотребление, бренд), чтобы фильтры
+и диапазонные запросы выполнялись в MongoDB по индексам
+"""
+
+import asyncio
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+
+try:
+    from backend.catalog_cache import bump_catalog_version
+except ImportError:
+    from catalog_cache import bump_catalog_version
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+# Типизированные поля, которые хранятся рядом с исходными характеристиками
+NORMALIZED_FIELDS = ['brand', 'cooling_kw', 'area_m2', 'noise_db', 'power_kw', 'energy_class']
+
+# Признаки ключей характеристик (ключ приводится к нижнему регистру)
+SPEC_KEY_PATTERNS = {
+    'cooling_kw': ('мощность охлаждения', 'холодопроизводительность'),
+    'area_m2': ('площадь',),
+    'noise_db': ('шум',),
+    'power_kw': ('энергопотребление', 'потребляемая мощность'),
+    'energy_class': ('класс энергоэффективности', 'энергоэффективность'),
+    'brand': ('бренд', 'производитель', 'марка'),
+}
+
+# Бренды из двух слов, которые нельзя обрезать до первого слова названия
+COMPOUND_BRANDS = {
+    'mitsubishi electric': 'Mitsubishi Electric',
+    'mitsubishi heavy': 'Mitsubishi Heavy',
+    'general climate': 'General Climate',
+    'royal clima': 'Royal Clima',
+}
+
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+MIGRATION_BATCH_SIZE = 500
+
+
+def parse_number(value) -> Optional[float]:
+    """Достать первое число из строки вида '3.5 кВт', '1,2 кВт' или '19-24 дБ'"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = NUMBER_RE.search(value)
+    if not match:
+        return None
+    return float(match.group().replace(',', '.'))
+
+
+def find_spec(specifications: dict, field: str):
+    """Найти значение характеристики по признакам ключа"""
+    for key, value in specifications.items():
+        key_lower = str(key).strip().lower()
+        if any(pattern in key_lower for pattern in SPEC_KEY_PATTERNS[field]):
+            return value
+    return None
+
+
+def extract_brand(name: Optional[str], specifications: dict) -> Optional[str]:
+    """Бренд из характеристик, а если его там нет - из начала названия"""
+    brand = find_spec(specifications, 'brand')
+    if isinstance(brand, str) and brand.strip():
+        return brand.strip()
+
+    words = (name or '').split()
+    if not words:
+        return None
+    if len(words) > 1:
+        compound = COMPOUND_BRANDS.get(f"{words[0]} {words[1]}".lower())
+        if compound:
+            return compound
+    return words[0]
+
+
+def normalize_specifications(name: Optional[str], specifications: Optional[dict]) -> dict:
+    """Вернуть типизированные поля товара, извлеченные из характеристик"""
+    specifications = specifications or {}
+    energy_class = find_spec(specifications, 'energy_class')
+    return {
+        'brand': extract_brand(name, specifications),
+        'cooling_kw': parse_number(find_spec(specifications, 'cooling_kw')),
+        'area_m2': parse_number(find_spec(specifications, 'area_m2')),
+        'noise_db': parse_number(find_spec(specifications, 'noise_db')),
+        'power_kw': parse_number(find_spec(specifications, 'power_kw')),
+        'energy_class': energy_class.strip() if isinstance(energy_class, str) and energy_class.strip() else None,
+    }
+
+
+async def migrate_products(db) -> int:
+    """Заполнить типизированные поля у всех существующих товаров"""
+    updated = 0
+    batch = []
+    cursor = db.products.find({}, {'_id': 1, 'name': 1, 'specifications': 1})
+    async for product in cursor:
+        fields = normalize_specifications(product.get('name'), product.get('specifications'))
+        # Только товары, у которых поля действительно изменились, получают новый updated_at
+        changed = {'_id': product['_id'], '$or': [{key: {'$ne': value}} for key, value in fields.items()]}
+        batch.append(UpdateOne(changed, {'$set': fields, '$currentDate': {'updated_at': True}}))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            result = await db.products.bulk_write(batch, ordered=False)
+            updated += result.modified_count
+            batch = []
+    if batch:
+        result = await db.products.bulk_write(batch, ordered=False)
+        updated += result.modified_count
+
+    logger.info(f"Нормализованы характеристики у {updated} товаров")
+    return updated
+
+
+async def main():
+    """Главная функция для работы из командной строки"""
+    if len(sys.argv) < 2 or sys.argv[1].lower() != 'migrate':
+        print("Usage: python specifications.py migrate")
+        print("  migrate - заполнить типизированные поля у существующих товаров")
+        return
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        updated = await migrate_products(client[DB_NAME])
+        if updated:
+            await bump_catalog_version(client[DB_NAME], 'products')
+        print(f"✅ Обновлено товаров: {updated}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
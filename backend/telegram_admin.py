@@ -1,23 +1,30 @@
 import os
 import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
-import base64
+import uuid
 import io
 from PIL import Image
 from dotenv import load_dotenv
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, WebAppInfo
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, BaseRateLimiter, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import RetryAfter
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 
+from specifications import normalize_specifications
+from image_store import ImageStore
+from catalog_cache import bump_catalog_version
+from telegram_rate_limit import TelegramRateLimiter
+
 # Импорт модуля резервного копирования
 try:
     from database_backup import DatabaseBackup
+    from backup_jobs import STATUS_FAILED, STATUS_RUNNING, BackupJobBusy, BackupJobRunner
 except ImportError:
     DatabaseBackup = None
 
@@ -26,20 +33,60 @@ load_dotenv()
 
 
 # Configure logging
-logging.basicConfig(format=\'%(asctime)s - %(name)s - %(levelname)s - %(message)s\', level=logging.INFO)
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Admin configuration
 ADMIN_ID = int(os.environ.get("ADMIN_ID", 0))
-BOT_TOKEN = os.environ.get(\'BOT_TOKEN\')
-MONGO_URL = os.environ.get(\'MONGO_URL\')
-DB_NAME = os.environ.get(\'DB_NAME\')
+BOT_TOKEN = os.environ.get('BOT_TOKEN')
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME')
+
+# How many recent snapshots the restore menu offers
+BACKUP_LIST_SIZE = 10
 
 # Initialize MongoDB connection
 client = AsyncIOMotorClient(MONGO_URL)
 db = client[DB_NAME]
 
 
+async def backup_restored():
+    await bump_catalog_version(db, "products")
+    await bump_catalog_version(db, "projects")
+
+# Backup jobs run in the background on the bot's client; the menu shows their progress
+backup_jobs = BackupJobRunner(db, on_restored=backup_restored) if DatabaseBackup else None
+
+
+class BotRateLimiter(BaseRateLimiter):
+    """Pass every bot request through the shared token buckets"""
+    MAX_RETRIES = 3
+
+    def __init__(self):
+        self.limiter = TelegramRateLimiter()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id") if data else None
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.limiter.acquire(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.MAX_RETRIES:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Flood control on {endpoint}, waiting {retry_after}s")
+                self.limiter.pause(retry_after)
+
+
 class AdminState:
     """Manage admin session states"""
     def __init__(self):
@@ -58,15 +105,26 @@ class AdminState:
             del self.states[user_id]
     
     def get_action(self, user_id: int) -> Optional[str]:
-        return self.get_state(user_id).get(\'action\')
+        return self.get_state(user_id).get('action')
     
     def set_action(self, user_id: int, action: str):
-        self.set_state(user_id, \'action\', action)
+        self.set_state(user_id, 'action', action)
 
 
 # Global state manager
 admin_state = AdminState()
 
+# Shared image storage (same directory the API serves /api/images from)
+image_store = ImageStore()
+
+
+async def save_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+    """Download the highest resolution photo and return its image store URL"""
+    photo = update.message.photo[-1]
+    file = await context.bot.get_file(photo.file_id)
+    photo_bytes = await file.download_as_bytearray()
+    return await asyncio.to_thread(image_store.save, bytes(photo_bytes))
+
 
 async def check_admin(update: Update) -> bool:
     """Check if user is admin"""
@@ -244,13 +302,13 @@ async def show_products_list(query, action_type):
     
     keyboard = []
     for product in products:
-        button_text = f"{\'📝\' if action_type == \'edit\' else \'🗑️\'} {product[\'name\]}"
-        callback_data = f"{\'edit\' if action_type == \'edit\' else \'delete\'}_product_{product[\'id\]}"
+        button_text = f"{'📝' if action_type == 'edit' else '🗑️'} {product['name']}"
+        callback_data = f"{'edit' if action_type == 'edit' else 'delete'}_product_{product['id']}"
         keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
     keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="manage_products")])
     
     await query.edit_message_text(
-        f"{\'📝\' if action_type == \'edit\' else \'🗑️\'} **Выберите товар:**",
+        f"{'📝' if action_type == 'edit' else '🗑️'} **Выберите товар:**",
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
@@ -268,7 +326,7 @@ async def delete_product_confirm(query, product_id):
     ]
     
     await query.edit_message_text(
-        f"🗑️ Вы уверены, что хотите удалить товар \'{product[\'name\]}\'?",
+        f"🗑️ Вы уверены, что хотите удалить товар '{product['name']}'?",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
@@ -293,13 +351,13 @@ async def show_projects_list(query, action_type):
     
     keyboard = []
     for project in projects:
-        button_text = f"{\'📝\' if action_type == \'edit\' else \'🗑️\'} {project[\'title\]}"
-        callback_data = f"{\'edit\' if action_type == \'edit\' else \'delete\'}_project_{project[\'id\]}"
+        button_text = f"{'📝' if action_type == 'edit' else '🗑️'} {project['title']}"
+        callback_data = f"{'edit' if action_type == 'edit' else 'delete'}_project_{project['id']}"
         keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
     keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="manage_projects")])
     
     await query.edit_message_text(
-        f"{\'📝\' if action_type == \'edit\' else \'🗑️\'} **Выберите проект:**",
+        f"{'📝' if action_type == 'edit' else '🗑️'} **Выберите проект:**",
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
@@ -317,7 +375,7 @@ async def delete_project_confirm(query, project_id):
     ]
     
     await query.edit_message_text(
-        f"🗑️ Вы уверены, что хотите удалить проект \'{project[\'title\]}\'?",
+        f"🗑️ Вы уверены, что хотите удалить проект '{project['title']}'?",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
@@ -325,6 +383,7 @@ async def delete_project(query, project_id):
     """Delete a project"""
     result = await db.projects.delete_one({"id": project_id})
     if result.deleted_count > 0:
+        await bump_catalog_version(db, "projects")
         await query.edit_message_text(
             "✅ Проект успешно удален!",
             reply_markup=get_back_keyboard()
@@ -339,6 +398,7 @@ async def delete_product(query, product_id):
     """Delete a product"""
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count > 0:
+        await bump_catalog_version(db, "products")
         await query.edit_message_text(
             "✅ Товар успешно удален!",
             reply_markup=get_back_keyboard()
@@ -357,6 +417,10 @@ async def show_backup_menu(query):
         [InlineKeyboardButton("📊 Статус резервных копий", callback_data="backup_status")],
         [InlineKeyboardButton("🔙 Назад", callback_data="main_menu")]
     ]
+    active = await backup_jobs.active() if backup_jobs else None
+    if active:
+        keyboard.insert(0, [InlineKeyboardButton(f"⏳ {JOB_TITLES[active['kind']]}: ход выполнения",
+                                                 callback_data=f"backup_job_{active['id']}")])
     await query.edit_message_text(
         "💾 **Управление резервными копиями**\n\nВыберите действие:",
         parse_mode=ParseMode.MARKDOWN,
@@ -372,27 +436,75 @@ async def start_project_creation(query, user_id):
         parse_mode=ParseMode.MARKDOWN
     )
 
-async def create_backup_handler(query):
-    """Handle backup creation"""
+def backup_label(backup: dict) -> str:
+    """Button/status label for a snapshot from list_backups()"""
+    kind = "полная" if backup["type"] == "full" else "изменения"
+    created = backup["created_at"][:16].replace("T", " ")
+    return f"{created} UTC, {kind}, {backup['bytes'] / 1024:.0f} КБ"
+
+JOB_TITLES = {
+    "backup": "Создание резервной копии",
+    "restore": "Восстановление из копии",
+}
+
+def job_text(job: dict) -> str:
+    """Status text for a backup job with per-collection progress"""
+    if job["status"] == STATUS_RUNNING:
+        state = "⏳ выполняется"
+    elif job["status"] == STATUS_FAILED:
+        state = f"❌ ошибка: {job['error']}"
+    else:
+        state = "✅ готово"
+    lines = [f"{JOB_TITLES[job['kind']]}: {state}"]
+    for name, progress in sorted(job["progress"].items()):
+        documents = progress.get("documents", 0)
+        if progress.get("total") is not None:
+            documents = f"{documents} из {progress['total']}"
+        size = f"{progress.get('bytes', 0) / 1024:.0f}"
+        if progress.get("total_bytes") is not None:
+            size = f"{size} из {progress['total_bytes'] / 1024:.0f}"
+        mark = " ✅" if progress.get("done") else ""
+        lines.append(f"{name}: {documents} док., {size} КБ{mark}")
+    if job["status"] == STATUS_RUNNING:
+        lines.append("\nОбновите, чтобы увидеть ход выполнения")
+    return "\n".join(lines)
+
+async def show_backup_job(query, job_id: str):
+    """Show a backup job and a refresh button while it runs"""
+    job = await backup_jobs.get(job_id)
+    if not job:
+        await query.edit_message_text("❌ Задача не найдена", reply_markup=get_back_keyboard())
+        return
+    keyboard = []
+    if job["status"] == STATUS_RUNNING:
+        keyboard.append([InlineKeyboardButton("🔄 Обновить", callback_data=f"backup_job_{job_id}")])
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="backup_menu")])
+    await query.edit_message_text(job_text(job), reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def submit_backup_job(query, kind: str, **params):
+    """Start a backup job and show its progress"""
     if DatabaseBackup is None:
         await query.edit_message_text(
             "❌ Модуль резервного копирования недоступен",
             reply_markup=get_back_keyboard()
         )
         return
-    
     try:
-        backup = DatabaseBackup()
-        filename = await backup.create_backup()
-        await query.edit_message_text(
-            f"✅ Резервная копия создана успешно!\nФайл: {filename}",
-            reply_markup=get_back_keyboard()
-        )
-    except Exception as e:
+        job = await backup_jobs.submit(kind, **params)
+    except BackupJobBusy as e:
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="backup_menu")]]
+        if e.job:
+            keyboard.insert(0, [InlineKeyboardButton("⏳ Ход выполнения", callback_data=f"backup_job_{e.job['id']}")])
         await query.edit_message_text(
-            f"❌ Ошибка при создании резервной копии: {str(e)}",
-            reply_markup=get_back_keyboard()
+            "⏳ Уже выполняется задача резервного копирования, дождитесь ее окончания",
+            reply_markup=InlineKeyboardMarkup(keyboard)
         )
+        return
+    await show_backup_job(query, job["id"])
+
+async def create_backup_handler(query):
+    """Handle backup creation"""
+    await submit_backup_job(query, "backup")
 
 async def restore_backup_handler(query):
     """Handle backup restoration"""
@@ -404,8 +516,7 @@ async def restore_backup_handler(query):
         return
     
     try:
-        backup = DatabaseBackup()
-        backups = await backup.list_backups()
+        backups = DatabaseBackup.list_backups()[:BACKUP_LIST_SIZE]
         if not backups:
             await query.edit_message_text(
                 "❌ Резервные копии не найдены",
@@ -415,7 +526,7 @@ async def restore_backup_handler(query):
         
         keyboard = []
         for b in backups:
-            keyboard.append([InlineKeyboardButton(b, callback_data=f"restore_{b}")])
+            keyboard.append([InlineKeyboardButton(backup_label(b), callback_data=f"restore_{b['id']}")])
         keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="backup_menu")])
         
         await query.edit_message_text(
@@ -437,19 +548,24 @@ async def show_backup_status(query):
         )
         return
     
+    backup = DatabaseBackup(db)
     try:
-        backup = DatabaseBackup()
-        status = await backup.get_status()
-        await query.edit_message_text(
-            f"📊 **Статус резервных копий**\n\n{status}",
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=get_back_keyboard()
-        )
+        status = await backup.get_database_status()
+        backups = DatabaseBackup.list_backups()
+        lines = [f"{name}: {count}" for name, count in status.items() if name not in ('total', 'has_data')]
+        text = "📊 Статус резервных копий\n\nДокументов в базе:\n" + "\n".join(lines)
+        if backups:
+            text += f"\n\nКопий: {len(backups)}, {sum(b['bytes'] for b in backups) / 1024 / 1024:.1f} МБ\nПоследняя: {backup_label(backups[0])}"
+        else:
+            text += "\n\nРезервных копий пока нет"
+        await query.edit_message_text(text, reply_markup=get_back_keyboard())
     except Exception as e:
         await query.edit_message_text(
             f"❌ Ошибка при получении списка резервных копий: {str(e)}",
             reply_markup=get_back_keyboard()
         )
+    finally:
+        await backup.close()
 
 
 async def edit_product_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -466,16 +582,16 @@ async def edit_product_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
 
         keyboard = [
-            [InlineKeyboardButton(f"📝 Название: {product.get(\'name\', \'Не указано\')}", callback_data=f"edit_product_name_{product_id}")],
-            [InlineKeyboardButton(f"📝 Краткое описание: {product.get(\'short_description\', \'Не указано\')}", callback_data=f"edit_product_short_desc_{product_id}")],
-            [InlineKeyboardButton(f"📝 Описание: {product.get(\'description\', \'Не указано\')}", callback_data=f"edit_product_desc_{product_id}")],
-            [InlineKeyboardButton(f"💰 Цена: {product.get(\'price\', \'Не указано\')}", callback_data=f"edit_product_price_{product_id}")],
+            [InlineKeyboardButton(f"📝 Название: {product.get('name', 'Не указано')}", callback_data=f"edit_product_name_{product_id}")],
+            [InlineKeyboardButton(f"📝 Краткое описание: {product.get('short_description', 'Не указано')}", callback_data=f"edit_product_short_desc_{product_id}")],
+            [InlineKeyboardButton(f"📝 Описание: {product.get('description', 'Не указано')}", callback_data=f"edit_product_desc_{product_id}")],
+            [InlineKeyboardButton(f"💰 Цена: {product.get('price', 'Не указано')}", callback_data=f"edit_product_price_{product_id}")],
             [InlineKeyboardButton("⚙️ Характеристики", callback_data=f"edit_product_specs_{product_id}")],
             [InlineKeyboardButton("📷 Изображение", callback_data=f"edit_product_image_{product_id}")],
             [InlineKeyboardButton("🔙 Назад", callback_data="manage_products")]
         ]
         await query.edit_message_text(
-            f"📝 **Редактирование товара: {product.get(\'name\', \'\')}**\n\nВыберите, что хотите изменить:",
+            f"📝 **Редактирование товара: {product.get('name', '')}**\n\nВыберите, что хотите изменить:",
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
@@ -495,14 +611,14 @@ async def edit_project_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
 
         keyboard = [
-            [InlineKeyboardButton(f"📝 Название: {project.get(\'title\', \'Не указано\')}", callback_data=f"edit_project_title_{project_id}")],
-            [InlineKeyboardButton(f"📝 Описание: {project.get(\'description\', \'Не указано\')}", callback_data=f"edit_project_desc_{project_id}")],
-            [InlineKeyboardButton(f"📍 Адрес: {project.get(\'address\', \'Не указано\')}", callback_data=f"edit_project_address_{project_id}")],
+            [InlineKeyboardButton(f"📝 Название: {project.get('title', 'Не указано')}", callback_data=f"edit_project_title_{project_id}")],
+            [InlineKeyboardButton(f"📝 Описание: {project.get('description', 'Не указано')}", callback_data=f"edit_project_desc_{project_id}")],
+            [InlineKeyboardButton(f"📍 Адрес: {project.get('address', 'Не указано')}", callback_data=f"edit_project_address_{project_id}")],
             [InlineKeyboardButton("📷 Изображения", callback_data=f"edit_project_images_{project_id}")],
             [InlineKeyboardButton("🔙 Назад", callback_data="manage_projects")]
         ]
         await query.edit_message_text(
-            f"📝 **Редактирование проекта: {project.get(\'title\', \'\')}**\n\nВыберите, что хотите изменить:",
+            f"📝 **Редактирование проекта: {project.get('title', '')}**\n\nВыберите, что хотите изменить:",
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
@@ -552,26 +668,11 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
         await restore_backup_handler(query)
     elif data == "backup_status":
         await show_backup_status(query)
+    elif data.startswith("backup_job_"):
+        await show_backup_job(query, data.replace("backup_job_", ""))
     elif data.startswith("restore_"):
-        filename = data.replace("restore_", "")
-        if DatabaseBackup is None:
-            await query.edit_message_text(
-                "❌ Модуль резервного копирования недоступен",
-                reply_markup=get_back_keyboard()
-            )
-            return
-        try:
-            backup = DatabaseBackup()
-            await backup.restore_backup(filename)
-            await query.edit_message_text(
-                f"✅ База данных успешно восстановлена из {filename}!",
-                reply_markup=get_back_keyboard()
-            )
-        except Exception as e:
-            await query.edit_message_text(
-                f"❌ Ошибка при восстановлении резервной копии: {str(e)}",
-                reply_markup=get_back_keyboard()
-            )
+        snapshot_id = data.replace("restore_", "")
+        await submit_backup_job(query, "restore", snapshot_id=snapshot_id)
     elif data == "statistics":
         await query.edit_message_text("📊 Статистика пока недоступна.", reply_markup=get_back_keyboard())
 
@@ -709,13 +810,14 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif action == "add_product_specifications":
         specifications = {}
-        for line in text.split(\'\n\'):
-            if \':\' in line:
-                key, value = line.split(\':\', 1)
+        for line in text.split('\n'):
+            if ':' in line:
+                key, value = line.split(':', 1)
                 specifications[key.strip()] = value.strip()
         
         product_data = admin_state.get_state(user_id).get("new_product", {})
         product_data["specifications"] = specifications
+        product_data.update(normalize_specifications(product_data.get("name"), specifications))
         admin_state.set_state(user_id, "new_product", product_data)
         admin_state.set_action(user_id, "add_product_image")
         await update.message.reply_text("📷 Отправьте изображение товара:")
@@ -743,10 +845,14 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Handle product editing
     elif action.startswith("edit_product_name_"):
         product_id = action.replace("edit_product_name_", "")
+        # Бренд может браться из названия, поэтому пересчитываем его
+        product = await db.products.find_one({"id": product_id}, {"specifications": 1})
+        brand = normalize_specifications(text, product.get("specifications") if product else None)["brand"]
         await db.products.update_one(
             {"id": product_id}, 
-            {"$set": {"name": text}}
+            {"$set": {"name": text, "brand": brand}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "products")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Название товара обновлено!",
@@ -757,8 +863,9 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         product_id = action.replace("edit_product_short_desc_", "")
         await db.products.update_one(
             {"id": product_id}, 
-            {"$set": {"short_description": text}}
+            {"$set": {"short_description": text}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "products")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Краткое описание товара обновлено!",
@@ -769,8 +876,9 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         product_id = action.replace("edit_product_desc_", "")
         await db.products.update_one(
             {"id": product_id}, 
-            {"$set": {"description": text}}
+            {"$set": {"description": text}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "products")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Описание товара обновлено!",
@@ -783,8 +891,9 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             product_id = action.replace("edit_product_price_", "")
             await db.products.update_one(
                 {"id": product_id}, 
-                {"$set": {"price": price}}
+                {"$set": {"price": price}, "$currentDate": {"updated_at": True}}
             )
+            await bump_catalog_version(db, "products")
             admin_state.clear_state(user_id)
             await update.message.reply_text(
                 "✅ Цена товара обновлена!",
@@ -795,16 +904,19 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif action.startswith("edit_product_specs_"):
         specifications = {}
-        for line in text.split(\'\n\'):
-            if \':\' in line:
-                key, value = line.split(\':\', 1)
+        for line in text.split('\n'):
+            if ':' in line:
+                key, value = line.split(':', 1)
                 specifications[key.strip()] = value.strip()
         
         product_id = action.replace("edit_product_specs_", "")
+        product = await db.products.find_one({"id": product_id}, {"name": 1})
+        normalized = normalize_specifications(product.get("name") if product else None, specifications)
         await db.products.update_one(
             {"id": product_id}, 
-            {"$set": {"specifications": specifications}}
+            {"$set": {"specifications": specifications, **normalized}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "products")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Характеристики товара обновлены!",
@@ -816,8 +928,9 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         project_id = action.replace("edit_project_title_", "")
         await db.projects.update_one(
             {"id": project_id}, 
-            {"$set": {"title": text}}
+            {"$set": {"title": text}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "projects")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Название проекта обновлено!",
@@ -828,8 +941,9 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         project_id = action.replace("edit_project_desc_", "")
         await db.projects.update_one(
             {"id": project_id}, 
-            {"$set": {"description": text}}
+            {"$set": {"description": text}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "projects")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Описание проекта обновлено!",
@@ -840,8 +954,9 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         project_id = action.replace("edit_project_address_", "")
         await db.projects.update_one(
             {"id": project_id}, 
-            {"$set": {"address": text}}
+            {"$set": {"address": text}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "projects")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Адрес проекта обновлен!",
@@ -858,21 +973,17 @@ async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     action = admin_state.get_action(user_id)
     
     if action == "add_product_image":
-        # Download photo
-        photo = update.message.photo[-1]  # Get highest resolution
-        file = await context.bot.get_file(photo.file_id)
-        
-        # Convert to base64
-        photo_bytes = await file.download_as_bytearray()
-        image_base64 = base64.b64encode(photo_bytes).decode(\'utf-8\')
+        # Store the photo once on disk, the document keeps only a short link
+        image_url = await save_photo(update, context)
         
         # Save product
         product_data = admin_state.get_state(user_id).get("new_product", {})
-        product_data["image_url"] = f"data:image/jpeg;base64,{image_base64}"
+        product_data["image_url"] = image_url
         product_data["created_at"] = datetime.utcnow()
-        product_data["id"] = str(db.products.count_documents({}) + 1) # Simple ID generation
+        product_data["id"] = str(uuid.uuid4())
         
         await db.products.insert_one(product_data)
+        await bump_catalog_version(db, "products")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Товар успешно добавлен!",
@@ -881,15 +992,13 @@ async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif action.startswith("edit_product_image_"):
         product_id = action.replace("edit_product_image_", "")
-        photo = update.message.photo[-1]
-        file = await context.bot.get_file(photo.file_id)
-        photo_bytes = await file.download_as_bytearray()
-        image_base64 = base64.b64encode(photo_bytes).decode(\'utf-8\')
+        image_url = await save_photo(update, context)
         
         await db.products.update_one(
             {"id": product_id},
-            {"$set": {"image_url": f"data:image/jpeg;base64,{image_base64}"}}
+            {"$set": {"image_url": image_url}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "products")
         admin_state.clear_state(user_id)
         await update.message.reply_text(
             "✅ Изображение товара обновлено!",
@@ -899,14 +1008,10 @@ async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif action == "add_project_images":
         project_data = admin_state.get_state(user_id).get("new_project", {})
         current_images = project_data.get("image_urls", [])
+        current_images.append(await save_photo(update, context))
         
-        photo = update.message.photo[-1]
-        file = await context.bot.get_file(photo.file_id)
-        photo_bytes = await file.download_as_bytearray()
-        image_base64 = base64.b64encode(photo_bytes).decode(\'utf-8\')
-        current_images.append(f"data:image/jpeg;base64,{image_base64}")
-        
-        admin_state.set_state(user_id, "new_project", {"image_urls": current_images})
+        project_data["image_urls"] = current_images
+        admin_state.set_state(user_id, "new_project", project_data)
         
         keyboard = [
             [InlineKeyboardButton("✅ Готово", callback_data="finish_add_project_images")],
@@ -925,16 +1030,13 @@ async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         current_images = project.get("image_urls", [])
-        photo = update.message.photo[-1]
-        file = await context.bot.get_file(photo.file_id)
-        photo_bytes = await file.download_as_bytearray()
-        image_base64 = base64.b64encode(photo_bytes).decode(\'utf-8\')
-        current_images.append(f"data:image/jpeg;base64,{image_base64}")
+        current_images.append(await save_photo(update, context))
 
         await db.projects.update_one(
             {"id": project_id},
-            {"$set": {"image_urls": current_images}}
+            {"$set": {"image_urls": current_images}, "$currentDate": {"updated_at": True}}
         )
+        await bump_catalog_version(db, "projects")
         
         keyboard = [
             [InlineKeyboardButton("✅ Готово", callback_data="finish_edit_project_images")],
@@ -952,9 +1054,10 @@ async def finish_add_project_images(update: Update, context: ContextTypes.DEFAUL
     user_id = query.from_user.id
     project_data = admin_state.get_state(user_id).get("new_project", {})
     project_data["created_at"] = datetime.utcnow()
-    project_data["id"] = str(db.projects.count_documents({}) + 1) # Simple ID generation
+    project_data["id"] = str(uuid.uuid4())
     
     await db.projects.insert_one(project_data)
+    await bump_catalog_version(db, "projects")
     admin_state.clear_state(user_id)
     await query.edit_message_text(
         "✅ Проект успешно добавлен!",
@@ -993,7 +1096,7 @@ async def list_products_handler(update: Update, context: ContextTypes.DEFAULT_TY
 
     product_list_text = "📋 **Список товаров:**\n\n"
     for product in products:
-        product_list_text += f"• **{product.get(\'name\', \'Не указано\')}** (ID: {product.get(\'id\', \'Не указано\')})\n"
+        product_list_text += f"• **{product.get('name', 'Не указано')}** (ID: {product.get('id', 'Не указано')})\n"
 
     await query.edit_message_text(
         product_list_text,
@@ -1012,7 +1115,7 @@ async def list_projects_handler(update: Update, context: ContextTypes.DEFAULT_TY
 
     project_list_text = "📋 **Список проектов:**\n\n"
     for project in projects:
-        project_list_text += f"• **{project.get(\'title\', \'Не указано\')}** (ID: {project.get(\'id\', \'Не указано\')})\n"
+        project_list_text += f"• **{project.get('title', 'Не указано')}** (ID: {project.get('id', 'Не указано')})\n"
 
     await query.edit_message_text(
         project_list_text,
@@ -1022,7 +1125,7 @@ async def list_projects_handler(update: Update, context: ContextTypes.DEFAULT_TY
 
 
 def main():
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = Application.builder().token(BOT_TOKEN).rate_limiter(BotRateLimiter()).build()
 
     # Commands
     application.add_handler(CommandHandler("start", start_command))
@@ -1036,13 +1139,13 @@ def main():
     application.add_handler(MessageHandler(filters.PHOTO, photo_handler))
 
     # Add specific handlers for edit actions
-    application.add_handler(CallbackQueryHandler(edit_product_handler, pattern=r\'^edit_product_\w+$\' ))
-    application.add_handler(CallbackQueryHandler(edit_project_handler, pattern=r\'^edit_project_\w+$\' ))
-    application.add_handler(CallbackQueryHandler(finish_add_project_images, pattern=\'^finish_add_project_images$\' ))
-    application.add_handler(CallbackQueryHandler(finish_edit_project_images, pattern=\'^finish_edit_project_images$\' ))
-    application.add_handler(CallbackQueryHandler(add_more_project_images, pattern=\'^add_more_project_images$\' ))
-    application.add_handler(CallbackQueryHandler(list_products_handler, pattern=\'^list_products$\' ))
-    application.add_handler(CallbackQueryHandler(list_projects_handler, pattern=\'^list_projects$\' ))
+    application.add_handler(CallbackQueryHandler(edit_product_handler, pattern=r'^edit_product_\w+$' ))
+    application.add_handler(CallbackQueryHandler(edit_project_handler, pattern=r'^edit_project_\w+$' ))
+    application.add_handler(CallbackQueryHandler(finish_add_project_images, pattern='^finish_add_project_images$' ))
+    application.add_handler(CallbackQueryHandler(finish_edit_project_images, pattern='^finish_edit_project_images$' ))
+    application.add_handler(CallbackQueryHandler(add_more_project_images, pattern='^add_more_project_images$' ))
+    application.add_handler(CallbackQueryHandler(list_products_handler, pattern='^list_products$' ))
+    application.add_handler(CallbackQueryHandler(list_projects_handler, pattern='^list_projects$' ))
 
     # Run the bot until the user presses Ctrl-C
     application.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -0,0 +1,97 @@
+"""
+HTTP-клиент Telegram Bot API
+Один долгоживущий httpx.AsyncClient на процесс: соединение с api.telegram.org
+открывается один раз и переиспользуется всеми уведомлениями
+"""
+
+import os
+from typing import Optional
+import httpx
+import logging
+
+try:
+    from backend.telegram_rate_limit import TelegramRateLimiter
+except ImportError:
+    from telegram_rate_limit import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Адрес Bot API, для тестов можно указать локальную заглушку
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+
+# Таймауты, секунды
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 10.0
+WRITE_TIMEOUT = 10.0
+POOL_TIMEOUT = 5.0
+
+# Уведомления идут в один хост, поэтому пул небольшой
+MAX_CONNECTIONS = 10
+MAX_KEEPALIVE_CONNECTIONS = 5
+KEEPALIVE_EXPIRY = 60.0
+
+# HTTP/2 требует пакет h2 (httpx[http2]), без него остается HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class TelegramClient:
+    def __init__(self, token: Optional[str], base_url: str = TELEGRAM_API_BASE,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 limiter: Optional[TelegramRateLimiter] = None):
+        self.token = token
+        self.limiter = limiter
+        self.base_url = base_url.rstrip('/')
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=f"{self.base_url}/bot{self.token}",
+            http2=HTTP2_AVAILABLE and self._transport is None,
+            timeout=httpx.Timeout(
+                connect=CONNECT_TIMEOUT, read=READ_TIMEOUT, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            ),
+            transport=self._transport
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def start(self):
+        """Создать клиент при старте приложения"""
+        self.client
+        logger.info(f"Telegram клиент готов ({'HTTP/2' if HTTP2_AVAILABLE else 'HTTP/1.1'})")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call(self, method: str, payload: dict) -> dict:
+        """Вызвать метод Bot API и вернуть разобранный ответ"""
+        if self.limiter:
+            await self.limiter.acquire(payload.get("chat_id"))
+        response = await self.client.post(f"/{method}", json=payload)
+        result = response.json()
+        if self.limiter and result.get("error_code") == 429:
+            self.limiter.pause((result.get("parameters") or {}).get("retry_after"))
+        return result
+
+    async def send_message(self, chat_id, text: str, parse_mode: str = "HTML") -> dict:
+        return await self.call("sendMessage", {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode
+        })
@@ -0,0 +1,110 @@
+"""
+Ограничение частоты запросов к Telegram Bot API
+Token bucket на весь бот и отдельный на каждый чат, чтобы всплески
+сообщений (например, заказы во время акции) не упирались в 429
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+# Общий лимит бота - около 30 сообщений в секунду
+GLOBAL_RATE = 25.0
+GLOBAL_BURST = 25
+
+# В один чат - не чаще раза в секунду с небольшим запасом на всплеск
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+
+# В группы - не больше 20 сообщений в минуту
+GROUP_RATE = 20 / 60
+GROUP_BURST = 3
+
+# Выше этого числа чатов простаивающие корзины удаляются
+MAX_CHAT_BUCKETS = 1000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до следующего токена, ничего не забирая"""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Забрать токен (в долг, если их нет) и вернуть, сколько ждать до его появления.
+
+        Долг делает очередь честной: каждый следующий вызов ждет дольше предыдущего
+        """
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class TelegramRateLimiter:
+    """Общий и поканальные лимиты отправки плюс пауза после 429"""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, global_burst: int = GLOBAL_BURST,
+                 chat_rate: float = CHAT_RATE, chat_burst: int = CHAT_BURST,
+                 group_rate: float = GROUP_RATE, group_burst: int = GROUP_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self._chats: Dict[str, TokenBucket] = {}
+        self._paused_until = 0.0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle}
+            # Отрицательные id и @username - группы и каналы
+            is_group = key.startswith('-') or key.startswith('@')
+            bucket = TokenBucket(*((self.group_rate, self.group_burst) if is_group
+                                   else (self.chat_rate, self.chat_burst)))
+            self._chats[key] = bucket
+        return bucket
+
+    def _pause_delay(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def delay(self, chat_id=None) -> float:
+        """Сколько пришлось бы ждать отправке в чат прямо сейчас"""
+        delays = [self._pause_delay(), self.global_bucket.delay()]
+        if chat_id is not None:
+            delays.append(self._chat_bucket(chat_id).delay())
+        return max(delays)
+
+    async def acquire(self, chat_id=None):
+        """Дождаться права на отправку"""
+        wait = max(self._pause_delay(), self.global_bucket.reserve())
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).reserve())
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # Пауза могла начаться, пока ждали
+        pause = self._pause_delay()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    def pause(self, seconds: Optional[float]):
+        """Остановить отправку на время, указанное Telegram в retry_after"""
+        if seconds:
+            self._paused_until = max(self._paused_until, time.monotonic() + float(seconds))
@@ -0,0 +1,154 @@
+"""
+Производные размеры изображений
+Уменьшает и перекодирует изображения через Pillow и хранит результат
+в дисковом LRU-кеше ограниченного размера
+"""
+
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+from PIL import Image, ImageOps
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+# Папка и предельный размер кеша производных изображений
+THUMBNAIL_CACHE_DIR = Path(os.environ.get('THUMBNAIL_CACHE_DIR', ROOT_DIR / 'media' / 'thumbnails'))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get('THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Запрошенная ширина округляется вверх до одной из стандартных,
+# чтобы кеш не разрастался вариантами, отличающимися на пару пикселей
+STANDARD_WIDTHS = (64, 128, 160, 240, 320, 480, 640, 800, 1024, 1280, 1600, 2048)
+
+# fmt -> (формат Pillow, Content-Type, расширение)
+OUTPUT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'jpg': ('JPEG', 'image/jpeg', 'jpg'),
+    'png': ('PNG', 'image/png', 'png'),
+}
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def snap_width(width: Optional[int]) -> Optional[int]:
+    if width is None:
+        return None
+    for standard in STANDARD_WIDTHS:
+        if width <= standard:
+            return standard
+    return STANDARD_WIDTHS[-1]
+
+
+def media_type_for(fmt: str) -> str:
+    return OUTPUT_FORMATS[fmt][1]
+
+
+def variant_name(source_digest: str, width: Optional[int], fmt: str) -> str:
+    return f"{source_digest}-{width or 'orig'}.{OUTPUT_FORMATS[fmt][2]}"
+
+
+def render_variant(source: bytes, width: Optional[int], fmt: str) -> bytes:
+    """Уменьшить изображение до ширины width и закодировать в формат fmt"""
+    pil_format = OUTPUT_FORMATS[fmt][0]
+    with Image.open(io.BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        if width and image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        output = io.BytesIO()
+        if pil_format == 'JPEG':
+            image.save(output, pil_format, quality=JPEG_QUALITY, optimize=True, progressive=True)
+        elif pil_format == 'WEBP':
+            image.save(output, pil_format, quality=WEBP_QUALITY, method=4)
+        else:
+            image.save(output, pil_format, optimize=True)
+        return output.getvalue()
+
+
+class ThumbnailCache:
+    """Дисковый LRU-кеш производных изображений"""
+
+    def __init__(self, root: Path = THUMBNAIL_CACHE_DIR, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Восстановить порядок LRU по времени последнего обращения к файлам"""
+        files = []
+        for path in self.root.iterdir():
+            if path.is_file() and not path.name.startswith('.tmp-'):
+                stat = path.stat()
+                files.append((stat.st_atime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+    def get(self, name: str) -> Optional[Path]:
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = self.root / name
+        return path if path.exists() else None
+
+    def put(self, name: str, data: bytes) -> Path:
+        path = self.root / name
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            self._size += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            evicted = []
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                (self.root / old_name).unlink()
+            except FileNotFoundError:
+                pass
+        return path
+
+    def get_or_render(self, source_digest: str, load_source: Callable[[], bytes],
+                      width: Optional[int], fmt: str) -> Path:
+        """Вернуть путь к производному изображению, создав его при необходимости.
+
+        Блокирующая функция: вызывать через asyncio.to_thread
+        """
+        name = variant_name(source_digest, width, fmt)
+        path = self.get(name)
+        if path:
+            return path
+        data = render_variant(load_source(), width, fmt)
+        logger.info(f"Создано производное изображение {name} ({len(data)} байт)")
+        return self.put(name, data)
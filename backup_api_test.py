@@ -27,6 +27,23 @@ def test_backup_status():
         print(f"Response: {response.text}")
         return None
 
+def wait_for_job(job_id, timeout=120):
+    """Poll a backup job until it finishes, printing its progress"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f"{API_URL}/backup/jobs/{job_id}")
+        job = response.json()
+        progress = ", ".join(f"{name} {p.get('documents', 0)}" for name, p in job["progress"].items())
+        print(f"⏳ Job {job_id[:8]}: {job['status']} {progress}")
+        if job["status"] == "failed":
+            print(f"❌ Job {job_id} failed: {job['error']}")
+            return None
+        if job["status"] != "running":
+            return job
+        time.sleep(1)
+    print(f"❌ Job {job_id} did not finish in {timeout}s")
+    return None
+
 def test_create_backup():
     """Test the create backup API endpoint"""
     print("\n🔍 Testing create backup API...")
@@ -34,8 +51,10 @@ def test_create_backup():
     response = requests.post(f"{API_URL}/backup/create")
     print(f"Status code: {response.status_code}")
     
-    if response.status_code == 200:
-        data = response.json()
+    if response.status_code == 202:
+        data = wait_for_job(response.json()["id"])
+        if data is None:
+            return None
         print(f"✅ Create backup API response: {json.dumps(data, indent=2)}")
         return data
     else:
@@ -50,8 +69,10 @@ def test_restore_backup():
     response = requests.post(f"{API_URL}/backup/restore")
     print(f"Status code: {response.status_code}")
     
-    if response.status_code == 200:
-        data = response.json()
+    if response.status_code == 202:
+        data = wait_for_job(response.json()["id"])
+        if data is None:
+            return None
         print(f"✅ Restore backup API response: {json.dumps(data, indent=2)}")
         return data
     else:
@@ -68,21 +89,13 @@ if __name__ == '__main__':
     # Test create backup
     create_result = test_create_backup()
     
-    # Wait a moment for backup to complete
     if create_result:
-        print("\n⏳ Waiting for backup to complete...")
-        time.sleep(2)
-        
         # Test backup status again
         after_create_status = test_backup_status()
         
         # Test restore backup
         restore_result = test_restore_backup()
         
-        # Wait a moment for restore to complete
         if restore_result:
-            print("\n⏳ Waiting for restore to complete...")
-            time.sleep(2)
-            
             # Test backup status again
             after_restore_status = test_backup_status()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import unittest
+import asyncio
+import json
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# MongoDB connection; a separate database so the restores don't touch test_database
+MONGO_URL = "mongodb://localhost:27017"
+DB_NAME = "backup_restore_test"
+
+# Add backend directory to path to import database_backup
+sys.path.append('/app/backend')
+import database_backup
+from database_backup import BACKUP_DIR, DatabaseBackup
+
+class BackupRestoreTest(unittest.TestCase):
+    """Test suite for restoring snapshots and old flat-file backups directly against MongoDB"""
+
+    def setUp(self):
+        """Point snapshots at an empty temporary folder"""
+        self.snapshots_dir = tempfile.TemporaryDirectory()
+        self.original_snapshots_dir = database_backup.SNAPSHOTS_DIR
+        database_backup.SNAPSHOTS_DIR = Path(self.snapshots_dir.name)
+
+    def tearDown(self):
+        database_backup.SNAPSHOTS_DIR = self.original_snapshots_dir
+        self.snapshots_dir.cleanup()
+
+    def run_with_db(self, scenario):
+        async def run():
+            client = AsyncIOMotorClient(MONGO_URL)
+            await client.drop_database(DB_NAME)
+            try:
+                await scenario(DatabaseBackup(client[DB_NAME]), client[DB_NAME])
+            finally:
+                await client.drop_database(DB_NAME)
+                client.close()
+        asyncio.run(run())
+
+    def test_01_restore_shipped_flat_files(self):
+        """Test that the backend/data files restore even though they have no cart_items.json"""
+        print("\n🔍 Testing restore from the shipped backend/data files...")
+
+        async def scenario(backup, db):
+            cart_line = {"id": str(uuid.uuid4()), "user_id": "restore_test", "product_id": "p", "quantity": 1}
+            await db.cart_items.insert_one(cart_line)
+            await db.products.insert_one({"id": "created_after_backup", "name": "Stray"})
+
+            self.assertTrue(await backup.restore_backup())
+
+            for name in ["products", "projects", "orders", "feedback"]:
+                with open(BACKUP_DIR / f"{name}.json", "r", encoding="utf-8") as f:
+                    expected = len(json.load(f))
+                self.assertEqual(await db[name].count_documents({}), expected, name)
+                print(f"✅ {name}: {expected} documents")
+            self.assertIsNone(await db.products.find_one({"id": "created_after_backup"}))
+            self.assertIsNotNone(await db.cart_items.find_one({"id": cart_line["id"]}),
+                                 "cart_items has no flat file and must be left as is")
+            print("✅ cart_items left untouched")
+
+        self.run_with_db(scenario)
+
+    def test_02_backup_after_restoring_older_snapshot(self):
+        """Test that the first backup after restoring an older snapshot captures the restored data"""
+        print("\n🔍 Testing backup after restoring an older snapshot...")
+        # Without the overlap the incremental query sees exactly what changed since the last copy
+        overlap = database_backup.WATERMARK_OVERLAP_SECONDS
+        database_backup.WATERMARK_OVERLAP_SECONDS = 0
+
+        async def scenario(backup, db):
+            product_id = str(uuid.uuid4())
+            await db.products.insert_one({"id": product_id, "name": "Version 1",
+                                          "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()})
+            self.assertTrue(await backup.create_backup())
+            older = database_backup.snapshot_ids()[-1]
+
+            await db.products.update_one({"id": product_id},
+                                         {"$set": {"name": "Version 2", "updated_at": datetime.utcnow()}})
+            self.assertTrue(await backup.create_backup())
+
+            self.assertTrue(await backup.restore_backup(older))
+            expected = await db.products.find({}, {"_id": 0}).to_list(None)
+            self.assertEqual(expected[0]["name"], "Version 1")
+
+            self.assertTrue(await backup.create_backup())
+            latest = database_backup.snapshot_ids()[-1]
+            self.assertEqual(database_backup.read_manifest(latest)["type"], "full")
+            print("✅ Backup after restore is full")
+
+            await db.products.insert_one({"id": "created_after_backup", "name": "Stray"})
+            self.assertTrue(await backup.restore_backup(latest))
+            restored = await db.products.find({}, {"_id": 0}).to_list(None)
+            self.assertEqual(restored, expected)
+            print("✅ Restoring that backup returns the restored data")
+
+        try:
+            self.run_with_db(scenario)
+        finally:
+            database_backup.WATERMARK_OVERLAP_SECONDS = overlap
+
+    def test_03_missing_snapshot_file_keeps_live_data(self):
+        """Test that a snapshot with a missing data file fails instead of emptying the collection"""
+        print("\n🔍 Testing restore with a missing snapshot file...")
+
+        async def scenario(backup, db):
+            await db.products.insert_one({"id": str(uuid.uuid4()), "name": "Backed up",
+                                          "created_at": datetime.utcnow()})
+            self.assertTrue(await backup.create_backup())
+            snapshot_id = database_backup.snapshot_ids()[-1]
+            manifest = database_backup.read_manifest(snapshot_id)
+            (database_backup.snapshot_dir(snapshot_id) / database_backup.collection_file(manifest, "products")).unlink()
+
+            self.assertFalse(await backup.restore_backup(snapshot_id))
+            self.assertEqual(await db.products.count_documents({}), 1)
+            print("✅ Restore failed and products were kept")
+
+        self.run_with_db(scenario)
+
+if __name__ == '__main__':
+    print(f"🚀 Testing backup restores against MongoDB at: {MONGO_URL}/{DB_NAME}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
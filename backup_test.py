@@ -25,6 +25,17 @@ DB_NAME = "test_database"
 
 # Add backend directory to path to import database_backup
 sys.path.append('/app/backend')
+from database_backup import snapshot_dir, snapshot_documents
+
+def wait_for_job(job_id, timeout=120):
+    """Poll a backup job until it finishes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{API_URL}/backup/jobs/{job_id}").json()
+        if job["status"] != "running":
+            return job
+        time.sleep(0.5)
+    raise AssertionError(f"Backup job {job_id} did not finish in {timeout}s")
 
 class DatabaseBackupTest(unittest.TestCase):
     """Test suite for the Database Backup and Restore functionality"""
@@ -186,17 +197,18 @@ class DatabaseBackupTest(unittest.TestCase):
         
         # Create backup
         response = requests.post(f"{API_URL}/backup/create")
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 202)
         
         data = response.json()
         print(f"✅ Create backup API response: {json.dumps(data, indent=2)}")
         
         # Verify response structure
-        self.assertIn("message", data)
-        self.assertIn("timestamp", data)
+        self.assertIn("id", data)
+        self.assertEqual(data["kind"], "backup")
         
-        # Wait a moment for backup to complete
-        time.sleep(2)
+        # Wait for the backup job to complete
+        job = wait_for_job(data["id"])
+        self.assertEqual(job["status"], "succeeded", job.get("error"))
         
         # Verify backup files were created
         backup_status = requests.get(f"{API_URL}/backup/status").json()
@@ -216,13 +228,12 @@ class DatabaseBackupTest(unittest.TestCase):
         
         # Verify backup files on disk
         backup_dir = Path('/app/backend/data')
-        products_file = backup_dir / "products.json"
-        projects_file = backup_dir / "projects.json"
         info_file = backup_dir / "backup_info.json"
-        
-        self.assertTrue(products_file.exists(), "Products backup file does not exist on disk")
-        self.assertTrue(projects_file.exists(), "Projects backup file does not exist on disk")
         self.assertTrue(info_file.exists(), "Backup info file does not exist on disk")
+        with open(info_file, 'r') as f:
+            snapshot_id = json.load(f)["snapshot"]
+        manifest_file = snapshot_dir(snapshot_id) / "manifest.json"
+        self.assertTrue(manifest_file.exists(), "Snapshot manifest does not exist on disk")
         
         print("✅ Backup files exist on disk")
         
@@ -238,8 +249,7 @@ class DatabaseBackupTest(unittest.TestCase):
         print(f"✅ Backup info file is valid: {json.dumps(backup_info, indent=2)}")
         
         # Verify products backup file contains our test product
-        with open(products_file, 'r') as f:
-            products_data = json.load(f)
+        products_data = list(snapshot_documents("products", snapshot_id))
         
         test_product_found = False
         for product in products_data:
@@ -251,8 +261,7 @@ class DatabaseBackupTest(unittest.TestCase):
         print("✅ Test product found in backup file")
         
         # Verify projects backup file contains our test project
-        with open(projects_file, 'r') as f:
-            projects_data = json.load(f)
+        projects_data = list(snapshot_documents("projects", snapshot_id))
         
         test_project_found = False
         for project in projects_data:
@@ -292,18 +301,15 @@ class DatabaseBackupTest(unittest.TestCase):
             
             # Restore backup
             response = requests.post(f"{API_URL}/backup/restore")
-            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.status_code, 202)
             
             data = response.json()
             print(f"✅ Restore backup API response: {json.dumps(data, indent=2)}")
             
-            # Verify response structure
-            self.assertIn("message", data)
-            self.assertIn("products_count", data)
-            self.assertIn("projects_count", data)
-            
-            # Wait a moment for restore to complete
-            time.sleep(2)
+            # Wait for the restore job to complete
+            job = wait_for_job(data["id"])
+            self.assertEqual(job["status"], "succeeded", job.get("error"))
+            self.assertIn("products", job["result"]["database_status"])
             
             # Verify test data is restored
             product = await db.products.find_one({"id": self.test_product_id})
@@ -319,17 +325,45 @@ class DatabaseBackupTest(unittest.TestCase):
             final_projects_count = await db.projects.count_documents({})
             print(f"✅ Final counts: {final_products_count} products, {final_projects_count} projects")
             
-            # Verify counts match response
-            self.assertEqual(final_products_count, data["products_count"])
-            self.assertEqual(final_projects_count, data["projects_count"])
+            # Verify counts match the job result
+            self.assertEqual(final_products_count, job["result"]["database_status"]["products"])
+            self.assertEqual(final_projects_count, job["result"]["database_status"]["projects"])
             
-            print("✅ Database counts match response")
+            print("✅ Database counts match job result")
             
-            return data
+            return job
         finally:
             # Close connection
             client.close()
 
+    def test_04_backup_job_progress(self):
+        """Test that a backup job reports per-collection progress and blocks a second job"""
+        print("\n🔍 Testing backup job progress...")
+        
+        response = requests.post(f"{API_URL}/backup/create?full=true")
+        self.assertEqual(response.status_code, 202, response.text)
+        job_id = response.json()["id"]
+        
+        # Only one backup job runs at a time
+        second = requests.post(f"{API_URL}/backup/create")
+        if second.status_code == 409:
+            print("✅ Second job rejected while the first runs")
+        else:
+            wait_for_job(second.json()["id"])
+        
+        job = wait_for_job(job_id)
+        self.assertEqual(job["status"], "succeeded", job.get("error"))
+        self.assertIn(job["result"]["snapshot"], [b["id"] for b in requests.get(f"{API_URL}/backup/status").json()["snapshots"]])
+        for name in ["products", "projects", "orders", "feedback", "cart_items"]:
+            progress = job["progress"][name]
+            self.assertTrue(progress["done"])
+            self.assertGreater(progress["bytes"], 0)
+            print(f"✅ {name}: {progress['documents']} documents, {progress['bytes']} bytes")
+        
+        response = requests.get(f"{API_URL}/backup/jobs/{uuid.uuid4()}")
+        self.assertEqual(response.status_code, 404)
+        print("✅ Unknown job returns 404")
+
 async def run_async_tests():
     """Run the async test methods"""
     test = DatabaseBackupTest()
@@ -0,0 +1,131 @@
+import requests
+import unittest
+import uuid
+import time
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Get the backend URL from the frontend .env file
+with open('/app/frontend/.env', 'r') as f:
+    for line in f:
+        if line.startswith('REACT_APP_BACKEND_URL='):
+            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
+            break
+
+API_URL = f"{BACKEND_URL}/api"
+
+class CartQuantityTest(unittest.TestCase):
+    """Test suite for atomic cart increments and the quantity PATCH endpoint"""
+
+    def setUp(self):
+        """Initialize test data"""
+        self.test_user_id = f"test_user_{uuid.uuid4().hex[:8]}"
+        print(f"\n🔍 Testing with user_id: {self.test_user_id}")
+
+        response = requests.get(f"{API_URL}/products")
+        self.assertEqual(response.status_code, 200, "Failed to get products")
+        products = response.json()
+        self.assertGreater(len(products), 1, "Need at least two products for testing")
+        self.test_product = products[0]
+        self.second_product = products[1]
+
+    def tearDown(self):
+        """Clean up test data"""
+        requests.delete(f"{API_URL}/cart?user_id={self.test_user_id}")
+
+    def add(self, product, quantity=1):
+        response = requests.post(f"{API_URL}/cart", json={
+            "user_id": self.test_user_id,
+            "product_id": product["id"],
+            "quantity": quantity
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_01_concurrent_adds_do_not_lose_increments(self):
+        """Test that parallel adds of the same product end up in one line with the full quantity"""
+        print("\n🔍 Testing concurrent cart adds...")
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            list(pool.map(lambda _: self.add(self.test_product), range(10)))
+
+        cart = requests.get(f"{API_URL}/cart?user_id={self.test_user_id}").json()
+        self.assertEqual(len(cart), 1, "Concurrent adds created duplicate cart lines")
+        self.assertEqual(cart[0]["quantity"], 10)
+        print("✅ 10 concurrent adds produced one line with quantity 10")
+
+    def test_02_patch_sets_quantity_and_returns_totals(self):
+        """Test that PATCH sets an absolute quantity and returns the whole cart with totals"""
+        print("\n🔍 Testing quantity update...")
+        item = self.add(self.test_product)
+        self.add(self.second_product, 2)
+
+        response = requests.patch(
+            f"{API_URL}/cart/{item['id']}?user_id={self.test_user_id}",
+            json={"quantity": 5}
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        summary = response.json()
+        quantities = {i["product_id"]: i["quantity"] for i in summary["items"]}
+        self.assertEqual(quantities[self.test_product["id"]], 5)
+        self.assertEqual(summary["total_quantity"], 7)
+        expected_total = self.test_product["price"] * 5 + self.second_product["price"] * 2
+        self.assertAlmostEqual(summary["total_amount"], expected_total)
+        print("✅ Quantity set to 5 and totals returned")
+
+    def test_03_patch_to_zero_removes_item(self):
+        """Test that quantity 0 removes the item"""
+        print("\n🔍 Testing removal through PATCH...")
+        item = self.add(self.test_product)
+        response = requests.patch(
+            f"{API_URL}/cart/{item['id']}?user_id={self.test_user_id}",
+            json={"quantity": 0}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["items"], [])
+        self.assertEqual(response.json()["total_amount"], 0)
+        print("✅ Item removed")
+
+    def test_04_patch_validation(self):
+        """Test ownership and quantity validation"""
+        print("\n🔍 Testing PATCH validation...")
+        item = self.add(self.test_product)
+
+        response = requests.patch(f"{API_URL}/cart/{item['id']}?user_id=someone_else", json={"quantity": 3})
+        self.assertEqual(response.status_code, 404)
+
+        response = requests.patch(
+            f"{API_URL}/cart/{item['id']}?user_id={self.test_user_id}",
+            json={"quantity": -1}
+        )
+        self.assertEqual(response.status_code, 422)
+        print("✅ Foreign items and negative quantities are rejected")
+
+    def test_05_deleted_product_can_be_incremented(self):
+        """Test that a cart line whose product was deleted still increments, but is not added anew"""
+        print("\n🔍 Testing adds of a deleted product...")
+        response = requests.post(f"{API_URL}/products", json={
+            "name": "Удаляемый кондиционер",
+            "description": "Проверка корзины",
+            "short_description": "Тест",
+            "price": 1000,
+            "image_url": "https://example.com/test.jpg",
+            "specifications": {}
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+        product = response.json()
+        self.add(product)
+        self.assertEqual(requests.delete(f"{API_URL}/products/{product['id']}").status_code, 200)
+
+        self.assertEqual(self.add(product)["quantity"], 2)
+        response = requests.post(f"{API_URL}/cart", json={
+            "user_id": f"other_{self.test_user_id}",
+            "product_id": product["id"],
+            "quantity": 1
+        })
+        self.assertEqual(response.status_code, 404)
+        print("✅ Existing line incremented, new line rejected")
+
+if __name__ == '__main__':
+    print(f"🚀 Testing Cart Quantity Updates at: {API_URL}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
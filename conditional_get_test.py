@@ -0,0 +1,76 @@
+import requests
+import unittest
+import sys
+import os
+
+# Get the backend URL from the frontend .env file
+with open('/app/frontend/.env', 'r') as f:
+    for line in f:
+        if line.startswith('REACT_APP_BACKEND_URL='):
+            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
+            break
+
+API_URL = f"{BACKEND_URL}/api"
+
+class ConditionalGetTest(unittest.TestCase):
+    """Test suite for ETag / Last-Modified revalidation of catalog endpoints"""
+
+    def check_revalidation(self, url):
+        response = requests.get(url)
+        self.assertEqual(response.status_code, 200, response.text)
+        etag = response.headers.get("ETag")
+        self.assertTrue(etag, f"No ETag on {url}")
+        self.assertIn("no-cache", response.headers.get("Cache-Control", ""))
+
+        response = requests.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers.get("ETag"), etag)
+
+        response = requests.get(url, headers={"If-None-Match": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        return etag
+
+    def test_01_products_revalidate(self):
+        """Test that the product list, a page and a single product answer 304 for a current ETag"""
+        print("\n🔍 Testing product revalidation...")
+        self.check_revalidation(f"{API_URL}/products")
+        self.check_revalidation(f"{API_URL}/products?limit=5")
+        products = requests.get(f"{API_URL}/products").json()
+        self.assertGreater(len(products), 0, "No products available for testing")
+        self.check_revalidation(f"{API_URL}/products/{products[0]['id']}")
+        print("✅ Products revalidate with 304")
+
+    def test_02_projects_revalidate(self):
+        """Test that the project list answers 304 for a current ETag"""
+        print("\n🔍 Testing project revalidation...")
+        self.check_revalidation(f"{API_URL}/projects")
+        print("✅ Projects revalidate with 304")
+
+    def test_03_write_changes_etag(self):
+        """Test that creating and deleting a product changes the list ETag"""
+        print("\n🔍 Testing ETag change after a write...")
+        etag = self.check_revalidation(f"{API_URL}/products")
+
+        response = requests.post(f"{API_URL}/products", json={
+            "name": "Тестовый кондиционер ETag",
+            "description": "Проверка условных запросов",
+            "short_description": "Тест",
+            "price": 1000,
+            "image_url": "https://example.com/test.jpg",
+            "specifications": {}
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+        product_id = response.json()["id"]
+        try:
+            response = requests.get(f"{API_URL}/products", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers.get("ETag"), etag)
+            self.assertTrue(response.headers.get("Last-Modified"))
+        finally:
+            requests.delete(f"{API_URL}/products/{product_id}")
+        print("✅ ETag changes after a write")
+
+if __name__ == '__main__':
+    print(f"🚀 Testing Conditional GET at: {API_URL}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -1,10 +1,17 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import axios from 'axios';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Images from the backend store are returned as relative /api/images/... links
+const resolveImageUrl = (url) => (url && url.startsWith('/api/') ? `${BACKEND_URL}${url}` : url);
+
+// Catalog cards only need a small preview, the backend resizes and caches it
+const productThumbnailUrl = (product, width = 320) =>
+  `${API}/products/${product.id}/image?w=${width}&fmt=webp`;
+
 // Telegram Web App initialization
 const initTelegramWebApp = () => {
   if (window.Telegram?.WebApp) {
@@ -86,8 +93,9 @@ const ProductCard = ({ product, onViewDetails, onAddToCart }) => {
     <div className="product-card">
       <div className="product-image-container">
         <img 
-          src={product.image_url} 
+          src={productThumbnailUrl(product)} 
           alt={product.name}
+          loading="lazy"
           className="product-image"
         />
       </div>
@@ -129,7 +137,7 @@ const ProductDetailsModal = ({ product, onClose, onAddToCart }) => {
         </div>
         <div className="modal-content">
           <div className="product-detail-image">
-            <img src={product.image_url} alt={product.name} />
+            <img src={productThumbnailUrl(product, 800)} alt={product.name} />
           </div>
           <div className="product-detail-info">
             <p className="product-detail-description">{product.description}</p>
@@ -166,28 +174,14 @@ const ProductDetailsModal = ({ product, onClose, onAddToCart }) => {
 };
 
 // Filters Component
-const ProductFilters = ({ products, filters, onFiltersChange, onReset }) => {
+const ProductFilters = ({ facets, filters, onFiltersChange, onReset }) => {
   const [showFilters, setShowFilters] = useState(false);
 
-  // Extract unique values for filters
-  const brands = [...new Set(products.map(p => {
-    const brandMatch = p.name.match(/^([A-Za-z\s]+)/);
-    return brandMatch ? brandMatch[1].trim() : 'Другие';
-  }))];
-
-  const powerOptions = [...new Set(products.map(p => {
-    const power = p.specifications?.['Мощность охлаждения'];
-    return power ? power.replace(' кВт', '') : null;
-  }).filter(Boolean))].sort((a, b) => parseFloat(a) - parseFloat(b));
-
-  const areaOptions = [...new Set(products.map(p => {
-    const area = p.specifications?.['Площадь помещения'];
-    return area ? area.replace(' м²', '') : null;
-  }).filter(Boolean))].sort((a, b) => parseInt(a) - parseInt(b));
-
-  const efficiencyClasses = [...new Set(products.map(p => 
-    p.specifications?.['Класс энергоэффективности']
-  ).filter(Boolean))];
+  // Filter options come pre-counted from the server
+  const brands = (facets?.brands || []).map(f => f.value);
+  const powerOptions = (facets?.power || []).map(f => f.value);
+  const areaOptions = (facets?.area || []).map(f => f.value);
+  const efficiencyClasses = (facets?.efficiency || []).map(f => f.value);
 
   const handleFilterChange = (key, value) => {
     onFiltersChange({ ...filters, [key]: value });
@@ -330,11 +324,28 @@ const ProductFilters = ({ products, filters, onFiltersChange, onReset }) => {
 };
 
 // Catalog Section
+const CATALOG_PAGE_SIZE = 20;
+
+const buildSearchParams = (filters, offset) => {
+  // Cards need only a few fields, the full product is loaded when details are opened
+  const params = { limit: CATALOG_PAGE_SIZE, offset, view: 'card' };
+  if (filters.search) params.q = filters.search;
+  if (filters.brand) params.brand = filters.brand;
+  if (filters.power) params.power = filters.power;
+  if (filters.area) params.area = filters.area;
+  if (filters.efficiency) params.efficiency = filters.efficiency;
+  if (filters.priceRange.min) params.price_min = filters.priceRange.min;
+  if (filters.priceRange.max) params.price_max = filters.priceRange.max;
+  return params;
+};
+
 const Catalog = ({ onAddToCart }) => {
   const [products, setProducts] = useState([]);
-  const [filteredProducts, setFilteredProducts] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [facets, setFacets] = useState(null);
   const [selectedProduct, setSelectedProduct] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filters, setFilters] = useState({
     search: '',
     brand: '',
@@ -345,83 +356,45 @@ const Catalog = ({ onAddToCart }) => {
   });
 
   useEffect(() => {
-    fetchProducts();
-  }, []);
-
-  useEffect(() => {
-    applyFilters();
-  }, [products, filters]);
+    // Debounce so typing in the search box doesn't fire a request per key
+    const timer = setTimeout(() => searchProducts(0), filters.search ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [filters]);
 
-  const fetchProducts = async () => {
+  const searchProducts = async (offset) => {
+    if (offset > 0) setLoadingMore(true);
     try {
-      const response = await axios.get(`${API}/products`);
-      setProducts(response.data);
+      const response = await axios.get(`${API}/products/search`, {
+        params: buildSearchParams(filters, offset)
+      });
+      const { items, total, facets } = response.data;
+      setProducts(prev => (offset > 0 ? [...prev, ...items] : items));
+      setTotal(total);
+      setFacets(facets);
     } catch (error) {
       console.error('Ошибка загрузки товаров:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
-  const applyFilters = () => {
-    let filtered = [...products];
-
-    // Search filter
-    if (filters.search) {
-      const searchTerm = filters.search.toLowerCase();
-      filtered = filtered.filter(product =>
-        product.name.toLowerCase().includes(searchTerm) ||
-        product.description.toLowerCase().includes(searchTerm) ||
-        product.short_description.toLowerCase().includes(searchTerm)
-      );
-    }
-
-    // Brand filter
-    if (filters.brand) {
-      filtered = filtered.filter(product => {
-        const brandMatch = product.name.match(/^([A-Za-z\s]+)/);
-        const productBrand = brandMatch ? brandMatch[1].trim() : 'Другие';
-        return productBrand === filters.brand;
-      });
-    }
-
-    // Power filter
-    if (filters.power) {
-      filtered = filtered.filter(product => {
-        const power = product.specifications?.['Мощность охлаждения'];
-        return power && power.includes(filters.power);
-      });
-    }
-
-    // Area filter
-    if (filters.area) {
-      filtered = filtered.filter(product => {
-        const area = product.specifications?.['Площадь помещения'];
-        return area && area.includes(filters.area);
-      });
-    }
-
-    // Efficiency filter
-    if (filters.efficiency) {
-      filtered = filtered.filter(product => {
-        const efficiency = product.specifications?.['Класс энергоэффективности'];
-        return efficiency === filters.efficiency;
-      });
-    }
-
-    // Price range filter
-    if (filters.priceRange.min || filters.priceRange.max) {
-      filtered = filtered.filter(product => {
-        const price = product.price;
-        const min = filters.priceRange.min ? parseFloat(filters.priceRange.min) : 0;
-        const max = filters.priceRange.max ? parseFloat(filters.priceRange.max) : Infinity;
-        return price >= min && price <= max;
-      });
+  const handleViewDetails = async (product) => {
+    // Show the card data right away and fill in description and specifications
+    setSelectedProduct(product);
+    try {
+      const response = await axios.get(`${API}/products/${product.id}`);
+      setSelectedProduct(current => (current && current.id === product.id ? response.data : current));
+    } catch (error) {
+      console.error('Ошибка загрузки товара:', error);
     }
-
-    setFilteredProducts(filtered);
   };
 
+  const hasActiveFilters = Boolean(
+    filters.search || filters.brand || filters.power || filters.area ||
+    filters.efficiency || filters.priceRange.min || filters.priceRange.max
+  );
+
   const handleFiltersChange = (newFilters) => {
     setFilters(newFilters);
   };
@@ -450,7 +423,7 @@ const Catalog = ({ onAddToCart }) => {
     <div className="section">
       <div className="section-content">
         <ProductFilters
-          products={products}
+          facets={facets}
           filters={filters}
           onFiltersChange={handleFiltersChange}
           onReset={handleResetFilters}
@@ -458,14 +431,14 @@ const Catalog = ({ onAddToCart }) => {
         
         <div className="products-header">
           <h2 className="products-title">
-            {filteredProducts.length === products.length 
-              ? `Все товары (${products.length})`
-              : `Найдено: ${filteredProducts.length} из ${products.length}`
+            {hasActiveFilters
+              ? `Найдено: ${total}`
+              : `Все товары (${total})`
             }
           </h2>
         </div>
 
-        {filteredProducts.length === 0 ? (
+        {products.length === 0 ? (
           <div className="no-results">
             <div className="no-results-icon">🔍</div>
             <h3 className="no-results-title">Товары не найдены</h3>
@@ -477,16 +450,29 @@ const Catalog = ({ onAddToCart }) => {
             </button>
           </div>
         ) : (
-          <div className="products-grid">
-            {filteredProducts.map(product => (
-              <ProductCard
-                key={product.id}
-                product={product}
-                onViewDetails={setSelectedProduct}
-                onAddToCart={onAddToCart}
-              />
-            ))}
-          </div>
+          <>
+            <div className="products-grid">
+              {products.map(product => (
+                <ProductCard
+                  key={product.id}
+                  product={product}
+                  onViewDetails={handleViewDetails}
+                  onAddToCart={onAddToCart}
+                />
+              ))}
+            </div>
+            {products.length < total && (
+              <div className="filters-actions">
+                <button
+                  onClick={() => searchProducts(products.length)}
+                  className="btn btn-secondary"
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+                </button>
+              </div>
+            )}
+          </>
         )}
       </div>
       <ProductDetailsModal
@@ -561,7 +547,7 @@ const About = () => {
           <div className="project-gallery">
             <div className="gallery-container">
               <img 
-                src={project.images[currentImage]} 
+                src={resolveImageUrl(project.images[currentImage])} 
                 alt={project.title}
                 className="gallery-image"
               />
@@ -864,9 +850,40 @@ const Feedback = ({ shouldAutoFillPromo, setShouldAutoFillPromo }) => {
 };
 
 // Cart Section
-const Cart = ({ cartItems, onRemoveItem, onUpdateQuantity, onClearCart }) => {
+const ORDER_RETRY_DELAYS = [1000, 2000, 4000];
+
+const newIdempotencyKey = () =>
+  (window.crypto && window.crypto.randomUUID)
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// The order is retried with the same key, so the backend creates it only once
+const postOrder = async (userId, orderData, idempotencyKey) => {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      // The backend reads the cart itself and prices it from the current catalog
+      return await axios.post(`${API}/orders/from-cart?user_id=${encodeURIComponent(userId)}`, orderData, {
+        headers: { 'Idempotency-Key': idempotencyKey }
+      });
+    } catch (error) {
+      const retriable = !error.response || error.response.status === 409 || error.response.status >= 500;
+      if (!retriable || attempt >= ORDER_RETRY_DELAYS.length) {
+        throw error;
+      }
+      await new Promise(resolve => setTimeout(resolve, ORDER_RETRY_DELAYS[attempt]));
+    }
+  }
+};
+
+const Cart = ({ userId, cartItems, onRemoveItem, onUpdateQuantity, onOrderPlaced }) => {
   const [showConfirmation, setShowConfirmation] = useState(false);
   const [isOrdering, setIsOrdering] = useState(false);
+  // One key per checkout attempt, a changed cart is a new order
+  const orderKeyRef = useRef(null);
+
+  useEffect(() => {
+    orderKeyRef.current = null;
+  }, [cartItems]);
 
   const totalAmount = cartItems.reduce((sum, item) => sum + (item.price * item.quantity), 0);
 
@@ -877,15 +894,21 @@ const Cart = ({ cartItems, onRemoveItem, onUpdateQuantity, onClearCart }) => {
       const telegramUser = getTelegramUser();
       
       const orderData = {
-        items: cartItems,
         tg_user_id: telegramUser?.id?.toString() || null,
         tg_username: telegramUser?.username || null
       };
       
-      await axios.post(`${API}/orders`, orderData);
+      if (!orderKeyRef.current) {
+        orderKeyRef.current = newIdempotencyKey();
+      }
+      const response = await postOrder(userId, orderData, orderKeyRef.current);
+      orderKeyRef.current = null;
       setShowConfirmation(false);
-      onClearCart();
-      alert('Спасибо за заказ! Мы свяжемся с вами для подтверждения.');
+      onOrderPlaced();
+      const unavailable = response.data.unavailable || [];
+      alert(unavailable.length
+        ? `${response.data.message}\nНедоступны и не вошли в заказ: ${unavailable.join(', ')}`
+        : response.data.message);
     } catch (error) {
       console.error('Ошибка оформления заказа:', error);
       alert('Ошибка оформления заказа. Попробуйте еще раз.');
@@ -1162,33 +1185,16 @@ function App() {
     try {
       const userId = getUserId();
       
-      const item = cartItems.find(item => item.id === itemId);
-      if (item) {
-        await axios.delete(`${API}/cart/${itemId}?user_id=${userId}`);
-        if (newQuantity > 0) {
-          await axios.post(`${API}/cart`, {
-            user_id: userId,
-            product_id: item.product_id,
-            quantity: newQuantity
-          });
-        }
-        fetchCartItems();
-      }
+      // One request sets the quantity (0 removes the item) and returns the updated cart
+      const response = await axios.patch(`${API}/cart/${itemId}?user_id=${userId}`, {
+        quantity: Math.max(0, newQuantity)
+      });
+      setCartItems(response.data.items);
     } catch (error) {
       console.error('Ошибка обновления количества:', error);
     }
   };
 
-  const handleClearCart = async () => {
-    try {
-      const userId = getUserId();
-      await axios.delete(`${API}/cart?user_id=${userId}`);
-      setCartItems([]);
-    } catch (error) {
-      console.error('Ошибка очистки корзины:', error);
-    }
-  };
-
   const handlePromoNavigate = () => {
     setShouldAutoFillPromo(true);
     setActiveSection('feedback');
@@ -1218,10 +1224,11 @@ function App() {
       case 'cart':
         return (
           <Cart 
+            userId={getUserId()}
             cartItems={cartItems}
             onRemoveItem={handleRemoveFromCart}
             onUpdateQuantity={handleUpdateQuantity}
-            onClearCart={handleClearCart}
+            onOrderPlaced={fetchCartItems}
           />
         );
       default:
@@ -0,0 +1,114 @@
+import requests
+import unittest
+import uuid
+import sys
+import os
+
+# Get the backend URL from the frontend .env file
+with open('/app/frontend/.env', 'r') as f:
+    for line in f:
+        if line.startswith('REACT_APP_BACKEND_URL='):
+            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
+            break
+
+API_URL = f"{BACKEND_URL}/api"
+
+class OrderFromCartTest(unittest.TestCase):
+    """Test suite for server-priced cart-to-order conversion"""
+
+    def setUp(self):
+        """Initialize test data"""
+        self.test_user_id = f"test_user_{uuid.uuid4().hex[:8]}"
+        print(f"\n🔍 Testing with user_id: {self.test_user_id}")
+        response = requests.get(f"{API_URL}/products")
+        self.assertEqual(response.status_code, 200, "Failed to get products")
+        products = response.json()
+        self.assertGreater(len(products), 1, "Need at least two products for testing")
+        self.products = products[:2]
+
+    def tearDown(self):
+        """Clean up test data"""
+        requests.delete(f"{API_URL}/cart?user_id={self.test_user_id}")
+
+    def add(self, product, quantity):
+        response = requests.post(f"{API_URL}/cart", json={
+            "user_id": self.test_user_id,
+            "product_id": product["id"],
+            "quantity": quantity
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+
+    def test_01_order_uses_catalog_prices(self):
+        """Test that the order total is computed from current product prices and the cart is cleared"""
+        print("\n🔍 Testing order from cart...")
+        self.add(self.products[0], 2)
+        self.add(self.products[1], 1)
+
+        response = requests.post(
+            f"{API_URL}/orders/from-cart?user_id={self.test_user_id}",
+            json={"tg_user_id": self.test_user_id}
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        result = response.json()
+        expected = self.products[0]["price"] * 2 + self.products[1]["price"]
+        self.assertAlmostEqual(result["total_amount"], expected)
+        self.assertEqual(result["total_quantity"], 3)
+        self.assertEqual(result["unavailable"], [])
+        self.assertTrue(result["order_id"])
+
+        cart = requests.get(f"{API_URL}/cart?user_id={self.test_user_id}").json()
+        self.assertEqual(cart, [], "Cart was not cleared")
+        print(f"✅ Order {result['order_id'][:8]} for {result['total_amount']} ₽")
+
+    def test_02_empty_cart_is_rejected(self):
+        """Test that an empty cart cannot be ordered"""
+        print("\n🔍 Testing empty cart...")
+        response = requests.post(f"{API_URL}/orders/from-cart?user_id={self.test_user_id}")
+        self.assertEqual(response.status_code, 400)
+        print("✅ Empty cart rejected")
+
+    def test_03_retry_with_key_does_not_reorder(self):
+        """Test that a retried conversion with the same key returns the first result"""
+        print("\n🔍 Testing retried conversion...")
+        self.add(self.products[0], 1)
+        key = str(uuid.uuid4())
+        url = f"{API_URL}/orders/from-cart?user_id={self.test_user_id}"
+        first = requests.post(url, headers={"Idempotency-Key": key})
+        second = requests.post(url, headers={"Idempotency-Key": key})
+        self.assertEqual(first.status_code, 200, first.text)
+        self.assertEqual(second.status_code, 200, second.text)
+        self.assertEqual(second.json()["order_id"], first.json()["order_id"])
+        self.assertEqual(second.headers.get("Idempotent-Replayed"), "true")
+        print("✅ Retry returned the same order")
+
+    def test_04_deleted_product_is_reported(self):
+        """Test that a product deleted after it was added is reported and left out of the order"""
+        print("\n🔍 Testing deleted product in the cart...")
+        response = requests.post(f"{API_URL}/products", json={
+            "name": "Удаляемый кондиционер",
+            "description": "Проверка недоступных товаров",
+            "short_description": "Тест",
+            "price": 1000,
+            "image_url": "https://example.com/test.jpg",
+            "specifications": {}
+        })
+        self.assertEqual(response.status_code, 200, response.text)
+        deleted = response.json()
+        self.add(deleted, 1)
+        self.add(self.products[0], 2)
+        self.assertEqual(requests.delete(f"{API_URL}/products/{deleted['id']}").status_code, 200)
+
+        response = requests.post(f"{API_URL}/orders/from-cart?user_id={self.test_user_id}")
+        self.assertEqual(response.status_code, 200, response.text)
+        result = response.json()
+        self.assertEqual(result["unavailable"], [deleted["name"]])
+        self.assertAlmostEqual(result["total_amount"], self.products[0]["price"] * 2)
+        self.assertEqual(result["total_quantity"], 2)
+
+        cart = requests.get(f"{API_URL}/cart?user_id={self.test_user_id}").json()
+        self.assertEqual(cart, [], "Unavailable line was left in the cart")
+        print(f"✅ Unavailable: {result['unavailable']}")
+
+if __name__ == '__main__':
+    print(f"🚀 Testing Order From Cart at: {API_URL}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
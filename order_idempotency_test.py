@@ -0,0 +1,91 @@
+import requests
+import unittest
+import uuid
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Get the backend URL from the frontend .env file
+with open('/app/frontend/.env', 'r') as f:
+    for line in f:
+        if line.startswith('REACT_APP_BACKEND_URL='):
+            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
+            break
+
+API_URL = f"{BACKEND_URL}/api"
+
+class OrderIdempotencyTest(unittest.TestCase):
+    """Test suite for Idempotency-Key handling on order creation"""
+
+    def setUp(self):
+        """Initialize test data"""
+        self.test_user_id = f"test_user_{uuid.uuid4().hex[:8]}"
+        response = requests.get(f"{API_URL}/products")
+        self.assertEqual(response.status_code, 200, "Failed to get products")
+        product = response.json()[0]
+        self.order = {
+            "items": [{
+                "user_id": self.test_user_id,
+                "product_id": product["id"],
+                "product_name": product["name"],
+                "price": product["price"],
+                "quantity": 1
+            }],
+            "tg_user_id": self.test_user_id
+        }
+
+    def post(self, key, order=None):
+        return requests.post(f"{API_URL}/orders", json=order or self.order, headers={"Idempotency-Key": key})
+
+    def test_01_replay_returns_original_response(self):
+        """Test that a repeated request with the same key is answered from the stored response"""
+        print("\n🔍 Testing replayed order...")
+        key = str(uuid.uuid4())
+        first = self.post(key)
+        self.assertEqual(first.status_code, 200, first.text)
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+
+        second = self.post(key)
+        self.assertEqual(second.status_code, 200, second.text)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers.get("Idempotent-Replayed"), "true")
+        print("✅ Replay returned the stored response")
+
+    def test_02_concurrent_retries_create_one_order(self):
+        """Test that parallel retries with one key complete at most once"""
+        print("\n🔍 Testing concurrent retries...")
+        key = str(uuid.uuid4())
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(lambda _: self.post(key), range(5)))
+
+        statuses = [r.status_code for r in responses]
+        self.assertTrue(all(status in (200, 409) for status in statuses), statuses)
+        self.assertGreaterEqual(statuses.count(200), 1)
+        replayed = [r for r in responses if r.status_code == 200 and r.headers.get("Idempotent-Replayed")]
+        self.assertEqual(len(replayed), statuses.count(200) - 1, "More than one request created an order")
+        print(f"✅ Statuses: {statuses}")
+
+    def test_03_key_reuse_with_other_order_is_rejected(self):
+        """Test that the same key with a different order body is rejected"""
+        print("\n🔍 Testing key reuse with a different body...")
+        key = str(uuid.uuid4())
+        self.assertEqual(self.post(key).status_code, 200)
+
+        other = dict(self.order, items=[dict(self.order["items"][0], quantity=2)])
+        response = self.post(key, other)
+        self.assertEqual(response.status_code, 422)
+        print("✅ Different body with the same key rejected")
+
+    def test_04_key_in_body(self):
+        """Test that the key can also be passed as a body field"""
+        print("\n🔍 Testing idempotency_key body field...")
+        order = dict(self.order, idempotency_key=str(uuid.uuid4()))
+        first = requests.post(f"{API_URL}/orders", json=order)
+        second = requests.post(f"{API_URL}/orders", json=order)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.headers.get("Idempotent-Replayed"), "true")
+        print("✅ Body field key works")
+
+if __name__ == '__main__':
+    print(f"🚀 Testing Order Idempotency at: {API_URL}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,115 @@
+import requests
+import unittest
+import os
+import json
+from datetime import datetime
+
+# Get the backend URL from the frontend .env file
+with open('/app/frontend/.env', 'r') as f:
+    for line in f:
+        if line.startswith('REACT_APP_BACKEND_URL='):
+            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
+            break
+
+API_URL = f"{BACKEND_URL}/api"
+
+class ProductPaginationTest(unittest.TestCase):
+    """Test suite for keyset pagination of the products endpoint"""
+
+    def setUp(self):
+        """Initialize test data"""
+        try:
+            requests.post(f"{API_URL}/init-data")
+        except Exception as e:
+            print(f"Error initializing data: {e}")
+
+    def test_01_plain_list_without_parameters(self):
+        """Test that the endpoint still returns a plain list without pagination parameters"""
+        print("\n🔍 Testing products endpoint without pagination...")
+        response = requests.get(f"{API_URL}/products")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json(), list)
+        print("✅ Plain list returned")
+
+    def test_02_walk_all_pages(self):
+        """Test that walking the cursors returns every product exactly once"""
+        print("\n🔍 Testing walking through all pages...")
+        all_products = requests.get(f"{API_URL}/products").json()
+
+        seen_ids = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{API_URL}/products", params=params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertIn("items", page)
+            self.assertIn("next_cursor", page)
+            self.assertLessEqual(len(page["items"]), 2)
+            seen_ids.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen_ids), len(set(seen_ids)), "Duplicate products across pages")
+        self.assertEqual(set(seen_ids), {p["id"] for p in all_products})
+        print(f"✅ Walked {len(seen_ids)} products without duplicates")
+
+    def test_03_pages_are_ordered(self):
+        """Test that pages are ordered by (created_at, id)"""
+        print("\n🔍 Testing page ordering...")
+        response = requests.get(f"{API_URL}/products", params={"limit": 100})
+        self.assertEqual(response.status_code, 200)
+        items = response.json()["items"]
+        keys = [(item["created_at"], item["id"]) for item in items]
+        self.assertEqual(keys, sorted(keys))
+        print("✅ Products are sorted by creation time")
+
+    def test_04_invalid_parameters(self):
+        """Test validation of limit and cursor"""
+        print("\n🔍 Testing invalid pagination parameters...")
+        response = requests.get(f"{API_URL}/products", params={"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+        response = requests.get(f"{API_URL}/products", params={"limit": 0})
+        self.assertEqual(response.status_code, 422)
+
+        response = requests.get(f"{API_URL}/products", params={"limit": 1000})
+        self.assertEqual(response.status_code, 422)
+        print("✅ Invalid parameters are rejected")
+
+    def test_05_card_view_and_fields(self):
+        """Test that view=card and fields= return only the requested product fields"""
+        print("\n🔍 Testing product projections...")
+        response = requests.get(f"{API_URL}/products", params={"view": "card"})
+        self.assertEqual(response.status_code, 200)
+        card = response.json()[0]
+        self.assertIn("short_description", card)
+        self.assertNotIn("description", card)
+        self.assertNotIn("specifications", card)
+        self.assertNotIn("image_url", card)
+
+        response = requests.get(f"{API_URL}/products", params={"fields": "name,price", "limit": 5})
+        self.assertEqual(response.status_code, 200)
+        for item in response.json()["items"]:
+            self.assertEqual(set(item), {"id", "name", "price"})
+
+        # Pages in a projected view can still be walked with the cursor
+        next_cursor = response.json()["next_cursor"]
+        if next_cursor:
+            response = requests.get(f"{API_URL}/products",
+                                    params={"fields": "name", "limit": 5, "cursor": next_cursor})
+            self.assertEqual(response.status_code, 200)
+
+        response = requests.get(f"{API_URL}/products", params={"fields": "name,bogus"})
+        self.assertEqual(response.status_code, 400)
+
+        full = requests.get(f"{API_URL}/products/{card['id']}").json()
+        self.assertIn("description", full)
+        print("✅ Projections return only the requested fields")
+
+if __name__ == '__main__':
+    print(f"🚀 Testing Product Pagination at: {API_URL}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
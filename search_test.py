@@ -0,0 +1,104 @@
+import requests
+import unittest
+import os
+import json
+from datetime import datetime
+
+# Get the backend URL from the frontend .env file
+with open('/app/frontend/.env', 'r') as f:
+    for line in f:
+        if line.startswith('REACT_APP_BACKEND_URL='):
+            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
+            break
+
+API_URL = f"{BACKEND_URL}/api"
+
+class ProductSearchTest(unittest.TestCase):
+    """Test suite for the server-side catalog search and facets"""
+
+    def setUp(self):
+        """Initialize test data"""
+        try:
+            requests.post(f"{API_URL}/init-data")
+        except Exception as e:
+            print(f"Error initializing data: {e}")
+        self.products = requests.get(f"{API_URL}/products").json()
+
+    def search(self, **params):
+        response = requests.get(f"{API_URL}/products/search", params=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_01_unfiltered_search(self):
+        """Test that an empty search returns the whole catalog count and facets"""
+        print("\n🔍 Testing unfiltered search...")
+        result = self.search(limit=100)
+        self.assertEqual(result["total"], len(self.products))
+        self.assertEqual(len(result["items"]), len(self.products))
+        for key in ["brands", "power", "area", "efficiency", "price"]:
+            self.assertIn(key, result["facets"])
+        self.assertEqual(result["facets"]["price"]["min"], min(p["price"] for p in self.products))
+        self.assertEqual(result["facets"]["price"]["max"], max(p["price"] for p in self.products))
+        print("✅ Unfiltered search returns the full catalog")
+
+    def test_02_power_filter(self):
+        """Test filtering by cooling power"""
+        print("\n🔍 Testing power filter...")
+        result = self.search(power="3.5", limit=100)
+        expected = [p for p in self.products
+                    if p["specifications"].get("Мощность охлаждения") == "3.5 кВт"]
+        self.assertEqual(result["total"], len(expected))
+        for item in result["items"]:
+            self.assertEqual(item["specifications"]["Мощность охлаждения"], "3.5 кВт")
+
+        # The power facet ignores its own filter so other options stay selectable
+        power_values = {f["value"] for f in result["facets"]["power"]}
+        self.assertGreater(len(power_values), 1)
+        print(f"✅ Power filter returned {result['total']} products")
+
+    def test_03_price_range(self):
+        """Test filtering by price range"""
+        print("\n🔍 Testing price range filter...")
+        result = self.search(price_min=30000, price_max=45000, limit=100)
+        for item in result["items"]:
+            self.assertGreaterEqual(item["price"], 30000)
+            self.assertLessEqual(item["price"], 45000)
+        print(f"✅ Price filter returned {result['total']} products")
+
+    def test_04_text_search(self):
+        """Test free-text search"""
+        print("\n🔍 Testing text search...")
+        result = self.search(q="daikin")
+        self.assertGreater(result["total"], 0)
+        for item in result["items"]:
+            text = f"{item['name']} {item['description']} {item['short_description']}".lower()
+            self.assertIn("daikin", text)
+        print(f"✅ Text search returned {result['total']} products")
+
+    def test_05_paging(self):
+        """Test limit and offset of the result page"""
+        print("\n🔍 Testing search paging...")
+        first = self.search(limit=2, offset=0)
+        second = self.search(limit=2, offset=2)
+        self.assertEqual(first["total"], second["total"])
+        first_ids = {item["id"] for item in first["items"]}
+        second_ids = {item["id"] for item in second["items"]}
+        self.assertFalse(first_ids & second_ids)
+        print("✅ Pages do not overlap")
+
+    def test_06_typo_and_prefix(self):
+        """Test that a model name is found by its prefix and with a typo"""
+        print("\n🔍 Testing typo-tolerant search...")
+        product = self.products[0]
+        word = max(product["name"].split(), key=len)
+        self.assertGreaterEqual(len(word), 5, "Need a product name with a long word")
+
+        for query in (word[:4], word[:2] + word[3:]):
+            result = self.search(q=query, limit=100)
+            ids = [item["id"] for item in result["items"]]
+            self.assertIn(product["id"], ids, f"'{query}' did not find {product['name']}")
+            print(f"✅ '{query}' found {product['name']} at position {ids.index(product['id']) + 1}")
+
+if __name__ == '__main__':
+    print(f"🚀 Testing Product Search at: {API_URL}")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from telegram_client import TelegramClient
+from telegram_rate_limit import TelegramRateLimiter
+from notifications import digest_text
+
+class StubTelegramHandler(BaseHTTPRequestHandler):
+    """Minimal Bot API stub that records requests and the client port they came from"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.flood_once:
+            # Simulate Telegram flood control on the first request
+            self.server.flood_once = False
+            self.server.calls.append({"path": self.path, "flood": True, "time": time.monotonic()})
+            response = json.dumps({"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                   "parameters": {"retry_after": 1}}).encode()
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+            return
+        self.server.calls.append({
+            "time": time.monotonic(),
+            "path": self.path,
+            "payload": json.loads(body),
+            "port": self.client_address[1]
+        })
+        response = json.dumps({"ok": True, "result": {"message_id": len(self.server.calls)}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+class TelegramClientTest(unittest.TestCase):
+    """Test suite for the shared Telegram client against a local stub server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTelegramHandler)
+        self.server.calls = []
+        self.server.flood_once = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_01_send_message(self):
+        """Test that sendMessage goes to /bot<token>/sendMessage with the expected payload"""
+        print("\n🔍 Testing sendMessage payload...")
+
+        async def run():
+            telegram = TelegramClient("123:abc", base_url=self.base_url)
+            await telegram.start()
+            try:
+                return await telegram.send_message(42, "<b>Новый заказ</b>")
+            finally:
+                await telegram.close()
+
+        result = asyncio.run(run())
+        self.assertTrue(result["ok"])
+        call = self.server.calls[0]
+        self.assertEqual(call["path"], "/bot123:abc/sendMessage")
+        self.assertEqual(call["payload"], {"chat_id": 42, "text": "<b>Новый заказ</b>", "parse_mode": "HTML"})
+        print("✅ sendMessage payload is correct")
+
+    def test_02_connection_is_reused(self):
+        """Test that consecutive notifications share one keep-alive connection"""
+        print("\n🔍 Testing connection reuse...")
+
+        async def run():
+            telegram = TelegramClient("123:abc", base_url=self.base_url)
+            await telegram.start()
+            try:
+                for i in range(5):
+                    await telegram.send_message(42, f"Сообщение {i}")
+            finally:
+                await telegram.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(self.server.calls), 5)
+        ports = {call["port"] for call in self.server.calls}
+        self.assertEqual(len(ports), 1, f"Expected one connection, got {len(ports)}")
+        print("✅ 5 messages sent over one connection")
+
+    def test_03_reopens_after_close(self):
+        """Test that the client can be used again after close"""
+        print("\n🔍 Testing reuse after close...")
+
+        async def run():
+            telegram = TelegramClient("123:abc", base_url=self.base_url)
+            await telegram.send_message(42, "до закрытия")
+            await telegram.close()
+            await telegram.send_message(42, "после закрытия")
+            await telegram.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(self.server.calls), 2)
+        print("✅ Client reopens after close")
+
+    def test_04_per_chat_limit(self):
+        """Test that sends to one chat are spaced by the per-chat bucket after the burst"""
+        print("\n🔍 Testing per-chat rate limit...")
+
+        async def run():
+            limiter = TelegramRateLimiter(chat_rate=10.0, chat_burst=2)
+            telegram = TelegramClient("123:abc", base_url=self.base_url, limiter=limiter)
+            try:
+                started = time.monotonic()
+                await asyncio.gather(*[telegram.send_message(42, f"Заказ {i}") for i in range(6)])
+                return time.monotonic() - started
+            finally:
+                await telegram.close()
+
+        elapsed = asyncio.run(run())
+        self.assertEqual(len(self.server.calls), 6)
+        # 2 messages go out at once, the other 4 wait 0.1s each
+        self.assertGreaterEqual(elapsed, 0.35)
+        print(f"✅ 6 messages took {elapsed:.2f}s")
+
+    def test_05_retry_after_pauses_sending(self):
+        """Test that a 429 pauses the limiter for retry_after seconds"""
+        print("\n🔍 Testing retry_after pause...")
+        self.server.flood_once = True
+
+        async def run():
+            telegram = TelegramClient("123:abc", base_url=self.base_url, limiter=TelegramRateLimiter())
+            try:
+                first = await telegram.send_message(42, "первое")
+                second = await telegram.send_message(7, "второе")
+                return first, second
+            finally:
+                await telegram.close()
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first["error_code"], 429)
+        self.assertTrue(second["ok"])
+        gap = self.server.calls[1]["time"] - self.server.calls[0]["time"]
+        self.assertGreaterEqual(gap, 0.9, "Second request was not delayed by retry_after")
+        print(f"✅ Next request waited {gap:.2f}s")
+
+    def test_06_digest_text(self):
+        """Test that a burst of notifications is summarized in one message"""
+        print("\n🔍 Testing digest text...")
+        now = datetime.utcnow()
+        notifications = [
+            {"kind": "order", "text": f"Заказ {i}", "created_at": now - timedelta(seconds=10)} for i in range(5)
+        ] + [{"kind": "feedback", "text": "Заявка", "created_at": now}]
+        text = digest_text(notifications)
+        self.assertIn("5 новых заказов, 1 новая заявка за последние 10 с", text)
+        for i in range(5):
+            self.assertIn(f"Заказ {i}", text)
+        print("✅ Digest keeps every message")
+
+if __name__ == '__main__':
+    print("🚀 Testing Telegram client against a local stub")
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)